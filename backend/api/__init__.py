@@ -1,15 +1,27 @@
 import os
 from flask import Flask
+from api.startup_timing import StartupTimer
+from api.uploads import UploadRequest
+
+def create_app(instance_config_filename='local_config.py', config=None):
+    startup_timer = StartupTimer()
 
-def create_app(instance_config_filename='local_config.py'):
     # create and configure the app
-    app = Flask(__name__, instance_relative_config=True)
+    with startup_timer.measure('config'):
+        app = Flask(__name__, instance_relative_config=True)
+
+        # Uploaded files are streamed to disk and hashed by the multipart parser.
+        app.request_class = UploadRequest
+
+        # Load the default global config file.
+        app.config.from_object('api.config')
 
-    # Load the instance configuration.
-    app.config.from_pyfile(instance_config_filename, silent=True)
-    
-    # Load the default global config file.
-    app.config.from_object('api.config')
+        # Load the instance configuration, which overrides the defaults.
+        app.config.from_pyfile(instance_config_filename, silent=True)
+
+        # Apply the configuration passed by the caller (e.g. a test harness), which overrides both.
+        if config is not None:
+            app.config.update(config)
 
     # Ensure the instance folder exists
     try:
@@ -18,10 +30,17 @@ def create_app(instance_config_filename='local_config.py'):
         pass
 
     # Initialize all the extensions, models, and routes
-    from api import extensions, models, routes, error_handlers
+    with startup_timer.measure('imports'):
+        from api import extensions, models, routes, error_handlers
+
+    with startup_timer.measure('extensions'):
+        extensions.init_app(app)
+
+    with startup_timer.measure('routes'):
+        routes.init_app(app)
+        error_handlers.init_app(app)
 
-    extensions.init_app(app)
-    routes.init_app(app)
-    error_handlers.init_app(app)
+    if app.config['STARTUP_TIMING_REPORT']:
+        print(startup_timer.get_report())
 
-    return app
\ No newline at end of file
+    return app
@@ -0,0 +1,98 @@
+'''
+A local, versioned cache of the artifacts that the app downloads (NLTK data and model files).
+
+Every artifact is downloaded once into its own '<name>/<version>' directory, and a marker file
+is written once the download has completed. An artifact with a marker is used as is, so that
+starting the app never checks for downloads over the network. Bumping the version of an
+artifact downloads it again into a new directory.
+
+'''
+
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+
+_MARKER_FILENAME = '.complete'
+
+'''
+The version of the NLTK punkt sentence tokenizer data.
+'''
+NLTK_PUNKT_VERSION = '1'
+
+class ArtifactCache:
+    def __init__(self):
+        self.directory = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = Path(app.instance_path) / app.config['ARTIFACT_DIRECTORY']
+
+    def get_path(self, name, version):
+        return self.directory / name / version
+
+    def is_ready(self, name, version):
+        return (self.get_path(name, version) / _MARKER_FILENAME).exists()
+
+    def ensure(self, name, version, download):
+        '''
+        Gets the directory of an artifact, downloading it first if it is not in the cache yet.
+
+        :param name:
+            The name of the artifact.
+        :param version:
+            The version of the artifact.
+        :param download:
+            A function that downloads the artifact into the directory that it is passed.
+
+        :returns:
+            The path to the directory of the artifact.
+
+        '''
+
+        path = self.get_path(name, version)
+        with self._lock:
+            if self.is_ready(name, version): return path
+
+            start_time = time.time()
+            path.mkdir(parents=True, exist_ok=True)
+            download(path)
+
+            with open(path / _MARKER_FILENAME, 'w') as file:
+                json.dump({'name': name, 'version': version, 'downloaded_time': time.time()}, file)
+
+            print('Downloading {} ({}) took {:.3f} seconds'.format(name, version, time.time() - start_time))
+
+        return path
+
+def register_nltk_data(artifact_cache):
+    '''
+    Makes NLTK look up its data in the artifact cache. This does not import NLTK: its data path
+    is initialized from the NLTK_DATA environment variable when it is first imported.
+
+    '''
+
+    path = str(artifact_cache.get_path('nltk_punkt', NLTK_PUNKT_VERSION))
+
+    nltk_data = os.environ.get('NLTK_DATA')
+    if not nltk_data or path not in nltk_data.split(os.pathsep):
+        os.environ['NLTK_DATA'] = os.pathsep.join(filter(None, (path, nltk_data)))
+
+    if 'nltk.data' in sys.modules and path not in sys.modules['nltk.data'].path:
+        sys.modules['nltk.data'].path.insert(0, path)
+
+def ensure_nltk_data(artifact_cache):
+    '''
+    Downloads the NLTK data used by the app into the artifact cache, if it is not there yet.
+
+    '''
+
+    def download(path):
+        import nltk
+        if not nltk.download('punkt', download_dir=str(path), quiet=True):
+            raise RuntimeError('Failed to download the NLTK punkt data.')
+
+    register_nltk_data(artifact_cache)
+    return artifact_cache.ensure('nltk_punkt', NLTK_PUNKT_VERSION, download)
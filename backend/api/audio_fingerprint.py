@@ -0,0 +1,474 @@
+'''
+Content fingerprinting of decoded audio, used to recognize the same recording across
+different containers, codecs and bitrates.
+
+The fingerprint is a sequence of 32-bit sub-fingerprints, one per (overlapping) frame of
+downsampled audio. Each bit encodes the sign of the energy difference between two adjacent
+frequency bands, differentiated over time, which is robust to re-encoding and volume changes.
+
+'''
+
+import os
+import time
+import uuid
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+import numpy as np
+
+'''
+The sample rate that audio is downsampled to before being fingerprinted.
+'''
+FINGERPRINT_SAMPLE_RATE = 5512
+
+_FRAME_SIZE = 2048
+_HOP_SIZE = 256
+_BAND_COUNT = 33
+_MIN_FREQUENCY = 300
+_MAX_FREQUENCY = 2000
+
+# Sub-fingerprints with more postings than this are ignored by lookups.
+_MAX_POSTING_COUNT = 1000
+
+# The range of the frame offsets between two fingerprints.
+_OFFSET_RANGE = 2 ** 32
+
+_MANIFEST_FILENAME = 'manifest.txt'
+_FINGERPRINT_EXTENSION = '.npz'
+
+'''
+The maximum proportion of differing bits for two fingerprints to be of the same recording.
+'''
+DEFAULT_MAX_BIT_ERROR_RATE = 0.35
+
+'''
+The maximum relative difference in duration for two fingerprints to be of the same recording.
+'''
+DEFAULT_MAX_DURATION_DIFFERENCE = 0.02
+
+'''
+The minimum number of compared frames (that are not silent in both fingerprints) for two
+fingerprints to be of the same recording: 128 frames are about 6 seconds of sound.
+'''
+DEFAULT_MIN_FRAME_COUNT = 128
+
+def _get_band_bins():
+    frequencies = np.fft.rfftfreq(_FRAME_SIZE, 1 / FINGERPRINT_SAMPLE_RATE)
+    band_edges = np.geomspace(_MIN_FREQUENCY, _MAX_FREQUENCY, _BAND_COUNT + 1)
+    return np.searchsorted(frequencies, band_edges)
+
+class AudioFingerprint:
+    '''
+    The fingerprint of a recording.
+
+    '''
+
+    def __init__(self, values, duration):
+        '''
+        :param values:
+            A one-dimensional array of 32-bit sub-fingerprints.
+        :param duration:
+            The duration of the recording, in seconds.
+
+        '''
+
+        self.values = values
+        self.duration = duration
+
+    def __len__(self):
+        return len(self.values)
+
+    def get_bit_error_rate(self, other, offset=0):
+        '''
+        Gets the proportion of differing bits between this fingerprint and another one,
+        over the frames that overlap when the other fingerprint is shifted by offset frames.
+        Frames that are silent in both fingerprints (whose sub-fingerprints are both zero) are
+        left out, since they agree without carrying any information about the recordings.
+
+        :returns:
+            A tuple containing the bit error rate (1 if no frames are compared), and the number
+            of compared frames.
+
+        '''
+
+        start = max(0, offset)
+        end = min(len(self.values), len(other.values) + offset)
+        if end <= start: return 1, 0
+
+        values = self.values[start:end]
+        other_values = other.values[start - offset:end - offset]
+        is_compared = (values != 0) | (other_values != 0)
+        frame_count = int(is_compared.sum())
+        if frame_count == 0: return 1, 0
+
+        differences = np.bitwise_xor(values[is_compared], other_values[is_compared])
+        bit_count = np.unpackbits(differences.view(np.uint8)).sum()
+        return bit_count / (32 * frame_count), frame_count
+
+class AudioFingerprinter:
+    '''
+    Computes the fingerprint of a recording in a single streaming pass over its decoded mono samples.
+
+    '''
+
+    def __init__(self, sample_rate):
+        '''
+        :param sample_rate:
+            The sample rate of the samples that will be fed to the fingerprinter.
+
+        '''
+
+        self.sample_rate = sample_rate
+        self.sample_count = 0
+
+        # Samples are first averaged in groups (which acts as a crude low-pass filter), and then
+        # linearly interpolated to exactly FINGERPRINT_SAMPLE_RATE, so that recordings with
+        # different native sample rates produce comparable fingerprints.
+        self._pooling_factor = max(1, int(sample_rate // FINGERPRINT_SAMPLE_RATE))
+        self._interpolation_step = sample_rate / self._pooling_factor / FINGERPRINT_SAMPLE_RATE
+        self._interpolation_position = 0.0
+
+        self._window = np.hanning(_FRAME_SIZE).astype(np.float32)
+        self._band_bins = _get_band_bins()
+        self._pending_samples = np.zeros(0, dtype=np.float32)
+        self._pooled_samples = np.zeros(0, dtype=np.float32)
+        self._downsampled = np.zeros(0, dtype=np.float32)
+        self._previous_band_differences = None
+        self._values = []
+
+    def _downsample(self, samples):
+        samples = np.concatenate((self._pending_samples, samples))
+        usable_length = len(samples) - len(samples) % self._pooling_factor
+        self._pending_samples = samples[usable_length:]
+
+        pooled_samples = samples[:usable_length].reshape(-1, self._pooling_factor).mean(axis=1)
+        pooled_samples = np.concatenate((self._pooled_samples, pooled_samples))
+        if len(pooled_samples) < 2:
+            self._pooled_samples = pooled_samples
+            return np.zeros(0, dtype=np.float32)
+
+        positions = np.arange(self._interpolation_position, len(pooled_samples) - 1, self._interpolation_step)
+        downsampled = np.interp(positions, np.arange(len(pooled_samples)), pooled_samples).astype(np.float32)
+
+        # Keep the last pooled sample to interpolate across the boundary with the next block.
+        next_position = positions[-1] + self._interpolation_step if len(positions) > 0 else self._interpolation_position
+        self._interpolation_position = next_position - (len(pooled_samples) - 1)
+        self._pooled_samples = pooled_samples[-1:]
+
+        return downsampled
+
+    def update(self, samples):
+        '''
+        Feeds a block of mono samples to the fingerprinter.
+
+        '''
+
+        samples = np.asarray(samples, dtype=np.float32)
+        self.sample_count += len(samples)
+        self._downsampled = np.concatenate((self._downsampled, self._downsample(samples)))
+
+        frame_count = (len(self._downsampled) - _FRAME_SIZE) // _HOP_SIZE + 1
+        if frame_count <= 0: return
+
+        frames = np.lib.stride_tricks.as_strided(self._downsampled, shape=(frame_count, _FRAME_SIZE),
+            strides=(self._downsampled.strides[0] * _HOP_SIZE, self._downsampled.strides[0]))
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2
+        band_energies = np.add.reduceat(spectrum, self._band_bins, axis=1)[:, :_BAND_COUNT]
+        band_differences = band_energies[:, :-1] - band_energies[:, 1:]
+
+        if self._previous_band_differences is not None:
+            band_differences = np.vstack((self._previous_band_differences, band_differences))
+
+        bits = (band_differences[1:] - band_differences[:-1]) > 0
+        weights = np.left_shift(np.uint32(1), np.arange(_BAND_COUNT - 1, dtype=np.uint32))
+        self._values.append((bits * weights).sum(axis=1).astype(np.uint32))
+
+        self._previous_band_differences = band_differences[-1:]
+        self._downsampled = self._downsampled[frame_count * _HOP_SIZE:].copy()
+
+    def get_fingerprint(self):
+        '''
+        Gets the fingerprint of all the samples fed so far.
+
+        '''
+
+        values = np.concatenate(self._values) if self._values else np.zeros(0, dtype=np.uint32)
+        return AudioFingerprint(values, self.sample_count / self.sample_rate)
+
+def compute_fingerprint(blocks, sample_rate):
+    '''
+    Computes the fingerprint of a recording.
+
+    :param blocks:
+        An iterable of one-dimensional arrays of mono samples.
+    :param sample_rate:
+        The sample rate of the samples.
+
+    '''
+
+    fingerprinter = AudioFingerprinter(sample_rate)
+    for block in blocks:
+        fingerprinter.update(block)
+
+    return fingerprinter.get_fingerprint()
+
+class FingerprintIndex:
+    '''
+    A bounded index of fingerprints that finds the recording matching a fingerprint.
+
+    The (non-silent) sub-fingerprints of every indexed recording are stored in an inverted
+    index: a sorted array of the sub-fingerprints, with the recording and frame of each. A
+    lookup votes for (recording, frame offset) pairs using the sub-fingerprints that match
+    exactly, and only verifies the best candidates by their full bit error rate.
+
+    The index holds at most max_size recordings (the oldest ones are removed first), and the
+    recordings that were added more than timeout seconds ago can be removed with remove_expired.
+
+    '''
+
+    def __init__(self, max_bit_error_rate=DEFAULT_MAX_BIT_ERROR_RATE,
+        max_duration_difference=DEFAULT_MAX_DURATION_DIFFERENCE, min_frame_count=DEFAULT_MIN_FRAME_COUNT,
+        candidate_count=3, max_size=None, timeout=None):
+
+        self.max_bit_error_rate = max_bit_error_rate
+        self.max_duration_difference = max_duration_difference
+        self.min_frame_count = min_frame_count
+        self.candidate_count = candidate_count
+        self.max_size = max_size
+        self.timeout = timeout
+
+        # The indexed recordings, oldest first: a tuple of the key, the fingerprint, and the time
+        # at which it was added, for each fingerprint id.
+        self.entries = OrderedDict()
+        self._next_fingerprint_id = 0
+
+        self._values = np.zeros(0, dtype=np.uint32)
+        self._fingerprint_ids = np.zeros(0, dtype=np.int64)
+        self._frames = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, fingerprint, key, added_time=None):
+        '''
+        Adds a fingerprint to the index, removing the oldest fingerprints if the index is full.
+
+        :param fingerprint:
+            The fingerprint of the recording.
+        :param key:
+            The key of the recording (e.g. its blob uri).
+        :param added_time:
+            The time at which the fingerprint was added (default=None, in which case the current time is used).
+
+        '''
+
+        fingerprint_id = self._next_fingerprint_id
+        self._next_fingerprint_id += 1
+        self.entries[fingerprint_id] = (key, fingerprint, added_time if added_time is not None else time.time())
+
+        # Silence yields zero sub-fingerprints, which carry no information.
+        frames = np.flatnonzero(fingerprint.values)
+        values = np.concatenate((self._values, fingerprint.values[frames]))
+
+        # The postings are already sorted, so a stable sort merges the new ones in linear time.
+        order = np.argsort(values, kind='stable')
+        self._values = values[order]
+        self._fingerprint_ids = np.concatenate((self._fingerprint_ids, np.full(len(frames), fingerprint_id)))[order]
+        self._frames = np.concatenate((self._frames, frames))[order]
+
+        if self.max_size is not None and len(self.entries) > self.max_size:
+            self._remove([next(iter(self.entries)) for _ in range(len(self.entries) - self.max_size)])
+
+    def remove_expired(self, now=None):
+        '''
+        Removes the fingerprints that were added more than timeout seconds ago.
+
+        :returns:
+            The keys of the removed fingerprints.
+
+        '''
+
+        if self.timeout is None: return []
+        if now is None:
+            now = time.time()
+
+        expired_fingerprint_ids = []
+        for fingerprint_id, (_, _, added_time) in self.entries.items():
+            if now - added_time <= self.timeout: break
+            expired_fingerprint_ids.append(fingerprint_id)
+
+        return self._remove(expired_fingerprint_ids)
+
+    def _remove(self, fingerprint_ids):
+        if len(fingerprint_ids) == 0: return []
+
+        keys = [self.entries.pop(fingerprint_id)[0] for fingerprint_id in fingerprint_ids]
+        is_kept = ~np.isin(self._fingerprint_ids, fingerprint_ids)
+        self._values = self._values[is_kept]
+        self._fingerprint_ids = self._fingerprint_ids[is_kept]
+        self._frames = self._frames[is_kept]
+
+        return keys
+
+    def lookup(self, fingerprint):
+        '''
+        Finds the key of the recording matching a fingerprint.
+
+        :returns:
+            The key of the matching recording, or None if there is no match.
+
+        '''
+
+        query_frames = np.flatnonzero(fingerprint.values)
+        query_values = fingerprint.values[query_frames]
+        if len(query_values) == 0 or len(self._values) == 0: return None
+
+        # The range of postings of each sub-fingerprint of the query. Sub-fingerprints that are
+        # very common (such as those of a constant tone) are not selective, and are ignored.
+        starts = np.searchsorted(self._values, query_values, side='left')
+        counts = np.searchsorted(self._values, query_values, side='right') - starts
+        counts[counts > _MAX_POSTING_COUNT] = 0
+
+        posting_count = int(counts.sum())
+        if posting_count == 0: return None
+
+        first_indices = np.cumsum(counts) - counts
+        posting_indices = np.arange(posting_count) + np.repeat(starts - first_indices, counts)
+        fingerprint_ids = self._fingerprint_ids[posting_indices]
+        offsets = self._frames[posting_indices] - np.repeat(query_frames, counts)
+
+        # Every (fingerprint id, offset) pair is packed into a single integer, to count the votes.
+        candidates, votes = np.unique(fingerprint_ids * _OFFSET_RANGE + (offsets + _OFFSET_RANGE // 2), return_counts=True)
+
+        # Only the candidates with the most votes are verified: a copy of a recording, even a
+        # degraded one, shares many exact sub-fingerprints with it at the same offset.
+        for candidate in candidates[np.argsort(-votes, kind='stable')[:self.candidate_count]].tolist():
+            fingerprint_id, offset = divmod(candidate, _OFFSET_RANGE)
+            key, indexed_fingerprint, _ = self.entries[fingerprint_id]
+            if not self._is_duration_similar(indexed_fingerprint, fingerprint): continue
+
+            bit_error_rate, frame_count = indexed_fingerprint.get_bit_error_rate(fingerprint, offset - _OFFSET_RANGE // 2)
+            if frame_count < self.min_frame_count or bit_error_rate > self.max_bit_error_rate: continue
+
+            return key
+
+        return None
+
+    def _is_duration_similar(self, first, second):
+        duration = max(first.duration, second.duration)
+        return abs(first.duration - second.duration) <= self.max_duration_difference * duration
+
+class FingerprintStore:
+    '''
+    The fingerprints of the transcribed recordings, shared by every app process through a directory.
+
+    Every fingerprint is saved to its own file, whose name is appended (with the time at which it
+    was added) to a manifest file in the same directory. Every app process keeps the fingerprints
+    in its own bounded FingerprintIndex, which it brings up to date with the lines appended to the
+    manifest (by any process) before each lookup, so that only new fingerprints are ever read.
+    Fingerprints expire, and their files are removed, after a timeout.
+
+    '''
+
+    def __init__(self):
+        self.directory = None
+        self.index = None
+        self._manifest_size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = Path(app.instance_path) / app.config['FINGERPRINT_DIRECTORY']
+        self.index = FingerprintIndex(max_size=app.config['FINGERPRINT_INDEX_SIZE'], timeout=app.config['FINGERPRINT_TIMEOUT'])
+        self._manifest_size = 0
+
+    @property
+    def manifest_filepath(self):
+        return self.directory / _MANIFEST_FILENAME
+
+    def add(self, fingerprint, key):
+        '''
+        Saves the fingerprint of a recording. It is indexed (by every app process) on the next lookup.
+
+        :param fingerprint:
+            The fingerprint of the recording.
+        :param key:
+            The key of the recording (e.g. its blob uri).
+
+        '''
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Every fingerprint has its own file (even if its key was added before), so that removing an
+        # expired fingerprint never removes a newer one. The file is written under a temporary name
+        # and then renamed, so that it is never read partially written.
+        filepath = self.directory / (str(uuid.uuid4()) + _FINGERPRINT_EXTENSION)
+        tmp_filepath = filepath.with_name('{}.{}.tmp'.format(filepath.name, uuid.uuid4()))
+        with open(tmp_filepath, 'wb') as file:
+            np.savez(file, values=fingerprint.values, duration=fingerprint.duration, key=np.array(key))
+
+        os.replace(tmp_filepath, filepath)
+
+        # A single short write in append mode is not interleaved with the writes of other processes.
+        with open(self.manifest_filepath, 'a') as file:
+            file.write('{:.3f}\t{}\n'.format(time.time(), filepath.name))
+
+    def lookup(self, fingerprint):
+        '''
+        Finds the key of the recording matching a fingerprint.
+
+        :returns:
+            The key of the matching recording, or None if there is no match.
+
+        '''
+
+        with self._lock:
+            self._read_new_lines()
+            for filename, _ in self.index.remove_expired():
+                self._remove_file(self.directory / filename)
+
+            match = self.index.lookup(fingerprint)
+            return match[1] if match is not None else None
+
+    def _read_new_lines(self):
+        if not self.manifest_filepath.exists(): return
+        if os.path.getsize(self.manifest_filepath) == self._manifest_size: return
+
+        with open(self.manifest_filepath, 'rb') as file:
+            file.seek(self._manifest_size)
+            data = file.read()
+
+        # A partially written last line is read again the next time.
+        complete_length = data.rfind(b'\n') + 1
+        self._manifest_size += complete_length
+
+        now = time.time()
+        entries = []
+        for line in data[:complete_length].decode('utf-8').split('\n'):
+            if not line: continue
+
+            added_time, filename = line.split('\t')
+            added_time = float(added_time)
+            if now - added_time > self.index.timeout:
+                self._remove_file(self.directory / filename)
+            else:
+                entries.append((added_time, filename))
+
+        # Only the most recent fingerprints would be kept by the index anyway.
+        for added_time, filename in entries[-(self.index.max_size or len(entries)):]:
+            try:
+                with np.load(self.directory / filename, allow_pickle=False) as data:
+                    fingerprint = AudioFingerprint(data['values'], float(data['duration']))
+                    key = str(data['key'])
+            except FileNotFoundError:
+                # The fingerprint has been removed by another process.
+                continue
+
+            # The index is keyed by the file name (with the key), so that expired files can be removed.
+            self.index.add(fingerprint, (filename, key), added_time)
+
+    def _remove_file(self, filepath):
+        try:
+            filepath.unlink()
+        except FileNotFoundError:
+            pass
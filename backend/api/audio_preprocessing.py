@@ -0,0 +1,203 @@
+'''
+Block-based preprocessing of audio files in bounded memory.
+
+'''
+
+import numpy as np
+import soundfile
+import audioread
+import scipy.signal
+
+import api.hash_util as hash_util
+from api.audio_fingerprint import AudioFingerprinter
+from api.audio_segmentation import EnergyEnvelope
+
+'''
+The default number of frames read at a time.
+'''
+DEFAULT_BLOCK_SIZE = 65536
+
+'''
+The range of sample rates supported for LINEAR16 audio by the speech recognition API. Recordings
+with a native sample rate outside of this range are resampled to the nearest supported rate.
+'''
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+class AudioBlockReader:
+    '''
+    Reads an audio file as a sequence of blocks of mono float32 samples at its native sample rate.
+
+    Formats supported by libsndfile are read with soundfile; anything else (e.g. MP3 or AAC)
+    is decoded incrementally with audioread.
+
+    '''
+
+    def __init__(self, filepath, block_size=DEFAULT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._sound_file = None
+        self._audioread_file = None
+
+        try:
+            self._sound_file = soundfile.SoundFile(str(filepath))
+            self.sample_rate = self._sound_file.samplerate
+            self.channels = self._sound_file.channels
+        except RuntimeError:
+            self._audioread_file = audioread.audio_open(str(filepath))
+            self.sample_rate = self._audioread_file.samplerate
+            self.channels = self._audioread_file.channels
+
+    def __iter__(self):
+        if self._sound_file is not None:
+            for block in self._sound_file.blocks(blocksize=self.block_size, dtype='float32', always_2d=True):
+                yield block.mean(axis=1)
+        else:
+            # audioread yields buffers of interleaved, 16-bit signed little-endian samples.
+            for buffer in self._audioread_file:
+                samples = np.frombuffer(buffer, dtype='<i2').reshape(-1, self.channels)
+                yield samples.mean(axis=1, dtype=np.float32) / 32768
+
+    def close(self):
+        if self._sound_file is not None:
+            self._sound_file.close()
+        else:
+            self._audioread_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class AudioResampler:
+    '''
+    Resamples a stream of blocks of mono samples to another sample rate.
+
+    '''
+
+    def __init__(self, sample_rate, output_sample_rate):
+        '''
+        :param sample_rate:
+            The sample rate of the samples that will be fed to the resampler.
+        :param output_sample_rate:
+            The sample rate of the resampled samples.
+
+        '''
+
+        self.sample_rate = sample_rate
+        self.output_sample_rate = output_sample_rate
+
+        # Samples are low-pass filtered below the output Nyquist frequency before being
+        # downsampled, so that higher frequencies do not alias, and are then linearly interpolated.
+        self._filter = None
+        self._filter_state = None
+        if output_sample_rate < sample_rate:
+            self._filter = scipy.signal.butter(8, 0.9 * output_sample_rate / sample_rate, output='sos')
+            self._filter_state = np.zeros((self._filter.shape[0], 2))
+
+        self._interpolation_step = sample_rate / output_sample_rate
+        self._interpolation_position = 0.0
+        self._previous_samples = np.zeros(0, dtype=np.float32)
+
+    def update(self, samples):
+        '''
+        Resamples a block of mono samples.
+
+        :returns:
+            The resampled samples (which may be empty).
+
+        '''
+
+        samples = np.asarray(samples, dtype=np.float32)
+        if self._filter is not None:
+            samples, self._filter_state = scipy.signal.sosfilt(self._filter, samples, zi=self._filter_state)
+
+        samples = np.concatenate((self._previous_samples, samples))
+        if len(samples) < 2:
+            self._previous_samples = samples
+            return np.zeros(0, dtype=np.float32)
+
+        positions = np.arange(self._interpolation_position, len(samples) - 1, self._interpolation_step)
+        resampled = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+        # Keep the last sample to interpolate across the boundary with the next block.
+        next_position = positions[-1] + self._interpolation_step if len(positions) > 0 else self._interpolation_position
+        self._interpolation_position = next_position - (len(samples) - 1)
+        self._previous_samples = samples[-1:].astype(np.float32)
+
+        return resampled
+
+class PreprocessedAudio:
+    '''
+    The result of preprocessing an audio file.
+
+    '''
+
+    def __init__(self, filepath, sample_rate, sample_count, crc32_str, fingerprint, energies, energy_frame_size):
+        self.filepath = filepath
+        self.sample_rate = sample_rate
+        self.sample_count = sample_count
+        self.crc32_str = crc32_str
+        self.fingerprint = fingerprint
+        self.energies = energies
+        self.energy_frame_size = energy_frame_size
+
+    @property
+    def duration(self):
+        return self.sample_count / self.sample_rate
+
+def to_pcm16(samples):
+    '''
+    Converts float samples in the range [-1, 1] to 16-bit signed PCM, rounding to the nearest
+    integer and clipping any out-of-range samples.
+
+    '''
+
+    return np.round(np.clip(samples, -1, 1) * 32767).astype('<i2')
+
+def preprocess_audio(input_filepath, output_filepath, block_size=DEFAULT_BLOCK_SIZE):
+    '''
+    Converts an audio file to a mono, 16-bit PCM WAVE file at its native sample rate (clamped to
+    the range supported by the speech recognition API, see MIN_SAMPLE_RATE) in a single pass over blocks of the input, so memory usage is bounded by the block size rather than the
+    length of the recording. The PCM data is checksummed, fingerprinted and its energy envelope
+    (used to find silences) is measured as it is written.
+
+    :param input_filepath:
+        The path to the input audio file (of any format supported by soundfile or audioread).
+    :param output_filepath:
+        The path to the output WAVE file.
+    :param block_size:
+        The number of frames processed at a time (default=DEFAULT_BLOCK_SIZE, optional).
+
+    :returns:
+        A PreprocessedAudio object. The checksum covers the PCM data (and sample rate) only,
+        not the WAVE header, which is rewritten when the file is closed.
+
+    '''
+
+    with AudioBlockReader(input_filepath, block_size) as reader:
+        sample_rate = min(max(reader.sample_rate, MIN_SAMPLE_RATE), MAX_SAMPLE_RATE)
+        resampler = AudioResampler(reader.sample_rate, sample_rate) if sample_rate != reader.sample_rate else None
+
+        crc32 = hash_util.Crc32()
+        crc32.update(str(sample_rate).encode())
+        fingerprinter = AudioFingerprinter(sample_rate)
+        energy_envelope = EnergyEnvelope(sample_rate)
+
+        sample_count = 0
+        with soundfile.SoundFile(str(output_filepath), 'w', samplerate=sample_rate, channels=1,
+            subtype='PCM_16', format='WAV') as output_file:
+
+            for block in reader:
+                if resampler is not None:
+                    block = resampler.update(block)
+
+                pcm_block = to_pcm16(block)
+                output_file.write(pcm_block)
+                crc32.update(pcm_block.tobytes())
+                fingerprinter.update(block)
+                energy_envelope.update(block)
+                sample_count += len(block)
+
+        return PreprocessedAudio(output_filepath, sample_rate, sample_count,
+            crc32.hexdigest(), fingerprinter.get_fingerprint(), energy_envelope.get_energies(), energy_envelope.frame_size)
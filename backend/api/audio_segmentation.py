@@ -0,0 +1,93 @@
+'''
+Segmentation of a recording at its silences, so that it can be transcribed in chunks.
+
+'''
+
+import numpy as np
+
+'''
+The duration, in seconds, of the frames whose energy is measured.
+'''
+ENERGY_FRAME_DURATION = 0.02
+
+# The duration, in seconds, of the window over which the energy is averaged when looking for
+# a silence, so that a pause between words is preferred over a single quiet frame.
+_SILENCE_WINDOW_DURATION = 0.3
+
+class EnergyEnvelope:
+    '''
+    Computes the energy (mean square) of consecutive frames of a recording, in a single streaming
+    pass over its decoded mono samples.
+
+    '''
+
+    def __init__(self, sample_rate, frame_duration=ENERGY_FRAME_DURATION):
+        self.sample_rate = sample_rate
+        self.frame_size = max(1, int(round(sample_rate * frame_duration)))
+
+        self._pending_samples = np.zeros(0, dtype=np.float32)
+        self._energies = []
+
+    def update(self, samples):
+        '''
+        Feeds a block of mono samples to the envelope.
+
+        '''
+
+        samples = np.concatenate((self._pending_samples, np.asarray(samples, dtype=np.float32)))
+        usable_length = len(samples) - len(samples) % self.frame_size
+        self._pending_samples = samples[usable_length:]
+
+        frames = samples[:usable_length].reshape(-1, self.frame_size)
+        self._energies.append(np.mean(frames ** 2, axis=1))
+
+    def get_energies(self):
+        '''
+        Gets the energy of every complete frame fed so far.
+
+        '''
+
+        return np.concatenate(self._energies) if self._energies else np.zeros(0, dtype=np.float32)
+
+def find_split_points(energies, frame_size, chunk_duration, search_radius, sample_rate):
+    '''
+    Finds where to split a recording into chunks of about chunk_duration seconds. Every split
+    point is placed in the quietest stretch of audio within search_radius seconds of the ideal
+    boundary, so that words are not cut in half.
+
+    :param energies:
+        The energy of every frame of the recording (see EnergyEnvelope).
+    :param frame_size:
+        The number of samples per frame.
+    :param chunk_duration:
+        The target duration of a chunk, in seconds.
+    :param search_radius:
+        The maximum distance between a split point and the ideal boundary, in seconds.
+    :param sample_rate:
+        The sample rate of the recording.
+
+    :returns:
+        A sorted list of the sample indices at which the recording should be split.
+
+    '''
+
+    frame_rate = sample_rate / frame_size
+    chunk_frame_count = int(chunk_duration * frame_rate)
+    radius_frame_count = int(min(search_radius, chunk_duration / 2) * frame_rate)
+    if chunk_frame_count <= 0 or len(energies) <= chunk_frame_count + radius_frame_count: return []
+
+    window_size = max(1, int(_SILENCE_WINDOW_DURATION * frame_rate))
+    smoothed_energies = np.convolve(energies, np.ones(window_size) / window_size, mode='same')
+
+    split_frames = []
+    previous_frame = 0
+    while previous_frame + chunk_frame_count + radius_frame_count < len(energies):
+        target_frame = previous_frame + chunk_frame_count
+        search_start = target_frame - radius_frame_count
+        search_end = min(len(energies), target_frame + radius_frame_count + 1)
+
+        split_frame = search_start + int(np.argmin(smoothed_energies[search_start:search_end]))
+        split_frames.append(split_frame)
+        previous_frame = split_frame
+
+    return [frame * frame_size for frame in split_frames]
@@ -1 +1,159 @@
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# The app cache, which shares results (and the state of jobs) between requests. A 'simple' cache
+# is local to each app process: deployments with several app processes should use a cache that
+# is shared between them (e.g. 'redis' or 'memcached').
+CACHE_TYPE = 'simple'
+
+# The number of background worker threads (per app process) that run transcription jobs. The
+# state of the jobs is stored in the app cache, so that any app process can answer polls (see
+# CACHE_TYPE). With a 'null' cache, jobs are disabled and their routes respond with a 503 error.
+JOB_WORKER_COUNT = 2
+
+# The number of seconds that the state of a job is kept for after it was last updated.
+JOB_TIMEOUT = 24 * 60 * 60
+
+# The speech recognition backend: either 'google' (the Google Cloud Speech-to-Text API) or
+# 'replay' (transcripts recorded in TRANSCRIPTION_REPLAY_DIRECTORY, which works offline).
+TRANSCRIPTION_BACKEND = 'google'
+TRANSCRIPTION_LANGUAGE_CODE = 'en-US'
+TRANSCRIPTION_REPLAY_DIRECTORY = 'transcripts'
+
+# If set, every transcript is recorded to this directory (relative to the instance folder) for replay.
+TRANSCRIPTION_RECORD_DIRECTORY = None
+
+# If set, recordings are split at their silences into chunks of about this many seconds (each
+# split is placed within TRANSCRIPTION_CHUNK_SEARCH_RADIUS seconds of the ideal boundary), which
+# are transcribed concurrently by up to TRANSCRIPTION_CHUNK_WORKERS threads and stitched back
+# together. Speaker tags are only consistent within a chunk.
+TRANSCRIPTION_CHUNK_DURATION = None
+TRANSCRIPTION_CHUNK_SEARCH_RADIUS = 10
+TRANSCRIPTION_CHUNK_WORKERS = 8
+
+# The maximum number of entries that each cache of results keeps in process (with LRU eviction),
+# and the number of seconds after which its entries expire. Except for the indexes, entries are
+# also shared with the other app processes through the app cache, with the same timeout.
+MATCH_RESULT_CACHE_SIZE = 1024
+MATCH_RESULT_CACHE_TIMEOUT = 60 * 60
+TRANSCRIPTION_CACHE_SIZE = 128
+TRANSCRIPTION_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+INPUT_HASH_CACHE_SIZE = 4096
+INPUT_HASH_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+TRANSCRIPT_INDEX_CACHE_SIZE = 64
+TRANSCRIPT_INDEX_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Every app process keeps the indexes of (at most) the CORPUS_INDEX_SIZE most recently transcribed
+# recordings resident for the corpus route, independently of the caches above.
+CORPUS_INDEX_SIZE = 1024
+
+# The fingerprints of the transcribed recordings are saved into FINGERPRINT_DIRECTORY (relative
+# to the instance folder), and expire after FINGERPRINT_TIMEOUT seconds. Every app process indexes
+# the fingerprints of (at most) the FINGERPRINT_INDEX_SIZE most recently transcribed recordings in
+# memory, which takes about 1 MB per hour of audio.
+FINGERPRINT_DIRECTORY = 'fingerprints'
+FINGERPRINT_INDEX_SIZE = 1000
+FINGERPRINT_TIMEOUT = 7 * 24 * 60 * 60
+
+# The context search model predicts (context, question) pairs in batches, which gather the
+# pairs of every segment of every concurrent request (in the same app process). A batch is
+# run once it holds CONTEXT_SEARCH_MAX_BATCH_SIZE pairs, or once its first pair has waited
+# for CONTEXT_SEARCH_MAX_BATCH_WAIT_TIME seconds. Since long pairs are split into several windows
+# (see below), the windows of a batch are themselves passed to the model CONTEXT_SEARCH_MAX_BATCH_SIZE
+# at a time.
+CONTEXT_SEARCH_MAX_BATCH_SIZE = 16
+CONTEXT_SEARCH_MAX_BATCH_WAIT_TIME = 0.01
+
+# Segment transcripts longer than CONTEXT_SEARCH_WINDOW_SIZE words are split into overlapping
+# windows for the context search model, the starts of which are CONTEXT_SEARCH_WINDOW_STRIDE words apart.
+CONTEXT_SEARCH_WINDOW_SIZE = 200
+CONTEXT_SEARCH_WINDOW_STRIDE = 100
+
+# If set, the app processes do not load the context search model themselves: they send their
+# inputs to a single model server listening on this Unix socket, which is started with
+# 'flask serve-model' (with the same configuration) and batches the inputs of every process.
+# The socket is only accessible to the user and group of the server, and its clients must have
+# the secret CONTEXT_SEARCH_MODEL_AUTHKEY (which is required to start the server).
+CONTEXT_SEARCH_MODEL_SOCKET = None
+CONTEXT_SEARCH_MODEL_AUTHKEY = None
+
+# The directory (relative to the instance folder) of the local cache of downloaded artifacts:
+# the NLTK data and the context search model files. Once an artifact is in the cache, it is
+# used without checking for downloads. Run 'flask warmup' to fill the cache ahead of time.
+ARTIFACT_DIRECTORY = 'artifacts'
+
+# If True, the context search model is loaded when the app starts. Otherwise, it is loaded
+# the first time that it is used.
+CONTEXT_SEARCH_MODEL_PRELOAD = False
+
+# Whether to print how long each step of the start of the app took.
+STARTUP_TIMING_REPORT = True
+
+# The sentence embedder of the semantic search: either 'hashing' (hashed word and character
+# trigram features) or 'bert' (mean-pooled BERT subtoken embeddings from the DeepPavlov
+# 'bert_embedder' model, which is downloaded into the artifact cache by 'flask warmup', or on
+# first use). The former needs no model, but it is only a lexical fallback: it matches sentences
+# that share words or stems, not sentences with the same meaning.
+SEMANTIC_SEARCH_EMBEDDER = 'hashing'
+
+# The number of sentences returned by a semantic search of a single recording.
+SEMANTIC_SEARCH_TOP_K = 10
+
+# Transcriptions with at least SEMANTIC_SEARCH_IVF_MIN_SENTENCES sentences have their sentence
+# embeddings partitioned into inverted lists, SEMANTIC_SEARCH_IVF_PROBES of which are searched
+# for a query. Smaller transcriptions are searched exhaustively.
+SEMANTIC_SEARCH_IVF_MIN_SENTENCES = 4096
+SEMANTIC_SEARCH_IVF_PROBES = 8
+
+# Whether the sentences of every transcription are embedded as soon as it is transcribed,
+# rather than on its first semantic search. A failure to embed them does not fail the
+# transcription: they are embedded again on the first semantic search.
+SEMANTIC_SEARCH_INDEX_ON_INGEST = True
+
+SEMANTIC_INDEX_CACHE_SIZE = 256
+SEMANTIC_INDEX_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# The storage backend of the preprocessed audio files: either 'google' (the Google Cloud Storage
+# bucket GOOGLE_CLOUD_STORAGE_BUCKET_NAME) or 'local' (LOCAL_STORAGE_DIRECTORY, relative to the
+# instance folder, served by the app itself).
+STORAGE_BACKEND = 'google'
+LOCAL_STORAGE_DIRECTORY = 'storage'
+
+# The file (relative to the instance folder) that records the blobs known to exist in the bucket,
+# so that their existence is not checked over the network.
+STORAGE_MANIFEST_FILENAME = 'storage_manifest.txt'
+
+# The file (relative to the instance folder) that records the uris of the transcribed recordings,
+# which are searched by the corpus route. It is shared by every app process.
+TRANSCRIBED_MANIFEST_FILENAME = 'transcribed_manifest.txt'
+
+# The number of seconds for which a signed URL is valid, and the number of seconds before its
+# expiration at which it stops being reused.
+SIGNED_URL_EXPIRATION = 60 * 60
+SIGNED_URL_EXPIRATION_MARGIN = 5 * 60
+
+# The maximum number of queries in a batch search request.
+BATCH_QUERY_MAX_QUERIES = 256
+
+# Every app process publishes a snapshot of its metrics to the app cache at most every
+# METRICS_PUBLISH_INTERVAL seconds, and the /metrics endpoint sums the snapshots of every
+# process. The snapshots of the processes that have not published for METRICS_SNAPSHOT_TIMEOUT
+# seconds (since they exited, or were idle) are folded into the totals of retired processes.
+METRICS_PUBLISH_INTERVAL = 10
+METRICS_SNAPSHOT_TIMEOUT = 10 * 60
+
+# Whether a structured (JSON) trace of every request, with the duration of each of its stages, is printed.
+REQUEST_TRACE_LOG = True
+
+# Whether requests can be profiled (with cProfile). A request is profiled if it sends the
+# PROFILE_REQUEST_HEADER header (whose value must be PROFILE_REQUEST_TOKEN, unless it is None),
+# or at random with a probability of PROFILE_SAMPLE_RATE. At most PROFILE_RATE_LIMIT requests
+# are profiled per minute in each app process. The profiles are saved into PROFILE_DIRECTORY
+# (relative to the instance folder), which keeps the latest PROFILE_MAX_COUNT profiles, and
+# are served by the '/profiles/<profile_id>' route.
+PROFILE_ENABLED = False
+PROFILE_REQUEST_HEADER = 'X-Profile'
+PROFILE_REQUEST_TOKEN = None
+PROFILE_SAMPLE_RATE = 0
+PROFILE_RATE_LIMIT = 6
+PROFILE_DIRECTORY = 'profiles'
+PROFILE_MAX_COUNT = 100
@@ -17,4 +17,12 @@ def init_app(app):
 
     app.register_error_handler(exceptions.BadContentTypeError, error_response)
     app.register_error_handler(exceptions.InvalidDataError, error_response)
-    app.register_error_handler(exceptions.AudioFileLoadError, error_response)
\ No newline at end of file
+    app.register_error_handler(exceptions.AudioFileLoadError, error_response)
+    app.register_error_handler(exceptions.JobNotFoundError, error_response)
+    app.register_error_handler(exceptions.JobNotFinishedError, error_response)
+    app.register_error_handler(exceptions.TranscriptionNotFoundError, error_response)
+    app.register_error_handler(exceptions.TranscriptionError, error_response)
+    app.register_error_handler(exceptions.BlobNotFoundError, error_response)
+    app.register_error_handler(exceptions.ProfileNotFoundError, error_response)
+    app.register_error_handler(exceptions.ModelServerError, error_response)
+    app.register_error_handler(exceptions.JobsDisabledError, error_response)
@@ -0,0 +1,110 @@
+'''
+Streaming responses that send the events of a long-running request (such as its progress and
+its matches) as they happen, as either newline-delimited JSON or Server-Sent Events.
+
+'''
+
+import json
+import queue
+import threading
+import traceback
+from enum import Enum
+
+from flask import Response, copy_current_request_context
+
+class StreamFormat(Enum):
+    '''
+    The format of a streaming response, identified by its mimetype.
+
+    '''
+
+    NDJSON = 'application/x-ndjson'
+    SSE = 'text/event-stream'
+
+def get_stream_format(accept_mimetypes):
+    '''
+    Gets the stream format requested by the Accept header of a request.
+
+    :returns:
+        The StreamFormat, or None if a regular JSON response should be sent.
+
+    '''
+
+    best_match = accept_mimetypes.best_match(['application/json'] + [stream_format.value for stream_format in StreamFormat])
+    if best_match is None or best_match == 'application/json': return None
+
+    return StreamFormat(best_match)
+
+def format_event(event_type, data, stream_format):
+    '''
+    Serializes an event. In NDJSON, the type of the event is stored in its 'event' key.
+
+    '''
+
+    if stream_format == StreamFormat.SSE:
+        return 'event: {}\ndata: {}\n\n'.format(event_type, json.dumps(data, default=float))
+
+    return json.dumps(dict(event=event_type, **data), default=float) + '\n'
+
+def get_error_event_data(exception):
+    '''
+    Gets the data of the event that reports an exception, in the same shape as an error response.
+
+    '''
+
+    if hasattr(exception, 'code') and hasattr(exception, 'description'):
+        data = {} if getattr(exception, 'data', None) is None else exception.data
+        return dict(status_code=exception.code, error=exception.description, success=False, **data)
+
+    traceback.print_exception(type(exception), exception, exception.__traceback__)
+    return dict(status_code=500, error='Internal server error', success=False)
+
+def stream_events(produce, stream_format, heartbeat_interval=15):
+    '''
+    Creates a response that streams the events of a function as it runs.
+
+    The function runs in its own thread (inside a copy of the request context), so that events
+    are sent while it is blocked. If it raises an exception, an 'error' event is sent. A comment
+    (SSE) or an empty line (NDJSON) is sent whenever no event has been sent for a while, so that
+    idle connections are not closed by proxies.
+
+    :param produce:
+        A function taking an 'emit' function, which it calls with the type of each event and
+        its data as keyword arguments.
+    :param stream_format:
+        The StreamFormat of the response.
+    :param heartbeat_interval:
+        The maximum number of seconds between two writes (default=15, optional).
+
+    '''
+
+    events = queue.Queue()
+
+    @copy_current_request_context
+    def run():
+        try:
+            produce(lambda event_type, **data: events.put((event_type, data)))
+        except Exception as exception:
+            events.put(('error', get_error_event_data(exception)))
+        finally:
+            events.put(None)
+
+    def generate():
+        while True:
+            try:
+                event = events.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                yield ':\n\n' if stream_format == StreamFormat.SSE else '\n'
+                continue
+
+            if event is None: return
+            yield format_event(event[0], event[1], stream_format)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    response = Response(generate(), mimetype=stream_format.value)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies (e.g. nginx) from buffering the events.
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    return response
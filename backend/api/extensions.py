@@ -4,24 +4,105 @@ To avoid circular dependencies, all extensions are housed in this module.
 They are initialized in application.py.
 '''
 
-import nltk
+import time
 import click
+import threading
 
 from pathlib import Path
 from flask_caching import Cache
+from flask import current_app
 from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
-from api.ml import ContextSearchModel
+from api.ml import ContextSearchModel, InferenceScheduler, ModelServer, ModelClient, \
+    HashingSentenceEmbedder, BertSentenceEmbedder
+from api.jobs import JobRunner
+from api import metrics, profiling
+from api.result_cache import ResultCache
+from api.artifacts import ArtifactCache, register_nltk_data, ensure_nltk_data
+from api.audio_fingerprint import FingerprintStore
+from api.search import CorpusIndex
+from api.transcription import create_backend as create_transcription_backend
+from api.storage import BlobManifest, create_backend as create_storage_backend
 
 db = SQLAlchemy()
 migrate = Migrate(db=db)
 cache = Cache()
 cors = CORS()
+job_runner = JobRunner(cache)
+artifact_cache = ArtifactCache()
+fingerprint_store = FingerprintStore()
+corpus_index = CorpusIndex()
+
+# The caches of computed results. The indexes are only kept in process, since they are
+# cheap to rebuild from a transcription but expensive to serialize.
+match_result_cache = ResultCache('match_result', 'MATCH_RESULT_CACHE', cache)
+transcription_cache = ResultCache('transcription', 'TRANSCRIPTION_CACHE', cache)
+input_hash_cache = ResultCache('input_hash', 'INPUT_HASH_CACHE', cache)
+transcript_index_cache = ResultCache('transcript_index', 'TRANSCRIPT_INDEX_CACHE')
+fuzzy_index_cache = ResultCache('fuzzy_index', 'TRANSCRIPT_INDEX_CACHE')
+
+# Sentence embeddings are expensive to compute, so semantic indexes are shared between processes.
+semantic_index_cache = ResultCache('semantic_index', 'SEMANTIC_INDEX_CACHE', cache)
+
+def get_result_caches():
+    return [match_result_cache, transcription_cache, input_hash_cache, transcript_index_cache,
+        fuzzy_index_cache, semantic_index_cache]
+
 _context_search_model = None
+_context_search_scheduler = None
+_context_search_scheduler_lock = threading.Lock()
+_sentence_embedder = None
+_sentence_embedder_lock = threading.Lock()
+_transcription_backend = None
+_storage_backend = None
+_transcribed_manifest = None
 
 def get_context_search_model(): return _context_search_model
+def get_transcription_backend(): return _transcription_backend
+def get_storage_backend(): return _storage_backend
+def get_transcribed_manifest(): return _transcribed_manifest
+
+def get_context_search_scheduler():
+    '''
+    Gets the scheduler of the context search model, loading the model the first time it is needed.
+
+    '''
+
+    global _context_search_scheduler
+    with _context_search_scheduler_lock:
+        if _context_search_scheduler is None:
+            _context_search_scheduler = create_context_search_scheduler(current_app)
+
+    return _context_search_scheduler
+
+def get_sentence_embedder():
+    '''
+    Gets the sentence embedder of the semantic search, creating it the first time it is needed.
+
+    '''
+
+    global _sentence_embedder
+    with _sentence_embedder_lock:
+        if _sentence_embedder is None:
+            _sentence_embedder = create_sentence_embedder(current_app)
+
+    return _sentence_embedder
+
+def create_sentence_embedder(app):
+    '''
+    Creates the sentence embedder specified by SEMANTIC_SEARCH_EMBEDDER: either 'hashing' or 'bert'.
+
+    '''
+
+    embedder_name = app.config['SEMANTIC_SEARCH_EMBEDDER']
+    if embedder_name == 'hashing':
+        return HashingSentenceEmbedder()
+    elif embedder_name == 'bert':
+        return BertSentenceEmbedder(ensure_sentence_embedder_files())
+    else:
+        raise ValueError('Unknown sentence embedder \'{}\'.'.format(embedder_name))
 
 def init_app(app):
     '''
@@ -34,13 +115,73 @@ def init_app(app):
     db.init_app(app)
     migrate.init_app(app)
     cache.init_app(app)
+    job_runner.init_app(app)
+    artifact_cache.init_app(app)
+    fingerprint_store.init_app(app)
+    corpus_index.init_app(app)
+    metrics.init_app(app, cache)
+    profiling.init_app(app)
+    for result_cache in get_result_caches():
+        result_cache.init_app(app)
 
     app.cli.add_command(__init_db_command)
+    app.cli.add_command(__serve_model_command)
+    app.cli.add_command(__warmup_command)
 
-    nltk.download('punkt', quiet=True)
+    # The NLTK data is downloaded into the artifact cache (if needed) when it is first used.
+    register_nltk_data(artifact_cache)
+
+    global _transcription_backend, _storage_backend, _transcribed_manifest
+    _transcription_backend = create_transcription_backend(app.config, app.instance_path)
+    _storage_backend = create_storage_backend(app.config, app.instance_path)
+    _transcribed_manifest = BlobManifest(Path(app.instance_path) / app.config['TRANSCRIBED_MANIFEST_FILENAME'])
+
+    # With a model server, the model is only loaded by the server process (see 'serve-model').
+    global _context_search_scheduler
+    if app.config['CONTEXT_SEARCH_MODEL_SOCKET']:
+        if not app.config['CONTEXT_SEARCH_MODEL_AUTHKEY']:
+            raise ValueError('CONTEXT_SEARCH_MODEL_AUTHKEY must be set to use the model server.')
+
+        _context_search_scheduler = ModelClient(app.config['CONTEXT_SEARCH_MODEL_SOCKET'],
+            app.config['CONTEXT_SEARCH_MODEL_AUTHKEY'])
+    elif app.config['CONTEXT_SEARCH_MODEL_PRELOAD']:
+        _context_search_scheduler = create_context_search_scheduler(app)
+
+def ensure_model_files():
+    '''
+    Gets the directory of the context search model files, downloading them first if they are
+    not in the artifact cache yet.
+
+    '''
+
+    return artifact_cache.ensure('context_search_model', ContextSearchModel.ARTIFACT_VERSION, ContextSearchModel.download)
+
+def ensure_sentence_embedder_files():
+    return artifact_cache.ensure('sentence_embedder', BertSentenceEmbedder.ARTIFACT_VERSION, BertSentenceEmbedder.download)
+
+def create_context_search_scheduler(app):
+    '''
+    Loads the context search model and creates the scheduler that batches its predictions.
+
+    '''
+
+    start_time = time.time()
 
     global _context_search_model
-    _context_search_model = ContextSearchModel()
+    _context_search_model = ContextSearchModel(window_size=app.config['CONTEXT_SEARCH_WINDOW_SIZE'],
+        window_stride=app.config['CONTEXT_SEARCH_WINDOW_STRIDE'], max_batch_size=app.config['CONTEXT_SEARCH_MAX_BATCH_SIZE'],
+        root_path=ensure_model_files())
+
+    print('Loading the context search model took {:.3f} seconds'.format(time.time() - start_time))
+
+    def predict_batch(*inputs):
+        metrics.inference_batch_size.observe(len(inputs))
+        with metrics.measure_stage('model_batch'):
+            return _context_search_model.predict_answers(*inputs)
+
+    return InferenceScheduler(predict_batch,
+        max_batch_size=app.config['CONTEXT_SEARCH_MAX_BATCH_SIZE'],
+        max_wait_time=app.config['CONTEXT_SEARCH_MAX_BATCH_WAIT_TIME'])
 
 @click.command('init-db')
 @with_appcontext
@@ -53,4 +194,41 @@ def __init_db_command():
     confirmation = click.confirm('Are you sure you would like to continue? This will drop and recreate all tables in the database.')  
     if confirmation:
         db.create_all()
-        click.echo('Initialized the database: dropped and recreated all tables.')
\ No newline at end of file
+        click.echo('Initialized the database: dropped and recreated all tables.')
+
+@click.command('serve-model')
+@with_appcontext
+def __serve_model_command():
+    '''
+    The 'serve-model' shell command. Serves the context search model to the app processes
+    over the Unix socket at CONTEXT_SEARCH_MODEL_SOCKET.
+
+    '''
+
+    socket_path = current_app.config['CONTEXT_SEARCH_MODEL_SOCKET']
+    if not socket_path:
+        raise click.UsageError('CONTEXT_SEARCH_MODEL_SOCKET is not set.')
+
+    authkey = current_app.config['CONTEXT_SEARCH_MODEL_AUTHKEY']
+    if not authkey:
+        raise click.UsageError('CONTEXT_SEARCH_MODEL_AUTHKEY is not set.')
+
+    scheduler = create_context_search_scheduler(current_app)
+    click.echo('Serving the context search model on {}.'.format(socket_path))
+    ModelServer(scheduler, socket_path, authkey).serve_forever()
+
+@click.command('warmup')
+@with_appcontext
+def __warmup_command():
+    '''
+    The 'warmup' shell command. Downloads every artifact that is not in the artifact cache yet,
+    so that the app processes start without touching the network.
+
+    '''
+
+    ensure_nltk_data(artifact_cache)
+    ensure_model_files()
+    if current_app.config['SEMANTIC_SEARCH_EMBEDDER'] == 'bert':
+        ensure_sentence_embedder_files()
+
+    click.echo('The artifact cache is ready: {}'.format(artifact_cache.directory))
@@ -22,4 +22,45 @@ def get_md5_str(string):
     return hashlib.md5(string.encode()).hexdigest()
 
 def get_sha1_str(string):
-    return hashlib.sha1(string.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.sha1(string.encode()).hexdigest()
+
+def write_chunks_and_get_md5_str(chunks, destination):
+    '''
+    Writes chunks of bytes to a file as they arrive, hashing them incrementally.
+
+    :param chunks:
+        An iterable of bytes.
+    :param destination:
+        A writable file-like object.
+    :returns:
+        The hex digest of the MD5 hash of the written bytes.
+    '''
+
+    file_hash = hashlib.md5()
+    for chunk in chunks:
+        destination.write(chunk)
+        file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+def copy_and_get_md5_str(source, destination, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Copies a file-like object to another one chunk by chunk, hashing the chunks incrementally.
+    This never holds more than a single chunk in memory.
+    '''
+
+    return write_chunks_and_get_md5_str(iter(lambda: source.read(chunk_size), b''), destination)
+
+class Crc32:
+    '''
+    Computes a CRC32 checksum incrementally, as chunks become available.
+    '''
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, chunk):
+        self.value = zlib.crc32(chunk, self.value)
+
+    def hexdigest(self):
+        return "%X" % (self.value & 0xFFFFFFFF)
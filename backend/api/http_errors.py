@@ -35,4 +35,102 @@ class AudioFileLoadError(Exception):
 
     def __init__(self, filepath, exception):
         self.description = 'Failed to load audio file ({}). Error: {}'.format(filepath, exception)
-        self.data = None
\ No newline at end of file
+        self.data = None
+
+class JobNotFoundError(Exception):
+    '''
+    Raised when a job does not exist (or has expired).
+
+    '''
+
+    code = 404
+
+    def __init__(self, job_id):
+        self.description = 'Job \'{}\' does not exist.'.format(job_id)
+        self.data = None
+
+class JobNotFinishedError(Exception):
+    '''
+    Raised when the result of a job that has not succeeded is requested.
+
+    '''
+
+    code = 409
+
+    def __init__(self, job):
+        self.description = 'Job \'{}\' has not succeeded (status: {}).'.format(job.id, job.status.value)
+        self.data = {
+            'job': job.to_dict()
+        }
+
+class TranscriptionNotFoundError(Exception):
+    '''
+    Raised when the transcription of a recording is no longer available.
+
+    '''
+
+    code = 404
+
+    def __init__(self, blob_uri):
+        self.description = 'The transcription of \'{}\' is no longer available.'.format(blob_uri)
+        self.data = None
+
+class TranscriptionError(Exception):
+    '''
+    Raised when a recording fails to be transcribed.
+
+    '''
+
+    code = 502
+
+    def __init__(self, message):
+        self.description = 'Failed to transcribe recording. Error: {}'.format(message)
+        self.data = None
+
+class BlobNotFoundError(Exception):
+    '''
+    Raised when a stored blob does not exist.
+
+    '''
+
+    code = 404
+
+    def __init__(self, blob_name):
+        self.description = 'Blob \'{}\' does not exist.'.format(blob_name)
+        self.data = None
+
+class ProfileNotFoundError(Exception):
+    '''
+    Raised when a request profile does not exist (or has been removed).
+
+    '''
+
+    code = 404
+
+    def __init__(self, profile_id):
+        self.description = 'Profile \'{}\' does not exist.'.format(profile_id)
+        self.data = None
+
+class ModelServerError(Exception):
+    '''
+    Raised when the model server fails to predict the inputs of a request (or cannot be reached).
+
+    '''
+
+    code = 503
+
+    def __init__(self, message):
+        self.description = 'The model server failed to predict. Error: {}'.format(message)
+        self.data = None
+
+class JobsDisabledError(Exception):
+    '''
+    Raised when a job route is requested while jobs are disabled (see JOB_WORKER_COUNT).
+
+    '''
+
+    code = 503
+
+    def __init__(self):
+        self.description = 'Jobs are disabled, since the app has no cache to store their state in.'
+        self.data = None
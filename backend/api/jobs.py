@@ -0,0 +1,118 @@
+'''
+Background jobs that run in a pool of worker threads.
+
+The state of every job is stored in the cache, so that it can be polled from any app process.
+
+'''
+
+import time
+import uuid
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
+
+# The cache types (of Flask-Caching) that store nothing, with which jobs could never be polled.
+_NULL_CACHE_TYPES = ('null', 'flask_caching.backends.null', 'flask_caching.backends.NullCache')
+
+class JobStatus(Enum):
+    '''
+    The status of a job.
+
+    '''
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+class Job:
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.status = JobStatus.PENDING
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.created_time = self.updated_time = time.time()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status.value,
+            'stage': self.stage,
+            'error': self.error,
+            'created_time': self.created_time,
+            'updated_time': self.updated_time
+        }
+
+class JobRunner:
+    '''
+    Runs jobs in a pool of background worker threads, each inside an app context.
+
+    '''
+
+    def __init__(self, cache):
+        '''
+        :param cache:
+            The cache used to store the state of jobs.
+
+        '''
+
+        self.cache = cache
+        self.app = None
+        self.is_enabled = False
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        self.is_enabled = app.config.get('CACHE_TYPE', 'null') not in _NULL_CACHE_TYPES
+        if not self.is_enabled:
+            print('Jobs are disabled, since the app cache (CACHE_TYPE) is \'null\' and cannot store their state.')
+            return
+
+        self._executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKER_COUNT'])
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Submits a job. The job function is called with the specified arguments, and with a
+        'report_stage' keyword argument: a function taking the name of the current stage of the job.
+        Its return value becomes the result of the job.
+
+        :returns:
+            The submitted job.
+
+        '''
+
+        job = Job()
+        self.save(job)
+        self._executor.submit(self._run, job, func, args, kwargs)
+
+        return job
+
+    def get(self, job_id):
+        return self.cache.get(self._get_cache_key(job_id))
+
+    def save(self, job):
+        job.updated_time = time.time()
+        self.cache.set(self._get_cache_key(job.id), job, timeout=self.app.config['JOB_TIMEOUT'])
+
+    def _run(self, job, func, args, kwargs):
+        with self.app.app_context():
+            job.status = JobStatus.RUNNING
+            self.save(job)
+
+            def report_stage(stage):
+                job.stage = stage
+                self.save(job)
+
+            try:
+                job.result = func(*args, report_stage=report_stage, **kwargs)
+                job.status = JobStatus.SUCCEEDED
+            except Exception as exception:
+                # The HTTP errors of the api carry their message in a description.
+                job.error = getattr(exception, 'description', None) or str(exception)
+                job.status = JobStatus.FAILED
+
+            self.save(job)
+
+    @staticmethod
+    def _get_cache_key(job_id):
+        return 'job_{}'.format(job_id)
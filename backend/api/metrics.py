@@ -0,0 +1,425 @@
+'''
+Metrics (latency histograms and counters) of the app, served in the Prometheus text format,
+and structured per-request traces of the duration of each stage of a request.
+
+Metrics are collected in process. Every app process publishes a snapshot of its metrics to the
+app cache every so often, so that the metrics endpoint (which may be handled by any process) can
+sum the metrics of all the processes.
+
+Every process publishes under its own slot, whose number is allocated atomically by the cache.
+The snapshots never expire, so that the sums never go down when a process exits: instead, the
+snapshots of the slots that have not been published to for a while are folded into the totals
+of the retired processes, and removed. A process whose slot was retired (since it was idle)
+moves to a new slot, and from then on only publishes what it counted since.
+
+'''
+
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+from contextlib import contextmanager
+
+from flask import request, has_request_context
+
+'''
+The upper bounds of the buckets of the duration histograms, in seconds.
+'''
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+'''
+The upper bounds of the buckets of the size histograms, in bytes.
+'''
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+_TRACE_ENVIRON_KEY = 'api.request_trace'
+
+_SLOT_COUNT_KEY = 'metrics_slot_count'
+_RETIRED_KEY = 'metrics_retired'
+_RETIRE_LOCK_KEY = 'metrics_retire_lock'
+
+def format_labels(label_names, label_values, extra_labels=()):
+    labels = list(zip(label_names, label_values)) + list(extra_labels)
+    if len(labels) == 0: return ''
+
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join('{}="{}"'.format(name, escape(value)) for name, value in labels) + '}'
+
+def format_bound(bound): return '+Inf' if bound == float('inf') else repr(float(bound))
+
+class Counter:
+    '''
+    A monotonically increasing count, for every combination of label values.
+
+    '''
+
+    type_name = 'counter'
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        label_values = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get_snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge_values(a, b): return a + b
+
+    @staticmethod
+    def subtract_values(a, b): return a - b
+
+    def format_samples(self, snapshot):
+        return ['{}{} {}'.format(self.name, format_labels(self.label_names, label_values), value)
+            for label_values, value in sorted(snapshot.items())]
+
+class Histogram:
+    '''
+    The distribution of observed values (such as durations) over fixed buckets, with their sum
+    and count, for every combination of label values.
+
+    '''
+
+    type_name = 'histogram'
+
+    def __init__(self, name, description, label_names=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        label_values = tuple(labels[name] for name in self.label_names)
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            bucket_counts, total = self._values.get(label_values, ([0] * len(self.buckets), 0))
+            bucket_counts[bucket_index] += 1
+            self._values[label_values] = (bucket_counts, total + value)
+
+    def get_snapshot(self):
+        with self._lock:
+            return {label_values: (list(bucket_counts), total) for label_values, (bucket_counts, total) in self._values.items()}
+
+    @staticmethod
+    def merge_values(a, b): return [x + y for x, y in zip(a[0], b[0])], a[1] + b[1]
+
+    @staticmethod
+    def subtract_values(a, b): return [x - y for x, y in zip(a[0], b[0])], a[1] - b[1]
+
+    def format_samples(self, snapshot):
+        samples = []
+        for label_values, (bucket_counts, total) in sorted(snapshot.items()):
+            cumulative_count = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative_count += bucket_count
+                samples.append('{}_bucket{} {}'.format(self.name,
+                    format_labels(self.label_names, label_values, [('le', format_bound(bound))]), cumulative_count))
+
+            labels = format_labels(self.label_names, label_values)
+            samples.append('{}_sum{} {}'.format(self.name, labels, total))
+            samples.append('{}_count{} {}'.format(self.name, labels, cumulative_count))
+
+        return samples
+
+class MetricsRegistry:
+    '''
+    The metrics of the app.
+
+    '''
+
+    def __init__(self):
+        self.metrics = []
+        self.shared_cache = None
+        self.publish_interval = None
+        self.snapshot_timeout = None
+
+        self._last_publish_time = 0
+        self._publish_lock = threading.Lock()
+
+        # The slot that this process publishes to, the snapshot that was last published (in full),
+        # and the snapshot that is subtracted from the published ones (see publish).
+        self._slot = None
+        self._slot_process_id = None
+        self._published_snapshot = {}
+        self._baseline_snapshot = {}
+
+    def init_app(self, app, shared_cache):
+        '''
+        :param shared_cache:
+            The app cache that the snapshots of the metrics of every process are published to.
+
+        '''
+
+        self.shared_cache = shared_cache
+        self.publish_interval = app.config['METRICS_PUBLISH_INTERVAL']
+        self.snapshot_timeout = app.config['METRICS_SNAPSHOT_TIMEOUT']
+
+    def counter(self, *args, **kwargs):
+        counter = Counter(*args, **kwargs)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(self, *args, **kwargs):
+        histogram = Histogram(*args, **kwargs)
+        self.metrics.append(histogram)
+        return histogram
+
+    def get_snapshot(self):
+        return {metric.name: metric.get_snapshot() for metric in self.metrics}
+
+    def publish(self, force=False):
+        '''
+        Publishes a snapshot of the metrics of this process to the shared cache, unless one was
+        published less than METRICS_PUBLISH_INTERVAL seconds ago.
+
+        '''
+
+        if self.shared_cache is None: return
+
+        with self._publish_lock:
+            if not force and time.time() - self._last_publish_time < self.publish_interval: return
+            self._last_publish_time = time.time()
+
+            slot = self._get_slot()
+            if slot is None: return
+
+            # Snapshots are published under the lock, so that an older one never overwrites a newer one.
+            snapshot = self.get_snapshot()
+            self.shared_cache.set(self._get_slot_key(slot), (time.time(),
+                self._subtract_snapshots(snapshot, self._baseline_snapshot)), timeout=0)
+            self._published_snapshot = snapshot
+
+    def _get_slot(self):
+        if self._slot_process_id != os.getpid():
+            # A forked process publishes its own metrics under a slot of its own.
+            self._slot = self.shared_cache.inc(_SLOT_COUNT_KEY)
+            self._slot_process_id = os.getpid()
+            self._published_snapshot = self._baseline_snapshot = {}
+        elif self._slot is not None and self._is_retired(self._slot):
+            # What was last published has been added to the retired totals, so it is not published again.
+            self._slot = self.shared_cache.inc(_SLOT_COUNT_KEY)
+            self._baseline_snapshot = self._published_snapshot
+
+        return self._slot
+
+    def _is_retired(self, slot):
+        first_slot, retired_slots, _ = self.shared_cache.get(_RETIRED_KEY) or (1, frozenset(), {})
+        return slot < first_slot or slot in retired_slots
+
+    @staticmethod
+    def _get_slot_key(slot): return 'metrics:{}'.format(slot)
+
+    def _merge_snapshots(self, snapshots):
+        merged_snapshot = {}
+        for metric in self.metrics:
+            merged_values = {}
+            for snapshot in snapshots:
+                for label_values, value in snapshot.get(metric.name, {}).items():
+                    merged_values[label_values] = metric.merge_values(merged_values[label_values], value) \
+                        if label_values in merged_values else value
+
+            merged_snapshot[metric.name] = merged_values
+
+        return merged_snapshot
+
+    def _subtract_snapshots(self, snapshot, baseline_snapshot):
+        subtracted_snapshot = {}
+        for metric in self.metrics:
+            baseline_values = baseline_snapshot.get(metric.name, {})
+            subtracted_snapshot[metric.name] = {label_values: metric.subtract_values(value, baseline_values[label_values])
+                if label_values in baseline_values else value for label_values, value in snapshot.get(metric.name, {}).items()}
+
+        return subtracted_snapshot
+
+    def get_merged_snapshot(self):
+        '''
+        Sums the snapshots published by every process (with an up-to-date snapshot of this process),
+        and the totals of the retired processes.
+
+        '''
+
+        if self.shared_cache is None: return self._merge_snapshots([self.get_snapshot()])
+
+        self.publish(force=True)
+        slot_count = self.shared_cache.get(_SLOT_COUNT_KEY)
+        if not slot_count: return self._merge_snapshots([self.get_snapshot()])
+
+        # The retired totals are read again after the snapshots, so that a slot that was retired
+        # in the meantime is counted exactly once (its snapshot is removed after it was retired).
+        first_slot, retired_slots, _ = self.shared_cache.get(_RETIRED_KEY) or (1, frozenset(), {})
+        slots = [slot for slot in range(first_slot, slot_count + 1) if slot not in retired_slots]
+        entries = self.shared_cache.get_many(*[self._get_slot_key(slot) for slot in slots]) if slots else []
+        first_slot, retired_slots, retired_snapshot = self.shared_cache.get(_RETIRED_KEY) or (1, frozenset(), {})
+
+        now = time.time()
+        snapshots = [retired_snapshot]
+        idle_slots = []
+        for slot, entry in zip(slots, entries):
+            if entry is None or slot < first_slot or slot in retired_slots: continue
+
+            snapshots.append(entry[1])
+            if now - entry[0] > self.snapshot_timeout:
+                idle_slots.append(slot)
+
+        if idle_slots:
+            self._retire(idle_slots)
+
+        return self._merge_snapshots(snapshots)
+
+    def _retire(self, idle_slots):
+        # Slots are retired by one process at a time, and the lock expires in case that process dies.
+        if not self.shared_cache.add(_RETIRE_LOCK_KEY, True, timeout=60): return
+
+        try:
+            first_slot, retired_slots, retired_snapshot = self.shared_cache.get(_RETIRED_KEY) or (1, frozenset(), {})
+            slots = [slot for slot in idle_slots if slot >= first_slot and slot not in retired_slots]
+            if not slots: return
+
+            # The snapshots are read again, in case their process has published since.
+            now = time.time()
+            idle_entries = [(slot, entry[1]) for slot, entry in zip(slots, self.shared_cache.get_many(
+                *[self._get_slot_key(slot) for slot in slots])) if entry is not None and now - entry[0] > self.snapshot_timeout]
+            if not idle_entries: return
+
+            retired_snapshot = self._merge_snapshots([retired_snapshot] + [snapshot for _, snapshot in idle_entries])
+            retired_slots = set(retired_slots).union(slot for slot, _ in idle_entries)
+            while first_slot in retired_slots:
+                retired_slots.remove(first_slot)
+                first_slot += 1
+
+            self.shared_cache.set(_RETIRED_KEY, (first_slot, frozenset(retired_slots), retired_snapshot), timeout=0)
+            for slot, _ in idle_entries:
+                self.shared_cache.delete(self._get_slot_key(slot))
+        finally:
+            self.shared_cache.delete(_RETIRE_LOCK_KEY)
+
+    def format_text(self):
+        '''
+        Formats the metrics of all the processes in the Prometheus text exposition format.
+
+        '''
+
+        snapshot = self.get_merged_snapshot()
+
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.description))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type_name))
+            lines.extend(metric.format_samples(snapshot[metric.name]))
+
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+request_duration = registry.histogram('syft_request_duration_seconds',
+    'The duration of requests, including any streamed response.', ['endpoint', 'method', 'status'])
+stage_duration = registry.histogram('syft_stage_duration_seconds',
+    'The duration of each stage of handling a request or job.', ['stage'])
+payload_size = registry.histogram('syft_payload_size_bytes',
+    'The size of input audio files and of responses.', ['payload'], buckets=SIZE_BUCKETS)
+audio_duration = registry.histogram('syft_audio_duration_seconds',
+    'The duration of the preprocessed input recordings.', buckets=(10, 30, 60, 300, 600, 1800, 3600, 7200, 14400))
+inference_batch_size = registry.histogram('syft_inference_batch_size',
+    'The number of inputs in each batch predicted by the context search model.', buckets=(1, 2, 4, 8, 16, 32, 64))
+cache_requests = registry.counter('syft_cache_requests_total',
+    'The number of lookups in each result cache, by result (hit or miss).', ['cache', 'result'])
+
+class RequestTrace:
+    '''
+    The trace of a request: the duration of each of its stages, and a few attributes.
+
+    '''
+
+    def __init__(self):
+        self.id = str(uuid.uuid4())
+        self.start_time = time.time()
+        self.stages = []
+        self.attributes = {}
+
+    def to_dict(self):
+        return dict(trace_id=self.id, start_time=self.start_time, stages=self.stages, **self.attributes)
+
+def get_request_trace():
+    '''
+    Gets the trace of the current request, or None outside of a request. The trace is stored in
+    the WSGI environment, so that it is shared with copies of the request context (such as the
+    one of a streaming response).
+
+    '''
+
+    if not has_request_context(): return None
+    return request.environ.get(_TRACE_ENVIRON_KEY)
+
+@contextmanager
+def measure_stage(stage):
+    '''
+    Measures the duration of a stage, and adds it to the trace of the current request (if any).
+
+    '''
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start_time
+        stage_duration.observe(duration, stage=stage)
+
+        trace = get_request_trace()
+        if trace is not None:
+            trace.stages.append({'stage': stage, 'duration': duration})
+
+def init_app(app, shared_cache):
+    '''
+    Registers the hooks that measure every request, and publish the metrics of this process.
+
+    '''
+
+    registry.init_app(app, shared_cache)
+    trace_log = app.config['REQUEST_TRACE_LOG']
+
+    @app.before_request
+    def start_request_trace():
+        request.environ[_TRACE_ENVIRON_KEY] = RequestTrace()
+
+    @app.after_request
+    def finish_request_trace(response):
+        trace = get_request_trace()
+        if trace is None: return response
+
+        endpoint = request.endpoint or 'unknown'
+        method = request.method
+        status = response.status_code
+        content_length = None if response.is_streamed else response.calculate_content_length()
+
+        # Streamed responses are only finished once they have been sent, when they are closed.
+        def finish():
+            duration = time.time() - trace.start_time
+            request_duration.observe(duration, endpoint=endpoint, method=method, status=status)
+            if content_length is not None:
+                payload_size.observe(content_length, payload='response')
+
+            if trace_log:
+                trace.attributes.update(endpoint=endpoint, method=method, status=status, duration=duration)
+                print(json.dumps(trace.to_dict(), default=str))
+
+            # The request context has been torn down by the time the response is closed.
+            with app.app_context():
+                registry.publish()
+
+        response.call_on_close(finish)
+        response.headers['X-Trace-Id'] = trace.id
+        return response
@@ -1 +1,4 @@
-from api.ml.context_search_model import ContextSearchModel
\ No newline at end of file
+from api.ml.context_search_model import ContextSearchModel
+from api.ml.inference_scheduler import InferenceScheduler
+from api.ml.model_server import ModelServer, ModelClient, ModelServerError
+from api.ml.sentence_embedders import SentenceEmbedder, HashingSentenceEmbedder, BertSentenceEmbedder
\ No newline at end of file
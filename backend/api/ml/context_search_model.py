@@ -2,17 +2,69 @@ import json
 import math
 import numpy as np
 
-from deeppavlov import build_model
 from pathlib import Path
+from api.ml.context_windows import split_context, merge_answers
 
 class ContextSearchModel:
     _CONFIG_FILE_NAME = 'model_config_squad_bert.json'
 
-    def __init__(self):
-        self.model_config_path = Path(__file__).absolute().parent / self._CONFIG_FILE_NAME
-        with open(self.model_config_path, 'r') as file:
+    '''
+    The version of the model files, as stored in an artifact cache.
+    '''
+    ARTIFACT_VERSION = 'squad_bert-1'
+
+    def __init__(self, window_size=200, window_stride=100, max_batch_size=None, root_path=None):
+        '''
+        :param window_size:
+            The maximum number of words of context passed to the model at once. Longer contexts are
+            split into overlapping windows by predict_answers (default=200, which fits in the maximum
+            sequence length of the model with room for the question).
+        :param window_stride:
+            The number of words between the starts of consecutive windows (default=100).
+        :param max_batch_size:
+            The maximum number of windows passed to the model at once by predict_answers
+            (default=None, in which case every window is passed at once).
+        :param root_path:
+            The directory that the model files were downloaded to with ContextSearchModel.download
+            (default=None, in which case they are downloaded, if needed, to the DeepPavlov directory).
+
+        '''
+
+        # DeepPavlov imports TensorFlow, which is only done once the model is actually needed.
+        from deeppavlov import build_model
+
+        self.window_size = window_size
+        self.window_stride = window_stride
+        self.max_batch_size = max_batch_size
+        self._model = build_model(self.get_model_config(root_path), download=root_path is None)
+
+    @classmethod
+    def get_model_config(cls, root_path=None):
+        '''
+        Loads the DeepPavlov configuration of the model.
+
+        :param root_path:
+            The directory of the model files (default=None, in which case the DeepPavlov directory is used).
+
+        '''
+
+        with open(Path(__file__).absolute().parent / cls._CONFIG_FILE_NAME, 'r') as file:
             model_config = json.load(file)
-            self._model = build_model(model_config, download=True)
+
+        if root_path is not None:
+            model_config['metadata']['variables']['ROOT_PATH'] = str(root_path)
+
+        return model_config
+
+    @classmethod
+    def download(cls, root_path):
+        '''
+        Downloads the model files to a directory.
+
+        '''
+
+        from deeppavlov.download import deep_download
+        deep_download(cls.get_model_config(root_path))
     
     def predict(self, *values):
         '''
@@ -44,3 +96,35 @@ class ContextSearchModel:
             predictions.append((answer, start_index, probability, logit))
 
         return predictions
+
+    def predict_answers(self, *values):
+        '''
+        Predicts the answers to a question given a context of any length. Long contexts are split
+        into overlapping windows, the windows of every context are predicted in batches of at most
+        max_batch_size windows, and the answers of the windows of each context are merged.
+
+        :param values:
+            A list of two-dimensional tuples containing two strings: the context and question.
+
+        :returns:
+            A list containing, for each context, a list of tuples containing a predicted answer, its
+            start index in the context, its probability and its logit, ranked by descending probability.
+        '''
+
+        context_windows = [split_context(context, self.window_size, self.window_stride) for context, _ in values]
+        window_values = [(window.text, question) for windows, (_, question) in zip(context_windows, values) for window in windows]
+
+        # A few long contexts can be split into many more windows than the batch size of the
+        # scheduler, which would exceed the memory of the model if they were predicted at once.
+        batch_size = self.max_batch_size or max(len(window_values), 1)
+        window_predictions = []
+        for i in range(0, len(window_values), batch_size):
+            window_predictions.extend(self.predict(*window_values[i:i + batch_size]))
+
+        answers = []
+        offset = 0
+        for windows in context_windows:
+            answers.append(merge_answers(windows, window_predictions[offset:offset + len(windows)]))
+            offset += len(windows)
+
+        return answers
@@ -0,0 +1,92 @@
+'''
+Splitting long contexts into overlapping windows, and merging the answers predicted in each window.
+
+'''
+
+import re
+
+_WORD_PATTERN = re.compile(r'[^ ]+')
+
+class ContextWindow:
+    '''
+    A window of consecutive words of a context.
+
+    '''
+
+    def __init__(self, text, char_offset):
+        '''
+        :param text:
+            The text of the window.
+        :param char_offset:
+            The character offset of the window in the context.
+
+        '''
+
+        self.text = text
+        self.char_offset = char_offset
+
+def split_context(context, window_size, stride):
+    '''
+    Splits a context into windows of window_size (space-separated) words, the starts of which are
+    stride words apart. The last window always ends with the last word of the context, so that every
+    word is covered. A context that fits in a single window is returned as is.
+
+    :param context:
+        The context to split.
+    :param window_size:
+        The maximum number of words in a window.
+    :param stride:
+        The number of words between the starts of consecutive windows. It should be smaller than
+        window_size so that answers spanning the boundary of one window are inside the next one.
+
+    :returns:
+        A list of ContextWindow objects, ordered by offset.
+
+    '''
+
+    word_spans = [match.span() for match in _WORD_PATTERN.finditer(context)]
+    if len(word_spans) <= window_size:
+        return [ContextWindow(context, 0)]
+
+    window_starts = list(range(0, len(word_spans) - window_size, stride))
+    window_starts.append(len(word_spans) - window_size)
+
+    windows = []
+    for start in window_starts:
+        char_start, char_end = word_spans[start][0], word_spans[start + window_size - 1][1]
+        windows.append(ContextWindow(context[char_start:char_end], char_start))
+
+    return windows
+
+def merge_answers(windows, predictions):
+    '''
+    Merges the answers predicted in the windows of a context.
+
+    :param windows:
+        The windows of the context.
+    :param predictions:
+        The prediction of each window: a tuple containing the predicted answer, the predicted start
+        index of the answer (in the window), the probability of the answer, and its logit.
+
+    :returns:
+        A list of tuples containing each answer, its start index in the context, its probability and
+        its logit, ranked by descending probability. Empty answers are dropped and, amongst answers
+        that overlap (e.g. the same answer predicted in two overlapping windows), only the most
+        probable one is kept.
+
+    '''
+
+    answers = []
+    for window, (answer, start_index, probability, logit) in zip(windows, predictions):
+        if not answer.strip() or start_index < 0: continue
+        answers.append((answer, window.char_offset + start_index, probability, logit))
+
+    answers.sort(key=lambda answer: answer[2], reverse=True)
+
+    merged_answers = []
+    for answer in answers:
+        start, end = answer[1], answer[1] + len(answer[0])
+        if any(start < other[1] + len(other[0]) and other[1] < end for other in merged_answers): continue
+        merged_answers.append(answer)
+
+    return merged_answers
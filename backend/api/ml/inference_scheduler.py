@@ -0,0 +1,110 @@
+'''
+Dynamic micro-batching of model inference.
+
+'''
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+class InferenceScheduler:
+    '''
+    Gathers the inputs submitted by any number of threads into batches, runs every batch
+    through a single call of a prediction function, and hands each prediction back to the
+    caller that submitted its input.
+
+    A batch is run as soon as it holds max_batch_size inputs, or once max_wait_time seconds
+    have elapsed since its first input was submitted, whichever comes first.
+
+    '''
+
+    def __init__(self, predict, max_batch_size=16, max_wait_time=0.01):
+        '''
+        :param predict:
+            The prediction function. It takes any number of inputs as positional arguments,
+            and returns a list containing the prediction of each input, in order.
+        :param max_batch_size:
+            The maximum number of inputs in a batch (default=16, optional).
+        :param max_wait_time:
+            The maximum number of seconds that an input waits for other inputs to join
+            its batch (default=0.01, optional).
+
+        '''
+
+        self._predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def submit(self, value):
+        '''
+        Submits an input to be predicted in the next batch.
+
+        :returns:
+            A Future resolving to the prediction of the input.
+
+        '''
+
+        self._ensure_worker()
+
+        future = Future()
+        self._queue.put((value, future))
+        return future
+
+    def predict(self, *values):
+        '''
+        Predicts many inputs, which are batched with each other and with the inputs of any
+        other caller. This blocks until every prediction is ready.
+
+        :returns:
+            A list containing the prediction of each input, in order.
+
+        '''
+
+        futures = [self.submit(value) for value in values]
+        return [future.result() for future in futures]
+
+    def _ensure_worker(self):
+        # The worker thread is started lazily in every process, since threads do not survive
+        # the fork of a (pre-forking) app server.
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid(): return
+
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run(self, batch_queue):
+        while True:
+            batch = [batch_queue.get()]
+            deadline = time.monotonic() + self.max_wait_time
+            while len(batch) < self.max_batch_size:
+                # Once the deadline has passed, only the inputs that are already queued are added.
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(batch_queue.get(block=timeout > 0, timeout=max(timeout, 0)))
+                except queue.Empty:
+                    break
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        batch = [(value, future) for value, future in batch if future.set_running_or_notify_cancel()]
+        if len(batch) == 0: return
+
+        try:
+            predictions = self._predict(*(value for value, _ in batch))
+        except Exception as exception:
+            for _, future in batch:
+                future.set_exception(exception)
+            return
+
+        for (_, future), prediction in zip(batch, predictions):
+            future.set_result(prediction)
@@ -0,0 +1,163 @@
+'''
+Serving a model from a single process to the other processes of the app over a Unix socket.
+
+Loading BERT in every app process multiplies its memory usage and start time by the number
+of processes. Instead, one model server process owns the model, and app processes send it
+their inputs. The server predicts the inputs of every connection through a single
+InferenceScheduler, so the inputs of all the app processes are batched together.
+
+The socket is only accessible to the user and group of the server, and every connection must
+authenticate with the shared authentication key, since the inputs are unpickled by the server.
+The authentication runs in the thread of the connection, with a timeout, so that a client that
+stalls during the handshake cannot hold up the other connections.
+
+'''
+
+import os
+import socket
+import struct
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, answer_challenge, deliver_challenge
+
+from api.http_errors import ModelServerError
+
+def set_connection_timeout(connection, timeout):
+    '''
+    Sets the timeout of the blocking reads and writes of a socket connection. A read or write that
+    times out raises a BlockingIOError.
+
+    :param timeout:
+        The timeout, in seconds, or 0 for no timeout.
+
+    '''
+
+    timeval = struct.pack('ll', int(timeout), int(timeout % 1 * 1e6))
+
+    # The options are set through a duplicate of the file descriptor, which shares the socket.
+    with socket.socket(fileno=os.dup(connection.fileno())) as connection_socket:
+        connection_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+        connection_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+
+class ModelServer:
+    '''
+    Serves the predictions of an InferenceScheduler over a Unix socket, with one thread per connection.
+
+    '''
+
+    def __init__(self, scheduler, socket_path, authkey, handshake_timeout=10):
+        '''
+        :param scheduler:
+            The InferenceScheduler that predicts the inputs received by the server.
+        :param socket_path:
+            The path of the Unix socket to listen on.
+        :param authkey:
+            The authentication key (a string) that the clients must have.
+        :param handshake_timeout:
+            The maximum time, in seconds, that a client can take to authenticate (default=10, optional).
+
+        '''
+
+        self.scheduler = scheduler
+        self.socket_path = str(socket_path)
+        self.authkey = authkey.encode('utf-8')
+        self.handshake_timeout = handshake_timeout
+
+    def serve_forever(self):
+        # A socket file left behind by a previous server would prevent binding.
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        # The socket is created without any permissions for other users, rather than restricted
+        # after it has been bound.
+        previous_umask = os.umask(0o117)
+        try:
+            # The connections are authenticated by their own threads, rather than by accept.
+            listener = Listener(self.socket_path, family='AF_UNIX')
+        finally:
+            os.umask(previous_umask)
+
+        with listener:
+            while True:
+                try:
+                    connection = listener.accept()
+                except OSError:
+                    continue
+
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def _handle_connection(self, connection):
+        with connection:
+            try:
+                set_connection_timeout(connection, self.handshake_timeout)
+                deliver_challenge(connection, self.authkey)
+                answer_challenge(connection, self.authkey)
+                set_connection_timeout(connection, 0)
+            except (AuthenticationError, EOFError, OSError):
+                # A client with the wrong key, or that disconnected or stalled while authenticating.
+                return
+
+            while True:
+                try:
+                    values = connection.recv()
+                except EOFError:
+                    return
+
+                try:
+                    response = (True, self.scheduler.predict(*values))
+                except Exception as exception:
+                    response = (False, str(exception))
+
+                connection.send(response)
+
+class ModelClient:
+    '''
+    Sends inputs to a model server. It has the same predict method as an InferenceScheduler,
+    so it can be used in its place. Every thread has its own connection to the server.
+
+    '''
+
+    def __init__(self, socket_path, authkey):
+        '''
+        :param socket_path:
+            The path of the Unix socket of the server.
+        :param authkey:
+            The authentication key (a string) of the server.
+
+        '''
+
+        self.socket_path = str(socket_path)
+        self.authkey = authkey.encode('utf-8')
+        self._local = threading.local()
+
+    def predict(self, *values):
+        '''
+        Predicts many inputs with the model server. This blocks until every prediction is ready.
+
+        :returns:
+            A list containing the prediction of each input, in order.
+
+        '''
+
+        try:
+            success, result = self._request(values)
+        except (EOFError, OSError, AuthenticationError):
+            # The connection may have been dropped by a restart of the server, so it is retried once.
+            self._local.connection = None
+            try:
+                success, result = self._request(values)
+            except (EOFError, OSError, AuthenticationError) as exception:
+                self._local.connection = None
+                raise ModelServerError('Cannot reach the model server at \'{}\' ({}).'.format(self.socket_path, exception))
+
+        if not success:
+            raise ModelServerError(result)
+
+        return result
+
+    def _request(self, values):
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = Client(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+
+        self._local.connection.send(list(values))
+        return self._local.connection.recv()
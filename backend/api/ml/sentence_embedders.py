@@ -0,0 +1,132 @@
+'''
+Sentence embedders, which map sentences to fixed-size vectors for semantic search.
+
+'''
+
+import re
+import zlib
+
+import numpy as np
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+class SentenceEmbedder:
+    '''
+    The interface of a sentence embedder.
+
+    '''
+
+    def embed(self, sentences):
+        '''
+        Embeds sentences.
+
+        :param sentences:
+            A list of strings.
+
+        :returns:
+            A two-dimensional float32 array containing the embedding of each sentence.
+
+        '''
+
+        raise NotImplementedError()
+
+class HashingSentenceEmbedder(SentenceEmbedder):
+    '''
+    Embeds a sentence as the signed feature hashes of its words and of their character trigrams.
+    This needs no model and takes microseconds per sentence, so it serves as a lexical fallback
+    for the BERT embedder (e.g. offline). The trigrams make sentences with words that share a
+    stem (or that were slightly misrecognized) similar, but, unlike a neural embedder, it does
+    not match synonyms.
+
+    '''
+
+    def __init__(self, dimension=1024, trigram_weight=0.5):
+        '''
+        :param dimension:
+            The dimension of the embeddings (default=1024, optional).
+        :param trigram_weight:
+            The weight of a character trigram feature relative to a word feature (default=0.5, optional).
+
+        '''
+
+        self.dimension = dimension
+        self.trigram_weight = trigram_weight
+
+    def _add_feature(self, vector, feature, weight):
+        # CRC32 is used rather than hash(), which is salted differently in every process.
+        feature_hash = zlib.crc32(feature.encode('utf-8'))
+        vector[feature_hash % self.dimension] += weight if feature_hash & 0x80000000 else -weight
+
+    def embed(self, sentences):
+        vectors = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        for vector, sentence in zip(vectors, sentences):
+            for word in _WORD_PATTERN.findall(sentence.lower()):
+                self._add_feature(vector, 'w:' + word, 1)
+
+                padded_word = '#{}#'.format(word)
+                for i in range(len(padded_word) - 2):
+                    self._add_feature(vector, 't:' + padded_word[i:i + 3], self.trigram_weight)
+
+        return vectors
+
+class BertSentenceEmbedder(SentenceEmbedder):
+    '''
+    Embeds a sentence as the mean of the BERT embeddings of its subtokens, using the
+    DeepPavlov 'bert_embedder' model.
+
+    '''
+
+    '''
+    The version of the model files, as stored in an artifact cache.
+    '''
+    ARTIFACT_VERSION = 'bert_embedder-1'
+
+    # The name of the output of the mean of the subtoken embeddings of a sentence, which differs
+    # between versions of the DeepPavlov config.
+    _OUTPUT_NAMES = ('mean_emb', 'sent_mean_embs')
+
+    def __init__(self, root_path=None, batch_size=32):
+        '''
+        :param root_path:
+            The directory that the model files were downloaded to with BertSentenceEmbedder.download
+            (default=None, in which case they are downloaded, if needed, to the DeepPavlov directory).
+        :param batch_size:
+            The number of sentences embedded at once (default=32, optional).
+
+        '''
+
+        from deeppavlov import build_model
+
+        model_config = self.get_model_config(root_path)
+        self.batch_size = batch_size
+        output_names = model_config['chainer']['out']
+        output_name = next((name for name in self._OUTPUT_NAMES if name in output_names), None)
+        if output_name is None:
+            raise ValueError('The bert_embedder config has no mean embedding output (its outputs are {}).'.format(output_names))
+
+        self._output_index = output_names.index(output_name)
+        self._model = build_model(model_config, download=root_path is None)
+
+    @staticmethod
+    def get_model_config(root_path=None):
+        from deeppavlov import configs
+        from deeppavlov.core.common.file import read_json
+
+        model_config = read_json(configs.embedder.bert_embedder)
+        if root_path is not None:
+            model_config['metadata']['variables']['ROOT_PATH'] = str(root_path)
+
+        return model_config
+
+    @staticmethod
+    def download(root_path):
+        from deeppavlov.download import deep_download
+        deep_download(BertSentenceEmbedder.get_model_config(root_path))
+
+    def embed(self, sentences):
+        vectors = []
+        for i in range(0, len(sentences), self.batch_size):
+            outputs = self._model(sentences[i:i + self.batch_size])
+            vectors.append(np.asarray(outputs[self._output_index], dtype=np.float32))
+
+        return np.concatenate(vectors) if vectors else np.zeros((0, 768), dtype=np.float32)
@@ -0,0 +1,239 @@
+'''
+On-demand profiling of single requests.
+
+A request is profiled (with cProfile) when it sends the profiling header, or at random with a
+configurable probability, subject to a rate limit, so that profiling can be left enabled in
+production. The profile is saved into the profile directory (under the instance folder), and
+its id (the id of the request trace) is returned in the 'X-Profile-Id' header. The profile can
+then be downloaded from the '/profiles/<profile_id>' route, and loaded with pstats (or viewed
+with snakeviz).
+
+Up to Python 3.11, only the thread handling the request is profiled: the batched inference of
+the context search model runs in the thread of the inference scheduler, so it shows up as time
+spent waiting for the prediction (the 'model_batch' stage of the request trace has its duration).
+From Python 3.12 onwards, cProfile records every thread of the process while it is enabled (and
+a profile does not say which thread a call ran in), so the profile also includes the work of the
+other threads, such as the inference scheduler, the job workers and any concurrent requests.
+In either case, the body of a streamed response is produced after the profile has been saved.
+
+'''
+
+import time
+import uuid
+import hmac
+import random
+import cProfile
+import threading
+from pathlib import Path
+from collections import deque
+
+from flask import request
+
+from api.metrics import get_request_trace
+
+_PROFILER_ENVIRON_KEY = 'api.profiler'
+_PROFILE_EXTENSION = '.prof'
+
+class RateLimiter:
+    '''
+    Allows at most a fixed number of events within a sliding window of time.
+
+    '''
+
+    def __init__(self, max_count, period=60):
+        '''
+        :param max_count:
+            The maximum number of events in any period.
+        :param period:
+            The duration of the window, in seconds (default=60, optional).
+
+        '''
+
+        self.max_count = max_count
+        self.period = period
+
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        '''
+        Records an event if the limit has not been reached.
+
+        :returns:
+            True if the event is allowed, or False otherwise.
+
+        '''
+
+        now = time.monotonic()
+        with self._lock:
+            while len(self._times) > 0 and now - self._times[0] >= self.period:
+                self._times.popleft()
+
+            if len(self._times) >= self.max_count: return False
+            self._times.append(now)
+            return True
+
+class RequestProfiler:
+    def __init__(self):
+        self.directory = None
+        self.header = None
+        self.token = None
+        self.sample_rate = 0
+        self.max_profiles = 0
+        self.rate_limiter = None
+
+        # Only one profiler can be active at a time in a process (from Python 3.12 onwards, enabling
+        # a second one fails), so concurrent requests are not profiled while a profile is running.
+        self._active_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = Path(app.instance_path) / app.config['PROFILE_DIRECTORY']
+        self.header = app.config['PROFILE_REQUEST_HEADER']
+        self.token = app.config['PROFILE_REQUEST_TOKEN']
+        self.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self.max_profiles = app.config['PROFILE_MAX_COUNT']
+        self.rate_limiter = RateLimiter(app.config['PROFILE_RATE_LIMIT'])
+
+    def is_requested(self):
+        '''
+        Gets whether the current request asks to be profiled, with the profiling header (whose value
+        must be the profiling token, if there is one).
+
+        '''
+
+        value = request.headers.get(self.header)
+        if value is None: return False
+        if self.token is None: return True
+
+        return hmac.compare_digest(value.encode('utf-8'), self.token.encode('utf-8'))
+
+    def should_profile(self):
+        if not (self.is_requested() or random.random() < self.sample_rate): return False
+        return self.rate_limiter.try_acquire()
+
+    def start(self):
+        '''
+        Starts profiling the current request, if it should be profiled.
+
+        '''
+
+        if not self.should_profile(): return
+        if not self._active_lock.acquire(blocking=False): return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (such as a debugger) is active.
+            self._active_lock.release()
+            return
+
+        request.environ[_PROFILER_ENVIRON_KEY] = profiler
+
+    def stop(self, profile_id):
+        '''
+        Stops profiling the current request (if it is profiled) and saves its profile.
+
+        :param profile_id:
+            The id of the profile.
+
+        :returns:
+            True if a profile was saved, or False otherwise.
+
+        '''
+
+        profiler = self.discard()
+        if profiler is None: return False
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.get_filepath(profile_id)))
+        self.remove_old_profiles()
+        return True
+
+    def discard(self):
+        '''
+        Stops profiling the current request (if it is profiled), without saving its profile.
+
+        :returns:
+            The stopped cProfile.Profile, or None if the request is not profiled.
+
+        '''
+
+        profiler = request.environ.pop(_PROFILER_ENVIRON_KEY, None)
+        if profiler is None: return None
+
+        try:
+            profiler.disable()
+        finally:
+            self._active_lock.release()
+
+        return profiler
+
+    def get_filepath(self, profile_id):
+        '''
+        Gets the path to the file of a profile.
+
+        :returns:
+            The path to the file, or None if the profile id is invalid.
+
+        '''
+
+        try:
+            profile_id = str(uuid.UUID(profile_id))
+        except ValueError:
+            return None
+
+        return self.directory / (profile_id + _PROFILE_EXTENSION)
+
+    def remove_old_profiles(self):
+        '''
+        Removes the oldest profiles, so that at most the maximum number of profiles are kept.
+
+        '''
+
+        profiles = []
+        for filepath in self.directory.glob('*' + _PROFILE_EXTENSION):
+            try:
+                profiles.append((filepath.stat().st_mtime, filepath))
+            except FileNotFoundError:
+                pass
+
+        profiles.sort()
+        for _, filepath in profiles[:max(0, len(profiles) - self.max_profiles)]:
+            try:
+                filepath.unlink()
+            except FileNotFoundError:
+                # Another process removed it first.
+                pass
+
+profiler = RequestProfiler()
+
+def init_app(app):
+    '''
+    Registers the hooks that profile the requests. Profiling is disabled unless PROFILE_ENABLED is set.
+
+    '''
+
+    profiler.init_app(app)
+    if not app.config['PROFILE_ENABLED']: return
+
+    @app.before_request
+    def start_request_profile():
+        profiler.start()
+
+    @app.after_request
+    def finish_request_profile(response):
+        trace = get_request_trace()
+        profile_id = trace.id if trace is not None else str(uuid.uuid4())
+        if profiler.stop(profile_id):
+            if trace is not None:
+                trace.attributes['profile_id'] = profile_id
+
+            response.headers['X-Profile-Id'] = profile_id
+
+        return response
+
+    # A request that raised an unhandled exception is never passed to the after request hooks.
+    @app.teardown_request
+    def discard_request_profile(exception):
+        profiler.discard()
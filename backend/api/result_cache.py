@@ -0,0 +1,104 @@
+'''
+Bounded caches of computed results, with one entry per key.
+
+Every cache keeps its most recently used entries in a size-bounded, expiring, in-process
+LRU cache. A shared cache can keep the entries as well (one app cache key per entry),
+so that they are reused across app processes and survive the eviction of local entries.
+
+'''
+
+import hashlib
+import threading
+
+from cachetools import TTLCache
+
+from api.metrics import cache_requests
+
+class ResultCache:
+    '''
+    A cache of results with LRU eviction, expiring entries, and hit/miss counters.
+
+    '''
+
+    def __init__(self, name, config_prefix, shared_cache=None):
+        '''
+        :param name:
+            The name of the cache, which prefixes the keys of its entries in the shared cache.
+        :param config_prefix:
+            The prefix of the config values of the cache: '<prefix>_SIZE' is the maximum number of
+            entries kept in process, and '<prefix>_TIMEOUT' is the number of seconds after which an
+            entry expires.
+        :param shared_cache:
+            The app cache that entries are shared through (default=None, in which case the entries
+            are only kept in process).
+
+        '''
+
+        self.name = name
+        self.config_prefix = config_prefix
+        self.shared_cache = shared_cache
+        self.timeout = None
+        self.hits = 0
+        self.misses = 0
+
+        self._local_cache = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.timeout = app.config['{}_TIMEOUT'.format(self.config_prefix)]
+        self._local_cache = TTLCache(maxsize=app.config['{}_SIZE'.format(self.config_prefix)], ttl=self.timeout)
+
+    def get(self, key):
+        '''
+        Gets the value of an entry.
+
+        :returns:
+            The value of the entry, or None if there is no (unexpired) entry for the key.
+
+        '''
+
+        with self._lock:
+            value = self._local_cache.get(key)
+
+        if value is None and self.shared_cache is not None:
+            value = self.shared_cache.get(self._get_shared_key(key))
+            if value is not None:
+                with self._lock:
+                    self._local_cache[key] = value
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        cache_requests.inc(cache=self.name, result='miss' if value is None else 'hit')
+
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._local_cache[key] = value
+
+        if self.shared_cache is not None:
+            self.shared_cache.set(self._get_shared_key(key), value, timeout=self.timeout)
+
+    def get_stats(self):
+        '''
+        Gets the counters of the cache (for this app process).
+
+        '''
+
+        with self._lock:
+            lookup_count = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookup_count if lookup_count > 0 else None,
+                'size': self._local_cache.currsize,
+                'max_size': self._local_cache.maxsize
+            }
+
+    def _get_shared_key(self, key):
+        # Keys are hashed to respect the key length limits of the cache backends.
+        return '{}_{}'.format(self.name, hashlib.md5(str(key).encode('utf-8')).hexdigest())
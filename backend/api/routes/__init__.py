@@ -1,4 +1,7 @@
-from api.routes import search
+from api.routes import search, storage, metrics, profiles
 
 def init_app(app):
-    app.register_blueprint(search.bp)
\ No newline at end of file
+    app.register_blueprint(search.bp)
+    app.register_blueprint(storage.bp)
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(profiles.bp)
\ No newline at end of file
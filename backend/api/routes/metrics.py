@@ -0,0 +1,19 @@
+'''
+Defines the route that serves the metrics of the app.
+
+'''
+
+from flask import Blueprint, Response
+
+from api.metrics import registry
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    '''
+    Gets the metrics of all the app processes, in the Prometheus text exposition format.
+
+    '''
+
+    return Response(registry.format_text(), mimetype='text/plain; version=0.0.4')
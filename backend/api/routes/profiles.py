@@ -0,0 +1,44 @@
+'''
+Defines the route that serves the profiles of profiled requests.
+
+'''
+
+import io
+import pstats
+
+import api.http_errors as exceptions
+from api.profiling import profiler
+from flask import Blueprint, Response, request, send_file
+
+bp = Blueprint('profiles', __name__, url_prefix='/profiles')
+
+'''
+The number of functions listed in the text summary of a profile.
+'''
+PROFILE_SUMMARY_LENGTH = 50
+
+@bp.route('/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    '''
+    Serves the profile of a request, as a cProfile stats file (which can be loaded with pstats),
+    or as a text summary of the functions with the highest cumulative time if the 'format' query
+    parameter is 'text'.
+
+    '''
+
+    filepath = profiler.get_filepath(profile_id)
+    if filepath is None or not filepath.is_file():
+        raise exceptions.ProfileNotFoundError(profile_id)
+
+    if request.args.get('format') == 'text':
+        stream = io.StringIO()
+        pstats.Stats(str(filepath), stream=stream).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LENGTH)
+        return Response(stream.getvalue(), mimetype='text/plain')
+
+    # Flask 2.0 renamed 'attachment_filename' to 'download_name' (and 2.2 removed the old name).
+    try:
+        return send_file(str(filepath), mimetype='application/octet-stream', as_attachment=True,
+            download_name=filepath.name)
+    except TypeError:
+        return send_file(str(filepath), mimetype='application/octet-stream', as_attachment=True,
+            attachment_filename=filepath.name)
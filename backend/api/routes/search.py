@@ -3,28 +3,32 @@ Defines the search-related API routes.
 
 '''
 
-import re
 import uuid
 import time
 import string
 import base64
+import binascii
 import argparse
 import tempfile
 from enum import Enum
 from pathlib import Path
-from datetime import timedelta
 
-import librosa
-import soundfile
-
-import nltk.tokenize
 import api.hash_util as hash_util
-from google.cloud import speech_v1p1beta1 as speech, storage
-from google.cloud.speech_v1p1beta1 import enums
-from google.cloud.speech_v1p1beta1 import types
 
 import api.http_errors as exceptions
-from api.extensions import cache, get_context_search_model
+from api.search import TranscriptIndex, TranscriptAlignment, FuzzyIndex, SemanticIndex, normalize_token
+from api.search.corpus import search_corpus, search_semantic_corpus
+from api.audio_preprocessing import preprocess_audio
+from api.audio_segmentation import find_split_points
+from api.jobs import JobStatus
+from api.event_stream import get_stream_format, stream_events
+from api.uploads import HashingTemporaryFile
+from api.metrics import measure_stage, payload_size, audio_duration
+from api.transcription import CompactTranscript, split_audio_file, transcribe_chunks
+from api.artifacts import ensure_nltk_data
+from api.extensions import job_runner, artifact_cache, fingerprint_store, corpus_index, get_context_search_scheduler, get_transcription_backend, \
+    match_result_cache, transcription_cache, input_hash_cache, transcript_index_cache, fuzzy_index_cache, \
+    semantic_index_cache, get_result_caches, get_sentence_embedder, get_storage_backend, get_transcribed_manifest
 from flask import Blueprint, jsonify, request, current_app
 from api.validator import get_validator_data, validate_route, Schema, validators, fields
 
@@ -39,8 +43,24 @@ class SearchOutputMode(Enum):
     EXACT_MATCH = 'exact_match'
     SENTENCE = 'sentence'
 
+class SearchType(Enum):
+    '''
+    The method used to match the search query against a transcription.
+
+    '''
+
+    STRING = 'string'
+    CONTEXT = 'context'
+    FUZZY = 'fuzzy'
+    SEMANTIC = 'semantic'
+
 def get_tmp_filepath(): return Path(tempfile.gettempdir()) / str(uuid.uuid4())
-def get_word_time_seconds(time): return time.seconds + time.nanos / 1e9
+
+def remove_file(filepath):
+    try:
+        filepath.unlink()
+    except FileNotFoundError:
+        pass
 
 def normalize_text(text):
     '''
@@ -63,238 +83,907 @@ def find_sub_list(source, sublist):
 
     return results
 
+def normalize_query(query_text, search_type):
+    '''
+    Normalizes a query so that queries that must have the same matches share a cache entry.
+    The string and fuzzy searches ignore punctuation, but the models of the other searches do not.
+
+    '''
+
+    if search_type in (SearchType.CONTEXT, SearchType.SEMANTIC):
+        return ' '.join(query_text.lower().split())
+
+    return ' '.join(term for term in (normalize_token(token) for token in query_text.split()) if term)
+
 class MatchCacheKey:
-    def __init__(self, blob_uri, query_text, is_context_search):
+    def __init__(self, blob_uri, query_text, search_output_mode, search_type):
         self.blob_uri = blob_uri
-        self.query_text = query_text
-        self.is_context_search = is_context_search
+        self.query_text = normalize_query(query_text, search_type)
+        self.search_output_mode = search_output_mode
+        self.search_type = search_type
 
     @property
     def key(self):
-        return (self.blob_uri, self.query_text, self.is_context_search)
+        return (self.blob_uri, self.query_text, self.search_output_mode.value, self.search_type.value)
 
     def __hash__(self):
         return self.key.__hash__()
 
-def string_query(query_text, blob_uri, op_result, search_output_mode=SearchOutputMode.EXACT_MATCH):
-    match_result_cache = cache.get('match_result_cache') or dict()
-    match_cache_key = MatchCacheKey(blob_uri, query_text, False)
-    if match_cache_key in match_result_cache: return match_result_cache[match_cache_key]
-    
+    def __eq__(self, other):
+        return isinstance(other, MatchCacheKey) and self.key == other.key
+
+    def __str__(self):
+        return str(self.key)
+
+def get_transcript_index(blob_uri, transcript):
+    '''
+    Gets the positional index (and alignment) of a transcription, building it if it does not exist yet.
+
+    '''
+
+    transcript_index = transcript_index_cache.get(blob_uri)
+    if transcript_index is not None: return transcript_index
+
+    transcript_index = TranscriptIndex(TranscriptAlignment(transcript))
+    transcript_index_cache.set(blob_uri, transcript_index)
+
+    return transcript_index
+
+def get_transcript_alignment(blob_uri, transcript):
+    return get_transcript_index(blob_uri, transcript).alignment
+
+def get_fuzzy_index(blob_uri, transcript):
+    '''
+    Gets the trigram index of a transcription, building it if it does not exist yet.
+
+    '''
+
+    fuzzy_index = fuzzy_index_cache.get(blob_uri)
+    if fuzzy_index is not None: return fuzzy_index
+
+    fuzzy_index = FuzzyIndex(get_transcript_index(blob_uri, transcript))
+    fuzzy_index_cache.set(blob_uri, fuzzy_index)
+
+    return fuzzy_index
+
+def get_semantic_index(blob_uri, transcript, alignment=None):
+    '''
+    Gets the sentence embedding index of a transcription, building it if it does not exist yet.
+
+    :param alignment:
+        The alignment of the transcription, if it is at hand (default=None, in which case it is
+        taken from the cached index of the transcription).
+
+    '''
+
+    # The embeddings of different embedders are not comparable, so the embedder is part of the key.
+    cache_key = (current_app.config['SEMANTIC_SEARCH_EMBEDDER'], blob_uri)
+    semantic_index = semantic_index_cache.get(cache_key)
+    if semantic_index is not None: return semantic_index
+
+    if alignment is None:
+        alignment = get_transcript_alignment(blob_uri, transcript)
+
+    semantic_index = SemanticIndex(alignment, get_sentence_embedder(),
+        ivf_min_size=current_app.config['SEMANTIC_SEARCH_IVF_MIN_SENTENCES'],
+        probe_count=current_app.config['SEMANTIC_SEARCH_IVF_PROBES'])
+    semantic_index_cache.set(cache_key, semantic_index)
+
+    return semantic_index
+
+def string_query(query_text, blob_uri, transcript, search_output_mode=SearchOutputMode.EXACT_MATCH):
+    match_cache_key = MatchCacheKey(blob_uri, query_text, search_output_mode, SearchType.STRING)
+    match_results = match_result_cache.get(match_cache_key)
+    if match_results is not None: return match_results
+
+    match_results = find_string_matches(query_text, get_transcript_index(blob_uri, transcript), search_output_mode)
+    match_result_cache.set(match_cache_key, match_results)
+
+    return match_results
+
+def batch_string_query(query_texts, blob_uri, transcript, search_output_mode=SearchOutputMode.EXACT_MATCH):
+    '''
+    Searches a transcription for several phrases at once. The phrases whose matches are not
+    cached are all matched in a single pass over the transcription.
+
+    :returns:
+        A list containing the match results of each phrase.
+
+    '''
+
+    match_cache_keys = [MatchCacheKey(blob_uri, query_text, search_output_mode, SearchType.STRING) for query_text in query_texts]
+    batch_match_results = [match_result_cache.get(match_cache_key) for match_cache_key in match_cache_keys]
+
+    uncached_indices = [i for i, match_results in enumerate(batch_match_results) if match_results is None]
+    if len(uncached_indices) == 0: return batch_match_results
+
+    transcript_index = get_transcript_index(blob_uri, transcript)
+    phrase_matches = transcript_index.find_phrases([query_texts[i] for i in uncached_indices])
+    for i, matches in zip(uncached_indices, phrase_matches):
+        batch_match_results[i] = format_string_matches(transcript_index.alignment, matches, search_output_mode)
+        match_result_cache.set(match_cache_keys[i], batch_match_results[i])
+
+    return batch_match_results
+
+def find_string_matches(query_text, transcript_index, search_output_mode):
+    return format_string_matches(transcript_index.alignment, transcript_index.find_phrase(query_text), search_output_mode)
+
+def format_string_matches(alignment, phrase_matches, search_output_mode):
     match_results = []
-    for result in op_result.results:
-        # Check if the response is valid, which happens if and only if the result alternatives
-        # is at least of length 1 AND the transcript is non-empty.
-        if len(result.alternatives) == 0 or not result.alternatives[0].transcript: continue    
-        sentences = [sentence.strip().lower() for sentence in nltk.tokenize.sent_tokenize(result.alternatives[0].transcript)]
-        tokens = [word.strip().lower() for word in result.alternatives[0].transcript.split(' ') if word != '']
-        for sentence in sentences:
-            sublist_bounds = find_sub_list(tokens, sentence.split(' '))[0]
-            sentence_word_infos = result.alternatives[0].words[sublist_bounds[0]:sublist_bounds[1]+1]
-
-            matches = re.finditer(query_text, sentence)      
-            match_cache = set()
-            for match in matches:
-                if search_output_mode == SearchOutputMode.EXACT_MATCH:
-                    start_boundary = i = match.start()
-                    
-                    # Check if the match starts inside a word
-                    if i != 0 and sentence[i - 1] != ' ':
-                        start_boundary = sentence.rfind(' ', 0, i) + 1
-
-                    end_boundary = j = match.end() - 1
-
-                    # Check if the match ends inside a word
-                    if j != len(sentence) - 1 and sentence[j + 1] != ' ':
-                        end_boundary = sentence.find(' ', j)
-                        if end_boundary == -1:
-                            end_boundary = len(sentence) - 1
-                        else:
-                            end_boundary -= 1
-
-                    # Add boundary
-                    boundary = (start_boundary, end_boundary)
-                    if boundary in match_cache: continue
-                    match_cache.add(boundary)
-
-                    start_word_index = sentence.count(' ', 0, start_boundary)
-                    end_word_index = sentence.count(' ', 0, end_boundary)
-                elif search_output_mode == SearchOutputMode.SENTENCE:
-                    start_word_index = 0
-                    end_word_index = len(sentence_word_infos) - 1
-
-                confidence = result.alternatives[0].confidence
-                start_word = sentence_word_infos[start_word_index]
-                end_word = sentence_word_infos[end_word_index]
-                transcript = sentence[match.start():match.end()]
-                match_results.append({
-                    'matched_query': transcript,
-                    'start_time': get_word_time_seconds(start_word.start_time),
-                    'end_time': get_word_time_seconds(end_word.end_time),
-                    'confidence': confidence,
-                    'transcript':  transcript
-                })
-
-    match_result_cache[match_cache_key] = match_results
-    cache.set('match_result_cache', match_result_cache, timeout=0)
+    sentence_cache = set()
+    for start_position, end_position in phrase_matches:
+        matched_query = alignment.get_text(start_position, end_position)
+        if search_output_mode == SearchOutputMode.SENTENCE:
+            start_position, end_position = alignment.get_sentence_bounds(start_position)
+            if start_position in sentence_cache: continue
+            sentence_cache.add(start_position)
+
+        match_results.append({
+            'matched_query': matched_query,
+            'start_time': alignment.start_times[start_position],
+            'end_time': alignment.end_times[end_position],
+            'confidence': alignment.confidences[start_position],
+            'transcript': alignment.get_text(start_position, end_position)
+        })
 
     return match_results
 
-def context_query(query_text, blob_uri, op_result, search_output_mode=SearchOutputMode.EXACT_MATCH):
-    match_result_cache = cache.get('match_result_cache') or dict()
-    match_cache_key = MatchCacheKey(blob_uri, query_text, True)
-    if match_cache_key in match_result_cache: return match_result_cache[match_cache_key]
-    
+def fuzzy_query(query_text, blob_uri, transcript, search_output_mode=SearchOutputMode.EXACT_MATCH):
+    match_cache_key = MatchCacheKey(blob_uri, query_text, search_output_mode, SearchType.FUZZY)
+    match_results = match_result_cache.get(match_cache_key)
+    if match_results is not None: return match_results
+
+    match_results = find_fuzzy_matches(query_text, get_fuzzy_index(blob_uri, transcript), search_output_mode)
+    match_result_cache.set(match_cache_key, match_results)
+
+    return match_results
+
+def find_fuzzy_matches(query_text, fuzzy_index, search_output_mode):
+    alignment = fuzzy_index.transcript_index.alignment
+
     match_results = []
-    for result in op_result.results:
-        # Check if the response is valid, which happens if and only if the result alternatives
-        # is at least of length 1 AND the transcript is non-empty.
-        if len(result.alternatives) == 0 or not result.alternatives[0].transcript: continue    
-        tokens = [word.strip().lower() for word in result.alternatives[0].transcript.split(' ') if word != '']
-        puncutation_translator = str.maketrans('', '', string.punctuation)
-        sanitized_tokens = [token.translate(puncutation_translator) for token in tokens]
-
-        predictions = get_context_search_model().predict((result.alternatives[0].transcript, query_text))
-        for prediction in predictions:
-            answer = prediction[0].strip()
-            answer_tokens = answer.lower().translate(puncutation_translator).split(' ')
+    sentence_cache = set()
+    for start_position, end_position, similarity in fuzzy_index.find_phrase(query_text):
+        matched_query = alignment.get_text(start_position, end_position)
+        if search_output_mode == SearchOutputMode.SENTENCE:
+            start_position, end_position = alignment.get_sentence_bounds(start_position)
+            if start_position in sentence_cache: continue
+            sentence_cache.add(start_position)
+
+        match_results.append({
+            'matched_query': matched_query,
+            'start_time': alignment.start_times[start_position],
+            'end_time': alignment.end_times[end_position],
+            'confidence': alignment.confidences[start_position],
+            'similarity': similarity,
+            'transcript': alignment.get_text(start_position, end_position)
+        })
+
+    return match_results
+
+def locate_answer(alignment, segment_index, answer, answer_start):
+    '''
+    Determines the inclusive word range of an answer predicted from the transcript of a segment.
 
+    :param alignment:
+        The alignment of the transcription.
+    :param segment_index:
+        The index of the segment whose transcript was used as the context.
+    :param answer:
+        The predicted answer.
+    :param answer_start:
+        The predicted character offset of the answer in the transcript.
+
+    :returns:
+        A tuple containing the start and end word positions, or None if the answer could not be located.
+
+    '''
+
+    transcript = alignment.transcripts[segment_index]
+    answer_start += len(answer) - len(answer.lstrip())
+    answer = answer.strip()
+
+    # The predicted offset is trusted only if it actually points at the answer.
+    answer_end = answer_start + len(answer)
+    if 0 <= answer_start and transcript[answer_start:answer_end].lower() == answer.lower():
+        return (alignment.get_word_position(segment_index, answer_start),
+            alignment.get_word_position(segment_index, answer_end - 1))
+
+    # Otherwise, fall back to matching the tokens of the answer against the words of the segment.
+    segment_start, segment_end = alignment.get_segment_bounds(segment_index)
+    sublist = find_sub_list(alignment.get_normalized_tokens(segment_start, segment_end), normalize_text(answer).split(' '))
+    if len(sublist) == 0: return None
+
+    return segment_start + sublist[0][0], segment_start + sublist[0][1]
+
+def context_query(query_text, blob_uri, transcript, search_output_mode=SearchOutputMode.EXACT_MATCH):
+    match_cache_key = MatchCacheKey(blob_uri, query_text, search_output_mode, SearchType.CONTEXT)
+    match_results = match_result_cache.get(match_cache_key)
+    if match_results is not None: return match_results
+
+    match_results = find_context_matches(query_text, get_transcript_alignment(blob_uri, transcript), search_output_mode)
+    match_result_cache.set(match_cache_key, match_results)
+
+    return match_results
+
+def find_context_matches(query_text, alignment, search_output_mode):
+    # Every segment is submitted at once, so that the segments are predicted in batches
+    # (together with the segments of any concurrent request).
+    with measure_stage('inference'):
+        predictions = get_context_search_scheduler().predict(*((segment_transcript, query_text)
+            for segment_transcript in alignment.transcripts))
+
+    # Long segments are predicted in overlapping windows, so a segment may have several answers.
+    match_results = []
+    for segment_index, segment_answers in enumerate(predictions):
+        for prediction in segment_answers:
+            answer = prediction[0].strip()
             if not answer: continue
-            sublist = find_sub_list(sanitized_tokens, answer_tokens)
-
-            if len(sublist) == 0: continue
-            sublist_bounds = sublist[0]
-
-            if search_output_mode == SearchOutputMode.EXACT_MATCH:
-                start_word_index = sublist_bounds[0]
-                end_word_index = sublist_bounds[1]
-                transcript = answer
-            elif search_output_mode == SearchOutputMode.SENTENCE:
-                pass
-        
-            start_word = result.alternatives[0].words[start_word_index]
-            end_word = result.alternatives[0].words[end_word_index]
+
+            answer_bounds = locate_answer(alignment, segment_index, prediction[0], prediction[1])
+            if answer_bounds is None: continue
+
+            start_position, end_position = answer_bounds
+            if search_output_mode == SearchOutputMode.SENTENCE:
+                start_position = alignment.get_sentence_bounds(start_position)[0]
+                end_position = alignment.get_sentence_bounds(end_position)[1]
+                match_transcript = alignment.get_text(start_position, end_position)
+            else:
+                match_transcript = answer
+
             match_results.append({
                 'matched_query': query_text,
-                'start_time': get_word_time_seconds(start_word.start_time),
-                'end_time': get_word_time_seconds(end_word.end_time),
+                'start_time': alignment.start_times[start_position],
+                'end_time': alignment.end_times[end_position],
                 'confidence': prediction[2],
-                'transcript': transcript 
+                'transcript': match_transcript
             })
 
-    match_result_cache[match_cache_key] = match_results
-    cache.set('match_result_cache', match_result_cache, timeout=0)
+    return match_results
+
+def semantic_query(query_text, blob_uri, transcript, search_output_mode=SearchOutputMode.EXACT_MATCH):
+    '''
+    Finds the sentences of a transcription that are the most similar in meaning to the query.
+    Only the query is embedded; the matches are always whole sentences.
+
+    '''
+
+    match_cache_key = MatchCacheKey(blob_uri, query_text, search_output_mode, SearchType.SEMANTIC)
+    match_results = match_result_cache.get(match_cache_key)
+    if match_results is not None: return match_results
+
+    match_results = find_semantic_matches(query_text, get_semantic_index(blob_uri, transcript),
+        get_transcript_alignment(blob_uri, transcript))
+    match_result_cache.set(match_cache_key, match_results)
 
     return match_results
 
-class QuerySchema(Schema):
-    file_input = fields.StringField(validators=[validators.DataRequired()])
+def find_semantic_matches(query_text, semantic_index, alignment):
+    with measure_stage('embedding'):
+        query_vector = get_sentence_embedder().embed([query_text])[0]
+
+    match_results = []
+    for start_position, end_position, similarity in semantic_index.find_sentences(query_vector, current_app.config['SEMANTIC_SEARCH_TOP_K']):
+        match_results.append({
+            'matched_query': query_text,
+            'start_time': alignment.start_times[start_position],
+            'end_time': alignment.end_times[end_position],
+            'confidence': alignment.confidences[start_position],
+            'similarity': similarity,
+            'transcript': alignment.get_text(start_position, end_position)
+        })
+
+    return match_results
+
+class SearchOptionsSchema(Schema):
     query = fields.StringField(validators=[validators.DataRequired()])
     search_output_mode = fields.EnumField(SearchOutputMode, default_value=SearchOutputMode.EXACT_MATCH)
     is_context_search = fields.BooleanField(default_value=False)
+    is_fuzzy_search = fields.BooleanField(default_value=False)
+    is_semantic_search = fields.BooleanField(default_value=False)
 
-@bp.route('/', methods=['POST'])
-@validate_route(QuerySchema)
-def query():
-    route_start_time = start_time = time.time()
-    print('='*20)
+class QuerySchema(SearchOptionsSchema):
+    file_input = fields.StringField(validators=[validators.DataRequired()])
+
+class JobSchema(Schema):
+    file_input = fields.StringField()
+
+class BatchSearchOptionsSchema(Schema):
+    queries = fields.ListField(str, validators=[validators.DataRequired(), validators.Length(minimum=1)])
+    search_output_mode = fields.EnumField(SearchOutputMode, default_value=SearchOutputMode.EXACT_MATCH)
+
+class BatchQuerySchema(BatchSearchOptionsSchema):
+    file_input = fields.StringField()
+
+def write_base64_file(encoded_data, file, chunk_size=hash_util.DEFAULT_CHUNK_SIZE):
+    '''
+    Decodes base64 data (optionally prefixed by a data URL header) into a file, chunk by chunk.
+
+    :returns:
+        The hex digest of the MD5 hash of the decoded data.
+
+    '''
+
+    # The data is sliced chunk by chunk from after the header, rather than copied without the header
+    # and with padding, so that a large body is never copied as a whole. Characters outside of the
+    # base64 alphabet are rejected rather than skipped, since they would throw off the grouping.
+    start_index = encoded_data.find(',') + 1
+    encoded_chunk_size = chunk_size // 3 * 4
+
+    def decode_chunks():
+        # Every group of four base64 characters decodes to three bytes independently of the others.
+        # Whitespace (such as the line breaks of MIME base64) is removed from each chunk, and the
+        # characters that do not complete a group are carried over to the next chunk.
+        remainder = ''
+        for i in range(start_index, len(encoded_data), encoded_chunk_size):
+            chunk = remainder + ''.join(encoded_data[i:i + encoded_chunk_size].split())
+            usable_length = len(chunk) - len(chunk) % 4
+            remainder = chunk[usable_length:]
+            yield base64.b64decode(chunk[:usable_length], validate=True)
+
+        if remainder:
+            yield base64.b64decode(remainder + '=' * (-len(remainder) % 4), validate=True)
+
+    try:
+        return hash_util.write_chunks_and_get_md5_str(decode_chunks(), file)
+    except binascii.Error:
+        raise exceptions.InvalidDataError(file_input=['Invalid base64 data.'])
+
+def receive_input_file(data):
+    '''
+    Writes the input audio file of the current request to disk. The file is either the base64
+    encoded 'file_input' field of a JSON body, the raw body of an 'audio/*' request, or the
+    'file_input' part of a multipart form; the latter two are streamed to disk chunk by chunk.
+
+    :param data:
+        The validated data of the request.
+
+    :returns:
+        A tuple containing the path to the input file and the hash of its contents.
+
+    '''
+
+    with measure_stage('receive'):
+        uploaded_file = request.files.get('file_input') if request.mimetype == 'multipart/form-data' else None
+        if uploaded_file is not None and isinstance(uploaded_file.stream, HashingTemporaryFile):
+            # The multipart parser has already streamed the file to disk and hashed it.
+            input_filepath, input_hash = uploaded_file.stream.keep()
+        else:
+            input_filepath = get_tmp_filepath()
+            try:
+                with open(input_filepath, 'w+b') as input_file:
+                    if request.is_json and data.get('file_input'):
+                        input_hash = write_base64_file(data['file_input'], input_file)
+                    elif request.mimetype.startswith('audio/'):
+                        input_hash = hash_util.copy_and_get_md5_str(request.stream, input_file)
+                    elif uploaded_file is not None:
+                        input_hash = hash_util.copy_and_get_md5_str(uploaded_file.stream, input_file)
+                    else:
+                        input_hash = None
+            except Exception:
+                # e.g. invalid base64 data, or a client that disconnected midway.
+                remove_file(input_filepath)
+                raise
+
+    if input_hash is None:
+        remove_file(input_filepath)
+        raise exceptions.InvalidDataError(file_input=['Field is required.'])
+
+    payload_size.observe(input_filepath.stat().st_size, payload='input_file')
+
+    return input_filepath, input_hash
+
+def upload_audio_file(filepath, checksum):
+    '''
+    Uploads an audio file to storage, if it doesn't already exist.
+
+    :param filepath:
+        The path to the audio file.
+    :param checksum:
+        The checksum of the audio file, which is used as its name.
+
+    :returns:
+        The uri of the blob of the audio file.
+
+    '''
+
+    return get_storage_backend().upload(filepath, get_audio_blob_name(checksum))
+
+def get_audio_blob_name(name):
+    '''
+    Gets the full name of an audio blob, under the audio root of the storage bucket.
+
+    '''
+
+    bucket_audio_root = current_app.config['GOOGLE_CLOUD_STORAGE_BUCKET_AUDIO_ROOT']
+    blob_root = bucket_audio_root
+    if blob_root and not bucket_audio_root.endswith('/'):
+        blob_root = bucket_audio_root + '/'
+
+    return '{}{}'.format(blob_root, name)
+
+def split_audio_into_chunks(preprocessed_audio):
+    '''
+    Splits a preprocessed recording at its silences into chunks that can be transcribed concurrently,
+    if chunked transcription is enabled and the recording is long enough.
+
+    :returns:
+        A tuple containing the AudioChunk objects and their blob names, or None if the recording
+        should be transcribed as a whole.
+
+    '''
+
+    chunk_duration = current_app.config['TRANSCRIPTION_CHUNK_DURATION']
+    if not chunk_duration: return None
+
+    split_points = find_split_points(preprocessed_audio.energies, preprocessed_audio.energy_frame_size,
+        chunk_duration, current_app.config['TRANSCRIPTION_CHUNK_SEARCH_RADIUS'], preprocessed_audio.sample_rate)
+
+    if not split_points: return None
+
+    chunks = split_audio_file(preprocessed_audio.filepath, split_points, tempfile.gettempdir())
+    blob_names = [get_audio_blob_name('{}.{}-{}'.format(preprocessed_audio.crc32_str, chunk.start_sample,
+        chunk.end_sample)) for chunk in chunks]
+
+    return chunks, blob_names
+
+def transcribe_input_file(input_filepath, input_hash, report_stage=None, report_partial_transcript=None):
+    '''
+    Preprocesses, uploads and transcribes an input audio file (reusing any previous work), then deletes it.
+
+    :param input_filepath:
+        The path to the input audio file.
+    :param input_hash:
+        The hash of the contents of the input audio file.
+    :param report_stage:
+        A function that is called with the name of each stage as it starts (default=None, optional).
+    :param report_partial_transcript:
+        A function that is called with the CompactTranscript of each chunk of the recording as soon as
+        it is transcribed, if the recording is transcribed in chunks (default=None, optional).
+
+    :returns:
+        A tuple containing the uri of the blob of the recording, and its transcription.
+
+    '''
+
+    if report_stage is None:
+        report_stage = lambda stage: None
+
+    start_time = time.time()
+
+    unindexed_fingerprint = None
+    audio_chunks = None
+    tmp_filepath = None
+    try:
+
+        # The sample rate is kept alongside the blob uri in case the transcription has to be redone.
+        input_hash_entry = input_hash_cache.get(input_hash)
+        if input_hash_entry is not None:
+            blob_uri, sample_rate = input_hash_entry
+        else:
+            report_stage('preprocessing')
+            tmp_filepath = get_tmp_filepath()
+
+            # Preprocess the audio data by converting it to a mono WAVE, which is fingerprinted
+            # and checksummed on the fly.
+            try:
+                with measure_stage('preprocessing'):
+                    preprocessed_audio = preprocess_audio(input_filepath, tmp_filepath)
+            except Exception as exception:
+                raise exceptions.AudioFileLoadError('file_input', exception)
+
+            sample_rate = preprocessed_audio.sample_rate
+            audio_duration.observe(preprocessed_audio.duration)
+
+            print('Audio processing and exporting took {:.3f} seconds'.format(time.time() - start_time))
+            start_time = time.time()
+
+            # Reuse the transcription of a previously transcribed recording with the same content,
+            # even if it was uploaded in a different container or at a different bitrate.
+            with measure_stage('fingerprint_lookup'):
+                blob_uri = fingerprint_store.lookup(preprocessed_audio.fingerprint)
+
+            if blob_uri is not None:
+                print('Matched fingerprint of {}'.format(blob_uri))
+            else:
+                report_stage('uploading')
+                with measure_stage('upload'):
+                    blob_uri = upload_audio_file(tmp_filepath, preprocessed_audio.crc32_str)
+
+                unindexed_fingerprint = preprocessed_audio.fingerprint
+
+                print('Uploading to storage took {:.3f} seconds'.format(time.time() - start_time))
+                start_time = time.time()
+
+            # Long recordings that still need to be transcribed are split into chunks while the
+            # preprocessed file is around. The whole recording is kept in storage for access links.
+            if transcription_cache.get(blob_uri) is None:
+                with measure_stage('chunking'):
+                    audio_chunks = split_audio_into_chunks(preprocessed_audio)
+
+            # Remove audio file now that we are done with it
+            remove_file(tmp_filepath)
+
+            input_hash_cache.set(input_hash, (blob_uri, sample_rate))
+
+        remove_file(input_filepath)
+
+        transcript = transcription_cache.get(blob_uri)
+        if transcript is not None:
+            print('Loaded {} from cache'.format(blob_uri))
+        else:
+            report_stage('transcribing')
+
+            # The transcription is converted once into its compact form, which is what gets cached and indexed.
+            ensure_nltk_data(artifact_cache)
+            with measure_stage('transcription'):
+                if audio_chunks is not None:
+                    chunks, blob_names = audio_chunks
+                    on_chunk_transcribed = None
+                    if report_partial_transcript is not None:
+                        on_chunk_transcribed = lambda chunk_transcript: report_partial_transcript(
+                            CompactTranscript.from_transcript(chunk_transcript))
+
+                    raw_transcript = transcribe_chunks(get_transcription_backend(), get_storage_backend(), chunks, blob_names,
+                        current_app.config['TRANSCRIPTION_CHUNK_WORKERS'], on_chunk_transcribed=on_chunk_transcribed)
+                else:
+                    raw_transcript = get_transcription_backend().transcribe(blob_uri, sample_rate)
+
+                transcript = CompactTranscript.from_transcript(raw_transcript)
+
+            transcription_cache.set(blob_uri, transcript)
+
+            get_transcribed_manifest().add(blob_uri)
+
+            # Index the transcription as soon as it lands so that every query can reuse it.
+            report_stage('indexing')
+            with measure_stage('indexing'):
+                corpus_index.add(blob_uri, get_transcript_index(blob_uri, transcript))
+                if current_app.config['SEMANTIC_SEARCH_INDEX_ON_INGEST']:
+                    # The semantic index is optional at this point, so a broken embedder (e.g.
+                    # missing model files) must not fail the transcription.
+                    try:
+                        get_semantic_index(blob_uri, transcript)
+                    except Exception as exception:
+                        print('Failed to build the semantic index of {}: {}'.format(blob_uri, exception))
+
+        # Fingerprints are only indexed once their recording has been transcribed, so that a
+        # fingerprint match always means that the transcription can be reused.
+        if unindexed_fingerprint is not None:
+            fingerprint_store.add(unindexed_fingerprint, blob_uri)
+    finally:
+        # The local files are removed even if preprocessing, uploading or transcription fails.
+        remove_file(input_filepath)
+        if tmp_filepath is not None:
+            remove_file(tmp_filepath)
+        if audio_chunks is not None:
+            for chunk in audio_chunks[0]:
+                remove_file(chunk.filepath)
+
+    print('Transcription took {:.3f} seconds'.format(time.time() - start_time))
+    return blob_uri, transcript
+
+def search_transcription(data, blob_uri, transcript):
+    '''
+    Searches a transcription using the validated search options of a request.
+
+    '''
 
-    data = get_validator_data()
     query_text = data['query'].strip().lower()
     search_output_mode = data['search_output_mode']
-    
-    auth_filepath = Path(current_app.instance_path) / Path(current_app.config['GOOGLE_CLOUD_AUTH_FILENAME'])
-    speech_client = speech.SpeechClient.from_service_account_json(auth_filepath)
-    storage_client = storage.Client.from_service_account_json(auth_filepath)
 
-    bucket = storage_client.get_bucket(current_app.config['GOOGLE_CLOUD_STORAGE_BUCKET_NAME'])
+    if data['is_context_search']:
+        return context_query(query_text, blob_uri, transcript, search_output_mode)
+    elif data['is_semantic_search']:
+        return semantic_query(query_text, blob_uri, transcript, search_output_mode)
+    elif data['is_fuzzy_search']:
+        return fuzzy_query(query_text, blob_uri, transcript, search_output_mode)
+    else:
+        return string_query(query_text, blob_uri, transcript, search_output_mode)
+
+def search_partial_transcription(data, transcript):
+    '''
+    Searches part of a transcription (such as a chunk that has just been transcribed) with a string
+    or fuzzy search. Nothing is cached, since the caches are keyed by the blob of the whole recording.
 
-    with open(get_tmp_filepath(), 'w+b') as input_file:
-        data['file_input'] = data['file_input'][data['file_input'].find(',')+1:]
-        file_input = data['file_input'] + '=' * ((4 - len(data['file_input']) % 4) % 4)
-        input_file.write(base64.b64decode(file_input))
-        input_hash = hash_util.get_md5_str(file_input)
+    '''
 
-        print('Decoding and writing input file took {:.3f} seconds'.format(time.time() - start_time)) 
-        start_time = time.time()
+    query_text = data['query'].strip().lower()
+    search_output_mode = data['search_output_mode']
+    alignment = TranscriptAlignment(transcript)
 
-    input_hash_to_blob_uri = cache.get('input_hash_to_blob_uri') or dict()
-    if input_hash in input_hash_to_blob_uri:
-        blob_uri = input_hash_to_blob_uri[input_hash]
-        blob = bucket.blob(blob_uri.replace('gs://{}/'.format(current_app.config['GOOGLE_CLOUD_STORAGE_BUCKET_NAME']), ''))
+    if data['is_fuzzy_search']:
+        return find_fuzzy_matches(query_text, FuzzyIndex(TranscriptIndex(alignment)), search_output_mode)
     else:
-        try:
-            audio, sample_rate = librosa.load(input_file.name)
-        except Exception as exception:
-            raise exceptions.AudioFileLoadError('file_input', exception)
+        return find_string_matches(query_text, TranscriptIndex(alignment), search_output_mode)
 
-        print('Libroa audio file loading took {:.3f} seconds'.format(time.time() - start_time))
-        start_time = time.time()
+def stream_search_input_file(input_filepath, input_hash, data, route_start_time, stream_format):
+    '''
+    Transcribes (if needed) and searches an input audio file, streaming its progress and matches.
 
-        tmp_filepath = get_tmp_filepath()
+    The events are:
+        - 'stage', with the name of each stage of the transcription as it starts;
+        - 'partial_matches', with the matches in each chunk of the recording as soon as it is
+          transcribed (only if the recording is transcribed in chunks, and only for string and
+          fuzzy searches);
+        - 'matches', with the final matches (which replace any partial matches), the access link
+          and the elapsed time;
+        - 'error', if the request fails.
 
-        # Preprocess the audio data by converting it to a mono WAVE
-        audio_mono = librosa.to_mono(audio)
-        soundfile.write(tmp_filepath, audio_mono, sample_rate, subtype='PCM_16', format='wav')
+    '''
 
-        print('Audio processing and exporting took {:.3f} seconds'.format(time.time() - start_time))
-        start_time = time.time()
+    def produce(emit):
+        # Context and semantic searches run a model over every sentence, so they would cost twice
+        # as much if every chunk was searched as well as the whole recording.
+        report_partial_transcript = None
+        if not (data['is_context_search'] or data['is_semantic_search']):
+            def report_partial_transcript(transcript):
+                emit('partial_matches', matches=search_partial_transcription(data, transcript),
+                    elapsed_time=time.time() - route_start_time)
 
-        # Upload the file to GCS if it doesn't already exists
-        bucket_audio_root = current_app.config['GOOGLE_CLOUD_STORAGE_BUCKET_AUDIO_ROOT']
-        blob_root = bucket_audio_root
-        if blob_root and not bucket_audio_root.endswith('/'):
-            blob_root = bucket_audio_root + '/'
+        blob_uri, transcript = transcribe_input_file(input_filepath, input_hash,
+            report_stage=lambda stage: emit('stage', stage=stage),
+            report_partial_transcript=report_partial_transcript)
 
-        with open(tmp_filepath, 'rb') as audio_file:
-            blob_filename = '{}{}'.format(blob_root, hash_util.get_crc32_str(audio_file)) 
-            blob = bucket.blob(blob_filename)
-            if not blob.exists():
-                blob.upload_from_file(audio_file, rewind=True)
+        emit('stage', stage='searching')
+        with measure_stage('search'):
+            match_results = search_transcription(data, blob_uri, transcript)
 
-            blob_uri = 'gs://{}/{}'.format(current_app.config['GOOGLE_CLOUD_STORAGE_BUCKET_NAME'], blob_filename)
-            input_hash_to_blob_uri[input_hash] = blob_uri
-            cache.set('input_hash_to_blob_uri', input_hash_to_blob_uri, timeout=0)
+        emit('matches', status_code=201, message='Query was successful!', matches=match_results,
+            access_link=get_storage_backend().get_access_link(blob_uri),
+            elapsed_time=time.time() - route_start_time, success=True)
 
-        # Remove audio file now that we are done with it
-        tmp_filepath.unlink()
+    return stream_events(produce, stream_format)
 
-        print('Uploading to GCS took {:.3f} seconds'.format(time.time() - start_time))
-        start_time = time.time()
+def search_input_file(input_filepath, input_hash, data, route_start_time):
+    '''
+    Transcribes (if needed) and searches an input audio file. If the request accepts a stream
+    format (NDJSON or Server-Sent Events), the progress and matches are streamed.
+
+    :param input_filepath:
+        The path to the input audio file.
+    :param input_hash:
+        The hash of the contents of the input audio file.
+    :param data:
+        The validated search options.
+    :param route_start_time:
+        The time at which the request started being handled.
 
-    Path(input_file.name).unlink()
+    '''
 
-    transcription_cache = cache.get('transcription_cache') or dict()
-    if blob_uri in transcription_cache:
-        op_result = transcription_cache[blob_uri]
-        print('Loaded {} from cache'.format(blob_uri))
-    else:
-        # This configuration is predetermined...All audio files are converted 
-        # a WAVE format with 16-bit PCM encoding. Sample rate is determined using librosa.
-        config = types.RecognitionConfig(
-            encoding=enums.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=sample_rate,
-            enable_speaker_diarization=True,
-            enable_automatic_punctuation=True,
-            language_code='en-US')
-
-        operation = speech_client.long_running_recognize(config, types.RecognitionAudio(uri=blob_uri))
-        op_result = operation.result()
-        transcription_cache[blob_uri] = op_result
-        cache.set('transcription_cache', transcription_cache, timeout=0)
+    stream_format = get_stream_format(request.accept_mimetypes)
+    if stream_format is not None:
+        return stream_search_input_file(input_filepath, input_hash, data, route_start_time, stream_format)
 
-    print('Transcription took {:.3f} seconds'.format(time.time() - start_time))
-    start_time = time.time()
+    blob_uri, transcript = transcribe_input_file(input_filepath, input_hash)
 
-    if not data['is_context_search']:
-        match_results = string_query(query_text, blob_uri, op_result, search_output_mode)
-    else:
-        match_results = context_query(query_text, blob_uri, op_result, search_output_mode)
+    start_time = time.time()
+    with measure_stage('search'):
+        match_results = search_transcription(data, blob_uri, transcript)
 
     print('Search took {:.3f} seconds'.format(time.time() - start_time))
 
     end_time = time.time()
 
-    access_link = blob.generate_signed_url(timedelta(hours=1))
+    access_link = get_storage_backend().get_access_link(blob_uri)
     return jsonify(status_code=201, message='Query was successful!', matches=match_results, 
-        access_link=access_link, elapsed_time=end_time - route_start_time, success=True)
\ No newline at end of file
+        access_link=access_link, elapsed_time=end_time - route_start_time, success=True)
+
+@bp.route('/', methods=['POST'])
+@validate_route(QuerySchema)
+def query():
+    route_start_time = time.time()
+    print('='*20)
+
+    input_filepath, input_hash = receive_input_file(get_validator_data())
+
+    print('Decoding and writing input file took {:.3f} seconds'.format(time.time() - route_start_time))
+    return search_input_file(input_filepath, input_hash, get_validator_data(), route_start_time)
+
+@bp.route('/upload', methods=['POST'])
+@validate_route(SearchOptionsSchema, content_types=['multipart/form-data', 'audio/*'])
+def upload_query():
+    '''
+    Searches an audio file that is streamed either as the raw body of the request (with an
+    'audio/*' content type and the search options as query string arguments) or as the
+    'file_input' part of a multipart form. The file is written to disk and hashed chunk by chunk.
+
+    '''
+
+    route_start_time = time.time()
+    print('='*20)
+
+    input_filepath, input_hash = receive_input_file(get_validator_data())
+
+    print('Streaming and writing input file took {:.3f} seconds'.format(time.time() - route_start_time))
+    return search_input_file(input_filepath, input_hash, get_validator_data(), route_start_time)
+
+def search_batch(data, blob_uri, transcript):
+    '''
+    Searches a transcription for every query of a validated batch request.
+
+    :returns:
+        A list of dictionaries containing each query and its matches, in the order of the queries.
+
+    '''
+
+    max_query_count = current_app.config['BATCH_QUERY_MAX_QUERIES']
+    if len(data['queries']) > max_query_count:
+        raise exceptions.InvalidDataError(queries=['Field cannot be longer than {} elements.'.format(max_query_count)])
+
+    query_texts = [query_text.strip().lower() for query_text in data['queries']]
+    batch_match_results = batch_string_query(query_texts, blob_uri, transcript, data['search_output_mode'])
+
+    return [{'query': query, 'matches': match_results} for query, match_results in zip(data['queries'], batch_match_results)]
+
+@bp.route('/batch', methods=['POST'])
+@validate_route(BatchQuerySchema, content_types=['multipart/form-data', 'audio/*'])
+def batch_query():
+    '''
+    Searches an audio file for a list of queries. The file is sent the same way as for the other
+    search routes, and is transcribed once. With a form or raw audio body, 'queries' is a JSON array.
+
+    '''
+
+    route_start_time = time.time()
+    print('='*20)
+
+    data = get_validator_data()
+    input_filepath, input_hash = receive_input_file(data)
+    blob_uri, transcript = transcribe_input_file(input_filepath, input_hash)
+
+    start_time = time.time()
+    with measure_stage('search'):
+        results = search_batch(data, blob_uri, transcript)
+    print('Batch search of {} queries took {:.3f} seconds'.format(len(results), time.time() - start_time))
+
+    access_link = get_storage_backend().get_access_link(blob_uri)
+    return jsonify(status_code=201, message='Query was successful!', results=results,
+        access_link=access_link, elapsed_time=time.time() - route_start_time, success=True)
+
+def run_transcription_job(input_filepath, input_hash, report_stage):
+    blob_uri, _ = transcribe_input_file(input_filepath, input_hash, report_stage=report_stage)
+    return blob_uri
+
+@bp.route('/jobs', methods=['POST'])
+@validate_route(JobSchema, content_types=['multipart/form-data', 'audio/*'])
+def submit_job():
+    '''
+    Submits an audio file to be preprocessed, uploaded and transcribed in the background.
+    The file is sent the same way as for the search routes (as JSON, raw audio or multipart form).
+
+    '''
+
+    if not job_runner.is_enabled:
+        raise exceptions.JobsDisabledError()
+
+    input_filepath, input_hash = receive_input_file(get_validator_data())
+    job = job_runner.submit(run_transcription_job, input_filepath, input_hash)
+
+    response = jsonify(status_code=202, message='Job was submitted!', job=job.to_dict(), success=True)
+    response.status_code = 202
+    return response
+
+def get_job_or_raise(job_id):
+    if not job_runner.is_enabled:
+        raise exceptions.JobsDisabledError()
+
+    job = job_runner.get(job_id)
+    if job is None:
+        raise exceptions.JobNotFoundError(job_id)
+
+    return job
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = get_job_or_raise(job_id)
+    return jsonify(status_code=200, job=job.to_dict(), success=True)
+
+@bp.route('/jobs/<job_id>/query', methods=['POST'])
+@validate_route(SearchOptionsSchema)
+def query_job(job_id):
+    '''
+    Searches the transcription produced by a job, once it has succeeded.
+
+    '''
+
+    route_start_time = time.time()
+
+    job = get_job_or_raise(job_id)
+    if job.status != JobStatus.SUCCEEDED:
+        raise exceptions.JobNotFinishedError(job)
+
+    blob_uri = job.result
+    transcript = transcription_cache.get(blob_uri)
+    if transcript is None:
+        raise exceptions.TranscriptionNotFoundError(blob_uri)
+
+    with measure_stage('search'):
+        match_results = search_transcription(get_validator_data(), blob_uri, transcript)
+
+    access_link = get_storage_backend().get_access_link(blob_uri)
+    return jsonify(status_code=200, message='Query was successful!', matches=match_results,
+        access_link=access_link, elapsed_time=time.time() - route_start_time, success=True)
+
+@bp.route('/jobs/<job_id>/batch', methods=['POST'])
+@validate_route(BatchSearchOptionsSchema)
+def batch_query_job(job_id):
+    '''
+    Searches the transcription produced by a job for a list of queries, once it has succeeded.
+
+    '''
+
+    route_start_time = time.time()
+
+    job = get_job_or_raise(job_id)
+    if job.status != JobStatus.SUCCEEDED:
+        raise exceptions.JobNotFinishedError(job)
+
+    blob_uri = job.result
+    transcript = transcription_cache.get(blob_uri)
+    if transcript is None:
+        raise exceptions.TranscriptionNotFoundError(blob_uri)
+
+    with measure_stage('search'):
+        results = search_batch(get_validator_data(), blob_uri, transcript)
+
+    access_link = get_storage_backend().get_access_link(blob_uri)
+    return jsonify(status_code=200, message='Query was successful!', results=results,
+        access_link=access_link, elapsed_time=time.time() - route_start_time, success=True)
+
+class CorpusQuerySchema(Schema):
+    query = fields.StringField(validators=[validators.DataRequired()])
+    search_output_mode = fields.EnumField(SearchOutputMode, default_value=SearchOutputMode.EXACT_MATCH)
+    is_fuzzy_search = fields.BooleanField(default_value=False)
+    is_semantic_search = fields.BooleanField(default_value=False)
+    top_k = fields.IntegerField(default_value=10)
+
+@bp.route('/corpus', methods=['POST'])
+@validate_route(CorpusQuerySchema)
+def corpus_query():
+    route_start_time = time.time()
+
+    data = get_validator_data()
+    query_text = data['query'].strip().lower()
+
+    # The recordings transcribed by other app processes are added to the corpus index the first
+    # time they are seen (those whose transcription has expired from the cache are skipped).
+    for blob_uri in get_transcribed_manifest().get_blob_names():
+        if corpus_index.is_seen(blob_uri): continue
+
+        transcript = transcription_cache.get(blob_uri)
+        if transcript is None: continue
+
+        corpus_index.add(blob_uri, TranscriptIndex(TranscriptAlignment(transcript)))
+
+    if data['is_semantic_search']:
+        # The semantic index of each transcription is kept alongside the alignment it refers to.
+        semantic_indexes = corpus_index.get_indexes(('semantic', current_app.config['SEMANTIC_SEARCH_EMBEDDER']),
+            lambda blob_uri, transcript_index: (get_semantic_index(blob_uri, None, transcript_index.alignment),
+                transcript_index.alignment))
+        indexes = [(blob_uri, semantic_index, alignment) for blob_uri, (semantic_index, alignment) in semantic_indexes]
+
+        with measure_stage('embedding'):
+            query_vector = get_sentence_embedder().embed([query_text])[0]
+
+        with measure_stage('search'):
+            match_results = search_semantic_corpus(indexes, query_text, query_vector, top_k=data['top_k'])
+    else:
+        indexes = corpus_index.get_indexes('fuzzy' if data['is_fuzzy_search'] else None)
+
+        with measure_stage('search'):
+            match_results = search_corpus(indexes, query_text, top_k=data['top_k'],
+                sentence_output=data['search_output_mode'] == SearchOutputMode.SENTENCE)
+
+    return jsonify(status_code=200, message='Query was successful!', matches=match_results,
+        recording_count=len(indexes), elapsed_time=time.time() - route_start_time, success=True)
+
+@bp.route('/cache', methods=['GET'])
+def get_cache_stats():
+    '''
+    Gets the hit/miss counters of the result caches of the app process handling the request.
+
+    '''
+
+    return jsonify(status_code=200, caches={result_cache.name: result_cache.get_stats()
+        for result_cache in get_result_caches()}, success=True)
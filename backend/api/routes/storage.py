@@ -0,0 +1,29 @@
+'''
+Defines the routes that serve the blobs of the local storage backend.
+
+'''
+
+import api.http_errors as exceptions
+from api.storage import LocalStorageBackend
+from api.extensions import get_storage_backend
+from flask import Blueprint, send_file
+
+bp = Blueprint('storage', __name__, url_prefix='/api/storage')
+
+@bp.route('/<path:blob_name>', methods=['GET'])
+def get_blob(blob_name):
+    '''
+    Serves a blob of the local storage backend. Range requests are supported, so that audio
+    players can stream and seek the file.
+
+    '''
+
+    storage_backend = get_storage_backend()
+    if not isinstance(storage_backend, LocalStorageBackend):
+        raise exceptions.BlobNotFoundError(blob_name)
+
+    filepath = storage_backend.get_filepath(blob_name)
+    if filepath is None or not filepath.is_file():
+        raise exceptions.BlobNotFoundError(blob_name)
+
+    return send_file(str(filepath), mimetype='audio/wav', conditional=True)
@@ -0,0 +1,7 @@
+from api.search.transcript_alignment import TranscriptAlignment, normalize_token
+from api.search.transcript_index import TranscriptIndex
+from api.search.multi_pattern import AhoCorasickAutomaton
+from api.search.fuzzy_index import FuzzyIndex
+from api.search.vector_index import VectorIndex
+from api.search.semantic_index import SemanticIndex
+from api.search.corpus import CorpusIndex
\ No newline at end of file
@@ -0,0 +1,185 @@
+'''
+Searching the whole corpus of transcriptions.
+
+'''
+
+import heapq
+import threading
+from collections import OrderedDict
+
+from api.search.fuzzy_index import FuzzyIndex
+
+class CorpusIndex:
+    '''
+    The indexes of the transcriptions of the corpus, which stay resident in process.
+
+    The corpus route searches every transcription, so its indexes cannot go through the LRU
+    caches of the indexes of single recordings: once the corpus is larger than those caches,
+    every corpus query would evict (and rebuild) all of them. Instead, the index of every
+    transcription is added here once, when it is transcribed (or when it is first seen in the
+    manifest of the transcribed recordings), and is kept until the index holds more than max_size
+    transcriptions, at which point the oldest ones are removed. The other indexes of a
+    transcription (such as its trigram index) are only built on the first corpus query that
+    needs them, and then kept alongside.
+
+    '''
+
+    def __init__(self, max_size=None):
+        '''
+        :param max_size:
+            The maximum number of transcriptions in the index (default=None, in which case there is no limit).
+
+        '''
+
+        self.max_size = max_size
+
+        # The TranscriptIndex and (once they are built) the other indexes of each transcription,
+        # by kind, oldest first.
+        self._entries = OrderedDict()
+        self._seen_blob_uris = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config['CORPUS_INDEX_SIZE']
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_seen(self, blob_uri):
+        '''
+        Gets whether a recording has ever been added to the index (even if it has been removed since).
+
+        '''
+
+        return blob_uri in self._seen_blob_uris
+
+    def add(self, blob_uri, transcript_index):
+        '''
+        Adds the index of the transcription of a recording, removing the oldest ones if the index is full.
+
+        '''
+
+        with self._lock:
+            self._seen_blob_uris.add(blob_uri)
+            if blob_uri in self._entries: return
+
+            self._entries[blob_uri] = {None: transcript_index}
+            while self.max_size is not None and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_indexes(self, kind=None, build_index=None):
+        '''
+        Gets an index of every transcription of the corpus.
+
+        :param kind:
+            The kind of the index (a hashable value, e.g. 'fuzzy'), or None to get the TranscriptIndex
+            of every transcription (default=None, optional).
+        :param build_index:
+            A function taking the blob uri of a recording and the TranscriptIndex of its transcription,
+            which builds the index of the kind (default=None, in which case a FuzzyIndex is built).
+            It is only called for the transcriptions that do not have an index of the kind yet.
+
+        :returns:
+            A list of tuples containing the blob uri of a recording and the index of its transcription.
+
+        '''
+
+        if build_index is None:
+            build_index = lambda blob_uri, transcript_index: FuzzyIndex(transcript_index)
+
+        with self._lock:
+            entries = list(self._entries.items())
+
+        indexes = []
+        for blob_uri, entry in entries:
+            if kind not in entry:
+                entry[kind] = build_index(blob_uri, entry[None])
+
+            indexes.append((blob_uri, entry[kind]))
+
+        return indexes
+
+def search_corpus(indexes, query_text, top_k=10, sentence_output=False):
+    '''
+    Searches every transcription of a corpus for a phrase. The indexes are searched in process,
+    where they are already cached: a phrase query is a few lookups in the postings of each index,
+    which is much cheaper than sending the indexes to other processes.
+
+    :param indexes:
+        A list of tuples containing the blob uri of a recording and the index of its transcription
+        (either a TranscriptIndex or a FuzzyIndex).
+    :param query_text:
+        The phrase to search for.
+    :param top_k:
+        The maximum number of matches to return (default=10, optional).
+    :param sentence_output:
+        Indicates whether matches should span the sentence containing them (default=False, optional).
+
+    :returns:
+        A list of the top_k matches across the corpus, ranked by descending score.
+
+    '''
+
+    def get_matches():
+        for blob_uri, index in indexes:
+            alignment = index.transcript_index.alignment if isinstance(index, FuzzyIndex) else index.alignment
+            sentence_cache = set()
+            for match in index.find_phrase(query_text):
+                start_position, end_position = match[0], match[1]
+                similarity = match[2] if len(match) > 2 else 1
+
+                matched_query = alignment.get_text(start_position, end_position)
+                if sentence_output:
+                    start_position, end_position = alignment.get_sentence_bounds(start_position)
+                    if start_position in sentence_cache: continue
+                    sentence_cache.add(start_position)
+
+                confidence = alignment.confidences[start_position]
+                yield {
+                    'blob_uri': blob_uri,
+                    'matched_query': matched_query,
+                    'start_time': alignment.start_times[start_position],
+                    'end_time': alignment.end_times[end_position],
+                    'confidence': confidence,
+                    'similarity': similarity,
+                    'score': confidence * similarity,
+                    'transcript': alignment.get_text(start_position, end_position)
+                }
+
+    return heapq.nlargest(top_k, get_matches(), key=lambda match: match['score'])
+
+def search_semantic_corpus(indexes, query_text, query_vector, top_k=10):
+    '''
+    Semantically searches every transcription of a corpus. The query is embedded once, and the
+    sentences of every transcription are scored with vectorized cosine similarities.
+
+    :param indexes:
+        A list of tuples containing the blob uri of a recording, the semantic index of its
+        transcription, and the alignment of its transcription.
+    :param query_text:
+        The query.
+    :param query_vector:
+        The embedding of the query.
+    :param top_k:
+        The maximum number of matches to return (default=10, optional).
+
+    :returns:
+        A list of the top_k matches across the corpus, ranked by descending similarity.
+
+    '''
+
+    def get_matches():
+        for blob_uri, semantic_index, alignment in indexes:
+            for start_position, end_position, similarity in semantic_index.find_sentences(query_vector, top_k):
+                yield {
+                    'blob_uri': blob_uri,
+                    'matched_query': query_text,
+                    'start_time': alignment.start_times[start_position],
+                    'end_time': alignment.end_times[end_position],
+                    'confidence': alignment.confidences[start_position],
+                    'similarity': similarity,
+                    'score': similarity,
+                    'transcript': alignment.get_text(start_position, end_position)
+                }
+
+    return heapq.nlargest(top_k, get_matches(), key=lambda match: match['score'])
@@ -0,0 +1,181 @@
+'''
+Approximate (fuzzy) phrase search over a transcription, backed by a character trigram index.
+
+'''
+
+from collections import Counter
+
+from api.search.transcript_alignment import normalize_token
+
+_NGRAM_SIZE = 3
+_PADDING_CHARACTER = '$'
+
+def get_trigrams(term):
+    '''
+    Gets the multiset of character trigrams of a term, as a Counter mapping each trigram to its
+    number of occurrences. The term is padded on both sides so that a term of length n has n
+    trigrams and even single character terms have one.
+
+    '''
+
+    padded_term = '{0}{1}{0}'.format(_PADDING_CHARACTER, term)
+    return Counter(padded_term[i:i + _NGRAM_SIZE] for i in range(len(padded_term) - _NGRAM_SIZE + 1))
+
+def get_default_max_distance(term):
+    '''
+    Gets the default maximum edit distance for a term: one edit for every four characters.
+
+    '''
+
+    return len(term) // 4
+
+def bounded_edit_distance(source, target, max_distance):
+    '''
+    Computes the Levenshtein distance between two strings, giving up as soon as it is
+    known to exceed a maximum distance.
+
+    :param max_distance:
+        The maximum distance of interest.
+
+    :returns:
+        The edit distance, or None if it is larger than max_distance.
+
+    '''
+
+    if abs(len(source) - len(target)) > max_distance: return None
+    if source == target: return 0
+
+    previous_row = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        # Only the cells within max_distance of the diagonal can be part of a bounded path.
+        lower, upper = max(1, i - max_distance), min(len(target), i + max_distance)
+        current_row = [i] + [max_distance + 1] * len(target)
+        for j in range(lower, upper + 1):
+            cost = 0 if source_char == target[j - 1] else 1
+            current_row[j] = min(previous_row[j] + 1, current_row[j - 1] + 1, previous_row[j - 1] + cost)
+
+        if min(current_row[max(0, lower - 1):upper + 1]) > max_distance: return None
+        previous_row = current_row
+
+    distance = previous_row[len(target)]
+    return distance if distance <= max_distance else None
+
+class FuzzyIndex:
+    '''
+    A character trigram index over the vocabulary of a transcript index.
+
+    Query terms are matched against the vocabulary rather than against every word: the trigram
+    index narrows the vocabulary to the terms that share enough trigrams with the query term to
+    possibly be within the maximum edit distance, and only those candidates are verified with a
+    bounded edit distance computation.
+
+    '''
+
+    def __init__(self, transcript_index):
+        '''
+        Builds the index.
+
+        :param transcript_index:
+            The positional index of the transcription.
+
+        '''
+
+        self.transcript_index = transcript_index
+        self.terms = list(transcript_index.postings.keys())
+        self.trigram_postings = {}
+        self.terms_by_length = {}
+        for term_id, term in enumerate(self.terms):
+            self.terms_by_length.setdefault(len(term), []).append(term_id)
+            for trigram, count in get_trigrams(term).items():
+                self.trigram_postings.setdefault(trigram, []).append((term_id, count))
+
+    def _get_candidate_term_ids(self, term, max_distance):
+        # A single edit changes at most _NGRAM_SIZE trigrams, so a term within max_distance of the
+        # query term must share at least this many of its trigrams (the count filter). The trigrams
+        # are counted with their multiplicity, since a repeated trigram can be changed only once.
+        min_shared_trigrams = len(term) - _NGRAM_SIZE * max_distance
+        if min_shared_trigrams <= 0:
+            # The count filter cannot prune anything; fall back to a length filter.
+            return [term_id for length in range(len(term) - max_distance, len(term) + max_distance + 1)
+                for term_id in self.terms_by_length.get(length, ())]
+
+        shared_trigram_counts = {}
+        for trigram, query_count in get_trigrams(term).items():
+            for term_id, count in self.trigram_postings.get(trigram, ()):
+                shared_trigram_counts[term_id] = shared_trigram_counts.get(term_id, 0) + min(query_count, count)
+
+        return [term_id for term_id, count in shared_trigram_counts.items() if count >= min_shared_trigrams]
+
+    def find_similar_terms(self, term, max_distance=None):
+        '''
+        Finds the terms in the vocabulary that are within a maximum edit distance of a term.
+
+        :param term:
+            A normalized term.
+        :param max_distance:
+            The maximum edit distance (default=None, in which case it is based on the term length).
+
+        :returns:
+            A dictionary mapping each similar term to its edit distance.
+
+        '''
+
+        if max_distance is None:
+            max_distance = get_default_max_distance(term)
+
+        similar_terms = {}
+        for term_id in self._get_candidate_term_ids(term, max_distance):
+            candidate = self.terms[term_id]
+            distance = bounded_edit_distance(term, candidate, max_distance)
+            if distance is None: continue
+
+            similar_terms[candidate] = distance
+
+        return similar_terms
+
+    def find_phrase(self, query_text, max_distance=None):
+        '''
+        Finds all the approximate occurrences of a phrase. Each term of the phrase must be within
+        the maximum edit distance of its word, and a match cannot cross a sentence boundary.
+
+        :param query_text:
+            The phrase to search for.
+        :param max_distance:
+            The maximum edit distance per term (default=None, in which case it is based on the term length).
+
+        :returns:
+            A list of tuples containing the inclusive start and end word positions of each match,
+            and its similarity (in the range [0, 1]), sorted by position.
+
+        '''
+
+        terms = [term for term in (normalize_token(token) for token in query_text.split()) if term]
+        if len(terms) == 0: return []
+
+        similar_terms = [self.find_similar_terms(term, max_distance) for term in terms]
+        if any(len(term_matches) == 0 for term_matches in similar_terms): return []
+
+        # Anchor on the query term with the fewest occurrences in the transcript.
+        postings = self.transcript_index.postings
+        anchor_counts = [sum(len(postings[term]) for term in term_matches) for term_matches in similar_terms]
+        anchor_offset = anchor_counts.index(min(anchor_counts))
+        start_positions = sorted(position - anchor_offset
+            for term in similar_terms[anchor_offset] for position in postings[term])
+
+        alignment = self.transcript_index.alignment
+        total_length = sum(len(term) for term in terms)
+
+        matches = []
+        for start in start_positions:
+            end = start + len(terms) - 1
+            if start < 0 or end >= len(alignment) or alignment.sentence_ends[start] < end: continue
+
+            total_distance = 0
+            for offset, term_matches in enumerate(similar_terms):
+                distance = term_matches.get(alignment.get_normalized_token(start + offset))
+                if distance is None: break
+                total_distance += distance
+            else:
+                matches.append((start, end, 1 - total_distance / total_length))
+
+        return matches
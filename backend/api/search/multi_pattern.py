@@ -0,0 +1,95 @@
+'''
+Matching many patterns against a text in a single pass, with an Aho–Corasick automaton.
+
+'''
+
+from collections import deque
+
+class AhoCorasickAutomaton:
+    '''
+    An Aho–Corasick automaton, which finds every occurrence of any of a set of patterns in a text
+    in time linear in the length of the text (plus the number of occurrences), however many
+    patterns there are.
+
+    The automaton is a trie of the patterns whose states also have a failure link (to the state of
+    the longest proper suffix of their string that is also in the trie) and an output link (to the
+    nearest state, along the failure links, at which a pattern ends).
+
+    '''
+
+    def __init__(self, patterns):
+        '''
+        Builds the automaton.
+
+        :param patterns:
+            A list of non-empty strings. Duplicate patterns are allowed.
+
+        '''
+
+        self.patterns = list(patterns)
+
+        # The transitions of every state, and the indices of the patterns that end at it.
+        self._transitions = [{}]
+        self._pattern_ids = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for character in pattern:
+                next_state = self._transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][character] = next_state
+                    self._transitions.append({})
+                    self._pattern_ids.append([])
+
+                state = next_state
+
+            self._pattern_ids[state].append(pattern_id)
+
+        self._failures = [0] * len(self._transitions)
+        self._outputs = [None] * len(self._transitions)
+
+        # The links are computed breadth-first, so that the links of shallower states are known.
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._transitions[state].items():
+                failure = self._failures[state]
+                while failure and character not in self._transitions[failure]:
+                    failure = self._failures[failure]
+
+                failure = self._transitions[failure].get(character, 0)
+                self._failures[next_state] = failure
+                self._outputs[next_state] = failure if self._pattern_ids[failure] else self._outputs[failure]
+                queue.append(next_state)
+
+    def find_all(self, text):
+        '''
+        Finds every occurrence of the patterns in a text, including overlapping occurrences.
+
+        :param text:
+            The string to search.
+
+        :returns:
+            A generator of tuples containing the index of a pattern and the index of the character
+            at which its occurrence ends (exclusive), in increasing order of end index.
+
+        '''
+
+        transitions = self._transitions
+        failures = self._failures
+        pattern_ids = self._pattern_ids
+        outputs = self._outputs
+
+        state = 0
+        for end, character in enumerate(text, 1):
+            while state and character not in transitions[state]:
+                state = failures[state]
+
+            state = transitions[state].get(character, 0)
+
+            output_state = state if pattern_ids[state] else outputs[state]
+            while output_state:
+                for pattern_id in pattern_ids[output_state]:
+                    yield pattern_id, end
+
+                output_state = outputs[output_state]
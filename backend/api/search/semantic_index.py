@@ -0,0 +1,68 @@
+'''
+Semantic search over the sentences of a transcription, backed by sentence embeddings.
+
+'''
+
+import math
+
+import numpy as np
+
+from api.search.vector_index import VectorIndex
+
+class SemanticIndex:
+    '''
+    An index of the sentence embeddings of a transcription.
+
+    Every sentence is embedded once, when the index is built. A query is then embedded on its
+    own and compared with every sentence (or, for long transcriptions, with the sentences of the
+    nearest clusters) by cosine similarity.
+
+    '''
+
+    def __init__(self, alignment, embedder, ivf_min_size=4096, probe_count=8):
+        '''
+        Builds the index.
+
+        :param alignment:
+            The alignment of the transcription to index.
+        :param embedder:
+            The sentence embedder.
+        :param ivf_min_size:
+            The minimum number of sentences for the vectors to be partitioned into inverted lists,
+            of which there are about the square root of the number of sentences (default=4096, optional).
+        :param probe_count:
+            The number of inverted lists that are searched for a query (default=8, optional).
+
+        '''
+
+        sentence_offsets = np.asarray(alignment.transcript.sentence_offsets)
+        self.sentence_starts = sentence_offsets[:-1]
+        self.sentence_ends = sentence_offsets[1:] - 1
+
+        sentences = [alignment.get_text(start, end) for start, end in zip(self.sentence_starts.tolist(), self.sentence_ends.tolist())]
+        list_count = int(math.sqrt(len(sentences))) if len(sentences) >= ivf_min_size else None
+
+        vectors = embedder.embed(sentences) if sentences else np.zeros((0, 1), dtype=np.float32)
+        self.vector_index = VectorIndex(vectors, list_count=list_count, probe_count=probe_count)
+
+    def __len__(self):
+        return len(self.sentence_starts)
+
+    def find_sentences(self, query_vector, top_k):
+        '''
+        Finds the sentences most similar to a query.
+
+        :param query_vector:
+            The embedding of the query.
+        :param top_k:
+            The maximum number of sentences to return.
+
+        :returns:
+            A list of tuples containing the inclusive start and end word positions of each
+            sentence and its cosine similarity to the query, in descending order of similarity.
+
+        '''
+
+        ids, similarities = self.vector_index.search(query_vector, top_k)
+        return [(int(self.sentence_starts[i]), int(self.sentence_ends[i]), float(similarity))
+            for i, similarity in zip(ids.tolist(), similarities)]
@@ -0,0 +1,131 @@
+'''
+An alignment between the text of a transcription and its timestamped words.
+
+'''
+
+import string
+from bisect import bisect_left
+
+import numpy as np
+
+_PUNCTUATION_TRANSLATOR = str.maketrans('', '', string.punctuation)
+
+def normalize_token(token):
+    '''
+    Normalizes a single token to make it indexable. Removes any punctuation and
+    leading/trailing whitespace, and converts it to lowercase.
+
+    '''
+
+    return token.translate(_PUNCTUATION_TRANSLATOR).strip().lower()
+
+class TranscriptAlignment:
+    '''
+    Aligns the segments of a transcription with their timestamped words.
+
+    Every word of every segment is assigned a global position. For each position, the
+    alignment exposes the id of the normalized token (in the sorted vocabulary of normalized
+    tokens), its timestamps, the confidence of its segment, and the bounds of its sentence.
+    These are all (NumPy) arrays, the timestamps being those of the compact transcript, so
+    they can be indexed by many positions at once. A character offset in the
+    transcript of a segment is mapped to a word with a single binary search over the
+    character offsets of its tokens.
+
+    '''
+
+    def __init__(self, transcript):
+        '''
+        Builds the alignment.
+
+        :param transcript:
+            A CompactTranscript object.
+
+        '''
+
+        self.transcript = transcript
+        self._vocabulary = transcript.vocabulary.tolist()
+
+        # Several tokens can have the same normalized token (e.g. 'word' and 'word,').
+        normalized_tokens = [normalize_token(token) for token in self._vocabulary]
+        self.normalized_vocabulary = sorted(set(normalized_tokens))
+        normalized_vocabulary_ids = {normalized_token: token_id for token_id, normalized_token in enumerate(self.normalized_vocabulary)}
+        normalized_ids = np.array([normalized_vocabulary_ids[normalized_token] for normalized_token in normalized_tokens], dtype=np.int32)
+        self.normalized_token_ids = normalized_ids[transcript.token_ids]
+
+        self.start_times = transcript.start_times
+        self.end_times = transcript.end_times
+
+        segment_lengths = np.diff(transcript.segment_offsets)
+        self.confidences = np.repeat(transcript.segment_confidences.astype(np.float64), segment_lengths)
+
+        sentence_lengths = np.diff(transcript.sentence_offsets)
+        self.sentence_starts = np.repeat(transcript.sentence_offsets[:-1], sentence_lengths)
+        self.sentence_ends = np.repeat(transcript.sentence_offsets[1:] - 1, sentence_lengths)
+
+        self.transcripts = transcript.transcripts
+        self.segment_offsets = transcript.segment_offsets
+
+    def __len__(self):
+        return len(self.normalized_token_ids)
+
+    def get_normalized_token_id(self, normalized_token):
+        '''
+        Gets the id of a normalized token, or None if it is not in the transcription.
+
+        '''
+
+        token_id = bisect_left(self.normalized_vocabulary, normalized_token)
+        if token_id == len(self.normalized_vocabulary) or self.normalized_vocabulary[token_id] != normalized_token: return None
+
+        return token_id
+
+    def get_normalized_token(self, position):
+        return self.normalized_vocabulary[self.normalized_token_ids[position]]
+
+    def get_normalized_tokens(self, start, end):
+        '''
+        Gets the list of normalized tokens of the inclusive word range [start, end].
+
+        '''
+
+        return [self.normalized_vocabulary[token_id] for token_id in self.normalized_token_ids[start:end + 1].tolist()]
+
+    def get_word_position(self, segment_index, char_offset):
+        '''
+        Gets the global position of the word containing a character of a segment transcript.
+
+        :param segment_index:
+            The index of the segment (amongst the non-empty segments of the transcription).
+        :param char_offset:
+            The character offset in the transcript of the segment.
+
+        '''
+
+        segment_start, segment_end = self.get_segment_bounds(segment_index)
+        token_char_offsets = self.transcript.token_char_offsets[segment_start:segment_end + 1]
+        token_index = max(int(np.searchsorted(token_char_offsets, char_offset, side='right')) - 1, 0)
+        return segment_start + token_index
+
+    def get_segment_bounds(self, segment_index):
+        '''
+        Gets the inclusive start and end word positions of a segment.
+
+        '''
+
+        return int(self.segment_offsets[segment_index]), int(self.segment_offsets[segment_index + 1]) - 1
+
+    def get_sentence_bounds(self, position):
+        '''
+        Gets the inclusive start and end word positions of the sentence containing a word.
+
+        '''
+
+        return int(self.sentence_starts[position]), int(self.sentence_ends[position])
+
+    def get_text(self, start, end):
+        '''
+        Gets the transcript text spanning the inclusive word range [start, end].
+
+        '''
+
+        return ' '.join(self._vocabulary[token_id] for token_id in self.transcript.token_ids[start:end + 1].tolist())
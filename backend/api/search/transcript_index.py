@@ -0,0 +1,234 @@
+'''
+A positional inverted index over a transcription.
+
+'''
+
+from bisect import bisect_left
+
+import numpy as np
+
+from api.search.transcript_alignment import normalize_token
+from api.search.multi_pattern import AhoCorasickAutomaton
+
+class TranscriptIndex:
+    '''
+    A positional inverted index over the words of a transcription.
+
+    Every word of every valid result is assigned a global position. The index maps each
+    normalized term to the (sorted) positions at which it occurs so that term and phrase
+    queries resolve directly to word ranges, and from there to timestamps, without
+    rescanning the transcript text.
+
+    A query term may match only part of a word (see find_term and find_phrase). The terms
+    starting with a query term are found by a binary search in the sorted terms, and the terms
+    containing or ending with it by a binary search in the sorted suffixes of the terms, so
+    that the vocabulary is never scanned.
+
+    '''
+
+    def __init__(self, alignment):
+        '''
+        Builds the index.
+
+        :param alignment:
+            The alignment of the transcription to index.
+
+        '''
+
+        self.alignment = alignment
+        self._token_text = None
+        self._token_offsets = None
+        self._suffixes = None
+        self.postings = {}
+
+        # A stable sort of the token ids groups the positions of every term, in order.
+        token_ids = alignment.normalized_token_ids
+        positions = np.argsort(token_ids, kind='stable')
+        boundaries = np.cumsum(np.bincount(token_ids, minlength=len(alignment.normalized_vocabulary)))[:-1]
+        for normalized_token, token_positions in zip(alignment.normalized_vocabulary, np.split(positions, boundaries)):
+            if not normalized_token or len(token_positions) == 0: continue
+            self.postings[normalized_token] = token_positions.tolist()
+
+        self.terms = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.alignment)
+
+    def _get_suffixes(self):
+        # A sorted list of tuples containing every suffix of every term, and the term itself.
+        # It is built the first time that a term is searched inside or at the end of words.
+        if self._suffixes is None:
+            self._suffixes = sorted((term[i:], term) for term in self.terms for i in range(len(term)))
+
+        return self._suffixes
+
+    def get_terms_starting_with(self, prefix):
+        '''
+        Gets the indexed terms that start with a prefix.
+
+        '''
+
+        terms = set()
+        for i in range(bisect_left(self.terms, prefix), len(self.terms)):
+            if not self.terms[i].startswith(prefix): break
+            terms.add(self.terms[i])
+
+        return terms
+
+    def get_terms_containing(self, text):
+        '''
+        Gets the indexed terms that contain a string.
+
+        '''
+
+        suffixes = self._get_suffixes()
+        terms = set()
+        for i in range(bisect_left(suffixes, (text,)), len(suffixes)):
+            suffix, term = suffixes[i]
+            if not suffix.startswith(text): break
+            terms.add(term)
+
+        return terms
+
+    def get_terms_ending_with(self, suffix):
+        '''
+        Gets the indexed terms that end with a suffix.
+
+        '''
+
+        suffixes = self._get_suffixes()
+        terms = set()
+        for i in range(bisect_left(suffixes, (suffix,)), len(suffixes)):
+            if suffixes[i][0] != suffix: break
+            terms.add(suffixes[i][1])
+
+        return terms
+
+    def find_term(self, term):
+        '''
+        Finds all the words containing a term.
+
+        :param term:
+            A normalized term.
+
+        :returns:
+            A sorted list of word positions.
+
+        '''
+
+        positions = []
+        for indexed_term in self.get_terms_containing(term):
+            positions.extend(self.postings[indexed_term])
+
+        return sorted(positions)
+
+    def find_phrase(self, query_text):
+        '''
+        Finds all the occurrences of a phrase. A match may start inside the first word and end
+        inside the last word of the phrase (i.e. the first term is a suffix of its word, and the
+        last term is a prefix of its word), but cannot cross a sentence boundary. The query is
+        matched literally (rather than as a regular expression), and punctuation is ignored.
+
+        :param query_text:
+            The phrase to search for.
+
+        :returns:
+            A sorted list of tuples containing the inclusive start and end word positions of each match.
+
+        '''
+
+        terms = [term for term in (normalize_token(token) for token in query_text.split()) if term]
+        if len(terms) == 0: return []
+        if len(terms) == 1:
+            return [(position, position) for position in self.find_term(terms[0])]
+
+        first_terms = self.get_terms_ending_with(terms[0])
+        last_terms = self.get_terms_starting_with(terms[-1])
+        middle_terms = terms[1:-1]
+
+        # Anchor on the most selective list of postings: an exact middle term if there is one,
+        # and otherwise every term that can start the phrase.
+        if middle_terms:
+            anchor_offset, anchor_term = min(enumerate(middle_terms, 1), key=lambda x: len(self.postings.get(x[1], ())))
+            start_positions = [position - anchor_offset for position in self.postings.get(anchor_term, ())]
+        else:
+            start_positions = sorted(position for term in first_terms for position in self.postings[term])
+
+        # The words are compared by the ids of their normalized tokens.
+        get_token_id = self.alignment.get_normalized_token_id
+        first_ids = {get_token_id(term) for term in first_terms}
+        last_ids = {get_token_id(term) for term in last_terms}
+        middle_ids = [get_token_id(term) for term in middle_terms]
+        if None in middle_ids: return []
+
+        matches = []
+        phrase_length = len(terms)
+        token_ids = self.alignment.normalized_token_ids
+        sentence_ends = self.alignment.sentence_ends
+        for start in start_positions:
+            end = start + phrase_length - 1
+            if start < 0 or end >= len(token_ids) or sentence_ends[start] < end: continue
+            if int(token_ids[start]) not in first_ids: continue
+            if int(token_ids[end]) not in last_ids: continue
+            if token_ids[start + 1:end].tolist() != middle_ids: continue
+
+            matches.append((start, end))
+
+        return matches
+
+    def _get_token_text(self):
+        # The normalized tokens joined by single spaces, and the character offset of each token.
+        # Both are built the first time several phrases are searched at once.
+        if self._token_text is None:
+            vocabulary = self.alignment.normalized_vocabulary
+            token_ids = self.alignment.normalized_token_ids
+            token_lengths = np.array([len(normalized_token) for normalized_token in vocabulary], dtype=np.int64)[token_ids] + 1
+
+            self._token_text = ' '.join([vocabulary[token_id] for token_id in token_ids.tolist()])
+            self._token_offsets = np.cumsum(token_lengths) - token_lengths
+
+        return self._token_text, self._token_offsets
+
+    def find_phrases(self, query_texts):
+        '''
+        Finds all the occurrences of several phrases at once, with the same semantics as find_phrase.
+
+        Every phrase becomes the pattern of its terms joined by single spaces, and all the patterns
+        are matched in a single pass over the normalized tokens (joined by single spaces) with an
+        Aho–Corasick automaton. An occurrence of a pattern in this text is exactly a match of its
+        phrase: only the first term can be preceded, and only the last term followed, by other
+        characters of the same word.
+
+        :param query_texts:
+            A list of phrases.
+
+        :returns:
+            A list containing, for each phrase, a sorted list of tuples containing the inclusive start
+            and end word positions of each match.
+
+        '''
+
+        patterns = [' '.join(term for term in (normalize_token(token) for token in query_text.split()) if term)
+            for query_text in query_texts]
+
+        matches = [[] for _ in patterns]
+        pattern_ids = [pattern_id for pattern_id, pattern in enumerate(patterns) if pattern]
+        if len(pattern_ids) == 0: return matches
+
+        token_text, token_offsets = self._get_token_text()
+        automaton = AhoCorasickAutomaton([patterns[pattern_id] for pattern_id in pattern_ids])
+        sentence_ends = self.alignment.sentence_ends
+
+        for automaton_pattern_id, end_offset in automaton.find_all(token_text):
+            pattern_id = pattern_ids[automaton_pattern_id]
+            start = int(np.searchsorted(token_offsets, end_offset - len(patterns[pattern_id]), side='right')) - 1
+            end = int(np.searchsorted(token_offsets, end_offset - 1, side='right')) - 1
+            if sentence_ends[start] < end: continue
+
+            # A single term can occur several times in the same word.
+            pattern_matches = matches[pattern_id]
+            if pattern_matches and pattern_matches[-1] == (start, end): continue
+
+            pattern_matches.append((start, end))
+
+        return matches
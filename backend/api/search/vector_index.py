@@ -0,0 +1,122 @@
+'''
+Nearest neighbour search over unit vectors by cosine similarity.
+
+'''
+
+import numpy as np
+
+def normalize_vectors(vectors):
+    '''
+    Scales the rows of a matrix to unit length. Rows of zeros are left as is.
+
+    '''
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+def get_top_k(scores, top_k):
+    '''
+    Gets the indices of the top_k highest scores, in descending order of score.
+
+    '''
+
+    if top_k < len(scores):
+        indices = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        indices = np.arange(len(scores))
+
+    return indices[np.argsort(-scores[indices], kind='stable')]
+
+class VectorIndex:
+    '''
+    An index of vectors that finds the vectors most similar to a query vector.
+
+    Small indexes are searched exhaustively (flat), with a single matrix-vector product. Large
+    indexes are partitioned into inverted lists (IVF): the vectors are clustered with spherical
+    k-means, and a query is only compared with the vectors of the clusters whose centroids are
+    the most similar to it. The vectors of each cluster are stored contiguously.
+
+    '''
+
+    def __init__(self, vectors, list_count=None, probe_count=8, iteration_count=10, seed=0):
+        '''
+        Builds the index.
+
+        :param vectors:
+            A two-dimensional array containing one vector per row.
+        :param list_count:
+            The number of inverted lists (default=None, in which case the index is flat).
+        :param probe_count:
+            The number of inverted lists that are searched for a query (default=8, optional).
+        :param iteration_count:
+            The number of iterations of k-means (default=10, optional).
+        :param seed:
+            The seed used to pick the initial centroids (default=0, optional).
+
+        '''
+
+        vectors = normalize_vectors(vectors)
+        self.probe_count = probe_count
+        self.centroids = None
+        self.list_offsets = None
+        self.ids = np.arange(len(vectors))
+
+        if list_count is not None and 1 < list_count < len(vectors):
+            self.centroids, assignments = self._train(vectors, list_count, iteration_count, seed)
+            self.ids = np.argsort(assignments, kind='stable')
+            self.list_offsets = np.searchsorted(assignments[self.ids], np.arange(list_count + 1))
+
+        self.vectors = vectors[self.ids]
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def is_flat(self):
+        return self.centroids is None
+
+    @staticmethod
+    def _train(vectors, list_count, iteration_count, seed):
+        random = np.random.RandomState(seed)
+        centroids = vectors[random.choice(len(vectors), list_count, replace=False)]
+        for _ in range(iteration_count):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for i in range(list_count):
+                members = vectors[assignments == i]
+                # An empty cluster keeps its previous centroid.
+                if len(members) > 0:
+                    centroids[i] = members.sum(axis=0)
+
+            centroids = normalize_vectors(centroids)
+
+        return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+    def search(self, query_vector, top_k):
+        '''
+        Finds the vectors most similar to a query vector.
+
+        :param query_vector:
+            A one-dimensional array.
+        :param top_k:
+            The maximum number of vectors to return.
+
+        :returns:
+            A tuple containing an array of the ids (row indices in the original matrix) of the most
+            similar vectors and an array of their cosine similarities, in descending order of similarity.
+
+        '''
+
+        query_vector = normalize_vectors(query_vector)
+        if len(self.vectors) == 0 or top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if self.is_flat:
+            rows = np.arange(len(self.vectors))
+        else:
+            probes = get_top_k(self.centroids @ query_vector, self.probe_count)
+            rows = np.concatenate([np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in probes])
+
+        scores = self.vectors[rows] @ query_vector
+        top_indices = get_top_k(scores, top_k)
+        return self.ids[rows[top_indices]], scores[top_indices]
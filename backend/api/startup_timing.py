@@ -0,0 +1,46 @@
+'''
+Timing of the start of the app, so that regressions in cold start time show up.
+
+'''
+
+import sys
+import time
+from contextlib import contextmanager
+
+'''
+The modules that are slow to import, and should only be imported when they are first used.
+'''
+HEAVY_MODULES = ('tensorflow', 'deeppavlov', 'nltk', 'librosa', 'numba', 'google.cloud.storage',
+    'google.cloud.speech_v1p1beta1')
+
+class StartupTimer:
+    '''
+    Records the duration of each step of the start of the app.
+
+    '''
+
+    def __init__(self):
+        self.timings = []
+
+    @contextmanager
+    def measure(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings.append((name, time.perf_counter() - start_time))
+
+    def get_report(self):
+        '''
+        Gets a report of the duration of each step, and of the heavy modules that were imported.
+
+        '''
+
+        lines = ['Startup timing:']
+        lines.extend('  {:<24}{:>8.3f} seconds'.format(name, duration) for name, duration in self.timings)
+        lines.append('  {:<24}{:>8.3f} seconds'.format('total', sum(duration for _, duration in self.timings)))
+
+        imported_modules = [name for name in HEAVY_MODULES if name in sys.modules]
+        lines.append('  Heavy modules imported at startup: {}'.format(', '.join(imported_modules) or 'none'))
+
+        return '\n'.join(lines)
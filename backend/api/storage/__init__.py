@@ -0,0 +1,2 @@
+from api.storage.manifest import BlobManifest
+from api.storage.backends import StorageBackend, GoogleCloudStorageBackend, LocalStorageBackend, create_backend
@@ -0,0 +1,193 @@
+'''
+Blob storage backends, which store the preprocessed audio files.
+
+'''
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from datetime import timedelta
+
+from cachetools import TTLCache
+from flask import url_for
+
+from api.storage.manifest import BlobManifest
+
+class StorageBackend:
+    '''
+    The interface of a blob storage backend.
+
+    '''
+
+    def get_blob_uri(self, blob_name):
+        raise NotImplementedError()
+
+    def get_blob_name(self, blob_uri):
+        raise NotImplementedError()
+
+    def upload(self, filepath, blob_name):
+        '''
+        Uploads a file, unless a blob with the same name already exists. Blobs are named after
+        the checksum of their contents, so an existing blob is never overwritten.
+
+        :param filepath:
+            The path to the file.
+        :param blob_name:
+            The name of the blob.
+
+        :returns:
+            The uri of the blob.
+
+        '''
+
+        raise NotImplementedError()
+
+    def get_access_link(self, blob_uri):
+        '''
+        Gets a URL from which the contents of a blob can be downloaded.
+
+        '''
+
+        raise NotImplementedError()
+
+class GoogleCloudStorageBackend(StorageBackend):
+    '''
+    Stores blobs in a Google Cloud Storage bucket.
+
+    The client is created once and reused by every request. Blobs that are known to exist are
+    recorded in a manifest, so that they are not checked for over the network, and signed URLs
+    are reused until shortly before they expire.
+
+    '''
+
+    def __init__(self, auth_filepath, bucket_name, manifest=None, url_expiration=60 * 60, url_expiration_margin=5 * 60):
+        '''
+        :param auth_filepath:
+            The path to the service account credentials file.
+        :param bucket_name:
+            The name of the bucket.
+        :param manifest:
+            The manifest of the blobs that are known to exist (default=None, in which case an
+            in-memory manifest is used).
+        :param url_expiration:
+            The number of seconds for which a signed URL is valid (default=3600, optional).
+        :param url_expiration_margin:
+            The number of seconds before its expiration at which a signed URL stops being
+            reused (default=300, optional).
+
+        '''
+
+        self.auth_filepath = auth_filepath
+        self.bucket_name = bucket_name
+        self.manifest = manifest if manifest is not None else BlobManifest()
+        self.url_expiration = url_expiration
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._signed_urls = TTLCache(maxsize=4096, ttl=url_expiration - url_expiration_margin)
+        self._signed_urls_lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        # Creating a bucket object (unlike get_bucket) does not send a request.
+        with self._client_lock:
+            if self._client is None:
+                from google.cloud import storage
+                self._client = storage.Client.from_service_account_json(self.auth_filepath)
+
+        return self._client.bucket(self.bucket_name)
+
+    def get_blob_uri(self, blob_name): return 'gs://{}/{}'.format(self.bucket_name, blob_name)
+    def get_blob_name(self, blob_uri): return blob_uri.replace('gs://{}/'.format(self.bucket_name), '')
+
+    def upload(self, filepath, blob_name):
+        if blob_name not in self.manifest:
+            blob = self.bucket.blob(blob_name)
+            if not blob.exists():
+                blob.upload_from_filename(str(filepath))
+
+            self.manifest.add(blob_name)
+
+        return self.get_blob_uri(blob_name)
+
+    def get_access_link(self, blob_uri):
+        blob_name = self.get_blob_name(blob_uri)
+        with self._signed_urls_lock:
+            signed_url = self._signed_urls.get(blob_name)
+
+        if signed_url is None:
+            signed_url = self.bucket.blob(blob_name).generate_signed_url(timedelta(seconds=self.url_expiration))
+            with self._signed_urls_lock:
+                self._signed_urls[blob_name] = signed_url
+
+        return signed_url
+
+class LocalStorageBackend(StorageBackend):
+    '''
+    Stores blobs as files in a local directory. The files are served by the storage routes of
+    the app, which support HTTP range requests so that the audio can be streamed and seeked.
+
+    '''
+
+    _URI_PREFIX = 'local://'
+
+    def __init__(self, directory):
+        self.directory = Path(directory).absolute()
+
+    def get_blob_uri(self, blob_name): return self._URI_PREFIX + blob_name
+    def get_blob_name(self, blob_uri): return blob_uri.replace(self._URI_PREFIX, '', 1)
+
+    def get_filepath(self, blob_name):
+        '''
+        Gets the path to the file of a blob.
+
+        :returns:
+            The path to the file, or None if the name of the blob points outside the storage directory.
+
+        '''
+
+        filepath = (self.directory / blob_name).resolve()
+        if self.directory.resolve() not in filepath.parents: return None
+
+        return filepath
+
+    def upload(self, filepath, blob_name):
+        destination = self.get_filepath(blob_name)
+        if destination is None:
+            raise ValueError('Invalid blob name \'{}\'.'.format(blob_name))
+
+        if not destination.exists():
+            destination.parent.mkdir(parents=True, exist_ok=True)
+
+            # The file is copied under a temporary name first, so that it never appears partially written.
+            tmp_destination = destination.with_name('{}.{}.tmp'.format(destination.name, os.getpid()))
+            shutil.copyfile(str(filepath), str(tmp_destination))
+            os.replace(str(tmp_destination), str(destination))
+
+        return self.get_blob_uri(blob_name)
+
+    def get_access_link(self, blob_uri):
+        return url_for('storage.get_blob', blob_name=self.get_blob_name(blob_uri), _external=True)
+
+def create_backend(config, instance_path):
+    '''
+    Creates the storage backend specified by an app configuration.
+
+    :param config:
+        The app configuration. 'STORAGE_BACKEND' is either 'google' or 'local'.
+    :param instance_path:
+        The path to the instance folder, which relative paths are resolved against.
+
+    '''
+
+    backend_name = config['STORAGE_BACKEND']
+    if backend_name == 'google':
+        auth_filepath = Path(instance_path) / Path(config['GOOGLE_CLOUD_AUTH_FILENAME'])
+        manifest = BlobManifest(Path(instance_path) / config['STORAGE_MANIFEST_FILENAME'])
+        return GoogleCloudStorageBackend(auth_filepath, config['GOOGLE_CLOUD_STORAGE_BUCKET_NAME'], manifest,
+            url_expiration=config['SIGNED_URL_EXPIRATION'], url_expiration_margin=config['SIGNED_URL_EXPIRATION_MARGIN'])
+    elif backend_name == 'local':
+        return LocalStorageBackend(Path(instance_path) / config['LOCAL_STORAGE_DIRECTORY'])
+    else:
+        raise ValueError('Unknown storage backend \'{}\'.'.format(backend_name))
@@ -0,0 +1,71 @@
+'''
+A local record of the blobs that are known to exist in storage.
+
+'''
+
+import os
+import threading
+from pathlib import Path
+
+class BlobManifest:
+    '''
+    The set of the names of the blobs that are known to exist, so that their existence does
+    not have to be checked over the network. The names are appended, one per line, to a file
+    that is shared by every app process. Since blobs are named after the checksum of their
+    contents, a blob that exists never has to be uploaded again.
+
+    '''
+
+    def __init__(self, filepath=None):
+        '''
+        :param filepath:
+            The path to the manifest file (default=None, in which case the manifest is only kept in memory).
+
+        '''
+
+        self.filepath = Path(filepath) if filepath is not None else None
+        self._blob_names = set()
+        self._file_size = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, blob_name):
+        with self._lock:
+            if blob_name in self._blob_names: return True
+
+            # The blob may have been added by another process since the manifest was last read.
+            self._read_new_lines()
+            return blob_name in self._blob_names
+
+    def get_blob_names(self):
+        '''
+        Gets the sorted list of the names of all the blobs that are known to exist.
+
+        '''
+
+        with self._lock:
+            self._read_new_lines()
+            return sorted(self._blob_names)
+
+    def add(self, blob_name):
+        with self._lock:
+            if blob_name in self._blob_names: return
+            self._blob_names.add(blob_name)
+
+            if self.filepath is not None:
+                self.filepath.parent.mkdir(parents=True, exist_ok=True)
+                # A single short write in append mode is not interleaved with the writes of other processes.
+                with open(self.filepath, 'a') as file:
+                    file.write(blob_name + '\n')
+
+    def _read_new_lines(self):
+        if self.filepath is None or not self.filepath.exists(): return
+        if os.path.getsize(self.filepath) == self._file_size: return
+
+        with open(self.filepath, 'rb') as file:
+            file.seek(self._file_size)
+            data = file.read()
+
+        # A partially written last line is read again the next time.
+        complete_length = data.rfind(b'\n') + 1
+        self._blob_names.update(line for line in data[:complete_length].decode('utf-8').split('\n') if line)
+        self._file_size += complete_length
@@ -0,0 +1,6 @@
+from api.transcription.transcript import Transcript, TranscriptSegment, Word
+from api.transcription.compact import CompactTranscript
+from api.transcription.backends import TranscriptionBackend, GoogleSpeechBackend, ReplayBackend, \
+    RecordingBackend, create_backend
+from api.transcription.chunking import AudioChunk, split_audio_file, shift_transcript, \
+    stitch_transcripts, transcribe_chunks
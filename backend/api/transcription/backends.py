@@ -0,0 +1,137 @@
+'''
+Speech recognition backends. Every backend produces a Transcript.
+
+'''
+
+import re
+import json
+from pathlib import Path
+
+from api.http_errors import TranscriptionError
+from api.transcription.transcript import Transcript
+
+class TranscriptionBackend:
+    '''
+    The interface of a speech recognition backend.
+
+    '''
+
+    def transcribe(self, blob_uri, sample_rate, audio_filepath=None):
+        '''
+        Transcribes a recording.
+
+        :param blob_uri:
+            The uri of the uploaded recording (a mono, 16-bit PCM WAVE file).
+        :param sample_rate:
+            The sample rate of the recording.
+        :param audio_filepath:
+            The path to a local copy of the recording, if there is one (default=None, optional).
+
+        :returns:
+            A Transcript object.
+
+        '''
+
+        raise NotImplementedError()
+
+class GoogleSpeechBackend(TranscriptionBackend):
+    '''
+    Transcribes recordings with the (long running) Google Cloud Speech-to-Text API.
+
+    '''
+
+    def __init__(self, auth_filepath, language_code='en-US'):
+        self.auth_filepath = auth_filepath
+        self.language_code = language_code
+        self._speech_client = None
+
+    @property
+    def speech_client(self):
+        # The client is created lazily, and then reused by every transcription.
+        if self._speech_client is None:
+            from google.cloud import speech_v1p1beta1 as speech
+            self._speech_client = speech.SpeechClient.from_service_account_json(self.auth_filepath)
+
+        return self._speech_client
+
+    def transcribe(self, blob_uri, sample_rate, audio_filepath=None):
+        from google.cloud.speech_v1p1beta1 import enums, types
+
+        # This configuration is predetermined...All audio files are converted to a WAVE format
+        # with 16-bit PCM encoding at their native sample rate, clamped to the range supported for
+        # LINEAR16 (see api.audio_preprocessing.MIN_SAMPLE_RATE).
+        config = types.RecognitionConfig(
+            encoding=enums.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            enable_speaker_diarization=True,
+            enable_automatic_punctuation=True,
+            language_code=self.language_code)
+
+        operation = self.speech_client.long_running_recognize(config, types.RecognitionAudio(uri=blob_uri))
+        return Transcript.from_speech_response(operation.result())
+
+def get_transcript_filepath(directory, blob_uri):
+    return Path(directory) / '{}.json'.format(re.sub(r'[^A-Za-z0-9._-]', '_', blob_uri))
+
+class ReplayBackend(TranscriptionBackend):
+    '''
+    Serves previously recorded transcripts from a directory (see RecordingBackend), without
+    any network access. This is useful for offline development, testing and benchmarking.
+
+    '''
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def transcribe(self, blob_uri, sample_rate, audio_filepath=None):
+        filepath = get_transcript_filepath(self.directory, blob_uri)
+        if not filepath.exists():
+            raise TranscriptionError('No recorded transcript for \'{}\'.'.format(blob_uri))
+
+        with open(filepath, 'r') as file:
+            return Transcript.from_dict(json.load(file))
+
+class RecordingBackend(TranscriptionBackend):
+    '''
+    Records the transcripts produced by another backend to a directory, so that they can be replayed.
+
+    '''
+
+    def __init__(self, backend, directory):
+        self.backend = backend
+        self.directory = Path(directory)
+
+    def transcribe(self, blob_uri, sample_rate, audio_filepath=None):
+        transcript = self.backend.transcribe(blob_uri, sample_rate, audio_filepath)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(get_transcript_filepath(self.directory, blob_uri), 'w') as file:
+            json.dump(transcript.to_dict(), file)
+
+        return transcript
+
+def create_backend(config, instance_path):
+    '''
+    Creates the transcription backend specified by an app configuration.
+
+    :param config:
+        The app configuration. 'TRANSCRIPTION_BACKEND' is either 'google' or 'replay'. If
+        'TRANSCRIPTION_RECORD_DIRECTORY' is set, every transcript is also recorded there.
+    :param instance_path:
+        The path to the instance folder, which relative directories are resolved against.
+
+    '''
+
+    backend_name = config['TRANSCRIPTION_BACKEND']
+    if backend_name == 'google':
+        auth_filepath = Path(instance_path) / Path(config['GOOGLE_CLOUD_AUTH_FILENAME'])
+        backend = GoogleSpeechBackend(auth_filepath, config['TRANSCRIPTION_LANGUAGE_CODE'])
+    elif backend_name == 'replay':
+        backend = ReplayBackend(Path(instance_path) / config['TRANSCRIPTION_REPLAY_DIRECTORY'])
+    else:
+        raise ValueError('Unknown transcription backend \'{}\'.'.format(backend_name))
+
+    if config.get('TRANSCRIPTION_RECORD_DIRECTORY'):
+        backend = RecordingBackend(backend, Path(instance_path) / config['TRANSCRIPTION_RECORD_DIRECTORY'])
+
+    return backend
@@ -0,0 +1,163 @@
+'''
+Transcription of a long recording in chunks, which are transcribed concurrently and then
+stitched back together into a single transcript.
+
+'''
+
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import soundfile
+
+from api.transcription.transcript import Transcript, TranscriptSegment, Word
+
+_executor = None
+_executor_max_workers = None
+_executor_lock = threading.Lock()
+
+def get_executor(max_workers):
+    '''
+    Gets the thread pool that transcribes chunks, creating it if it does not exist yet. The pool is
+    shared by every recording, so the number of concurrent transcriptions is bounded overall.
+
+    '''
+
+    global _executor, _executor_max_workers
+    with _executor_lock:
+        if _executor is None or _executor_max_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+
+            _executor = ThreadPoolExecutor(max_workers=max_workers)
+            _executor_max_workers = max_workers
+
+        return _executor
+
+class AudioChunk:
+    '''
+    A chunk of a recording, stored in its own file.
+
+    '''
+
+    def __init__(self, filepath, start_sample, end_sample, sample_rate):
+        self.filepath = filepath
+        self.start_sample = start_sample
+        self.end_sample = end_sample
+        self.sample_rate = sample_rate
+
+    @property
+    def start_time(self):
+        return self.start_sample / self.sample_rate
+
+def split_audio_file(filepath, split_points, output_directory, block_size=65536):
+    '''
+    Splits a mono, 16-bit PCM WAVE file into one file per chunk, block by block.
+
+    :param filepath:
+        The path to the WAVE file.
+    :param split_points:
+        A sorted list of the sample indices at which to split the file.
+    :param output_directory:
+        The directory that the chunk files are written to.
+    :param block_size:
+        The number of frames copied at a time (default=65536, optional).
+
+    :returns:
+        A list of AudioChunk objects, in order.
+
+    '''
+
+    chunks = []
+    with soundfile.SoundFile(str(filepath)) as input_file:
+        boundaries = [0] + list(split_points) + [input_file.frames]
+        for index, (start, end) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+            chunk_filepath = Path(output_directory) / '{}.{}.wav'.format(Path(filepath).name, index)
+            with soundfile.SoundFile(str(chunk_filepath), 'w', samplerate=input_file.samplerate, channels=1,
+                subtype='PCM_16', format='WAV') as chunk_file:
+
+                input_file.seek(start)
+                for block in input_file.blocks(blocksize=block_size, frames=end - start, dtype='int16'):
+                    chunk_file.write(block)
+
+            chunks.append(AudioChunk(chunk_filepath, start, end, input_file.samplerate))
+
+    return chunks
+
+def shift_transcript(transcript, offset):
+    '''
+    Shifts the timestamps of the words of a transcript by an offset, in seconds.
+
+    '''
+
+    return Transcript([TranscriptSegment(segment.transcript, segment.confidence, [Word(word.word,
+        word.start_time + offset, word.end_time + offset, word.confidence, word.speaker_tag) for word in segment.words])
+        for segment in transcript.segments])
+
+def stitch_transcripts(transcripts, start_times):
+    '''
+    Stitches the transcripts of consecutive chunks into a single transcript, shifting the
+    timestamps of the words of each chunk by the time at which the chunk starts.
+
+    '''
+
+    segments = []
+    for transcript, start_time in zip(transcripts, start_times):
+        segments.extend(shift_transcript(transcript, start_time).segments)
+
+    return Transcript(segments)
+
+def transcribe_chunks(transcription_backend, storage_backend, chunks, blob_names, max_workers,
+    on_chunk_transcribed=None):
+    '''
+    Uploads and transcribes chunks concurrently, and stitches their transcripts together. The
+    chunk files are deleted once they have been uploaded.
+
+    Speaker tags are assigned independently for every chunk, so they are only consistent within a chunk.
+
+    :param transcription_backend:
+        The transcription backend.
+    :param storage_backend:
+        The storage backend that the chunks are uploaded to.
+    :param chunks:
+        The AudioChunk objects of the recording, in order.
+    :param blob_names:
+        The blob name of each chunk.
+    :param max_workers:
+        The maximum number of chunks that are transcribed at once, across all recordings.
+    :param on_chunk_transcribed:
+        A function that is called, in the calling thread, with the transcript of each chunk (with
+        its timestamps relative to the whole recording) as soon as it is transcribed, in the order
+        that the chunks finish (default=None, optional).
+
+    :returns:
+        The Transcript of the whole recording.
+
+    '''
+
+    def transcribe_chunk(chunk, blob_name):
+        try:
+            blob_uri = storage_backend.upload(chunk.filepath, blob_name)
+        finally:
+            chunk.filepath.unlink()
+
+        return transcription_backend.transcribe(blob_uri, chunk.sample_rate)
+
+    executor = get_executor(max_workers)
+    futures = {executor.submit(transcribe_chunk, chunk, blob_name): index
+        for index, (chunk, blob_name) in enumerate(zip(chunks, blob_names))}
+
+    transcripts = [None] * len(chunks)
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            transcripts[index] = future.result()
+            if on_chunk_transcribed is not None:
+                on_chunk_transcribed(shift_transcript(transcripts[index], chunks[index].start_time))
+    finally:
+        # If a chunk failed, the files of the chunks that did not get to run are cleaned up.
+        for future, chunk in zip(futures, chunks):
+            if future.cancel() and chunk.filepath.exists():
+                chunk.filepath.unlink()
+
+    return stitch_transcripts(transcripts, [chunk.start_time for chunk in chunks])
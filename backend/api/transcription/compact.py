@@ -0,0 +1,220 @@
+'''
+A compact, columnar representation of a transcription.
+
+Instead of one object per word, every attribute of the words is stored in its own NumPy
+array, indexed by the global position of the word. The tokens are interned in a sorted
+vocabulary and referenced by id. Segments and sentences are stored as arrays of offsets
+into the word positions. This makes a transcription cheap to pickle, allows timestamps
+to be looked up for many words at once, and allows the arrays to be memory-mapped from disk.
+
+'''
+
+import json
+from pathlib import Path
+from bisect import bisect_right
+
+import numpy as np
+
+_SENTENCE_TOKENIZER_RESOURCE = 'tokenizers/punkt/english.pickle'
+_sentence_tokenizer = None
+
+'''
+The names of the numeric arrays of a compact transcript, which are each saved to their own .npy file.
+'''
+ARRAY_NAMES = ('token_ids', 'token_char_offsets', 'start_times', 'end_times', 'word_confidences',
+    'speaker_tags', 'segment_offsets', 'segment_confidences', 'sentence_offsets')
+
+# The vocabulary is an object array, which cannot be memory-mapped, so it is saved as JSON
+# along with the segment transcripts.
+_STRINGS_FILENAME = 'strings.json'
+
+def get_token_spans(text):
+    '''
+    Gets the character spans of the space-separated tokens in a string.
+
+    :returns:
+        A list of tuples containing the start (inclusive) and end (exclusive) character offsets of each token.
+
+    '''
+
+    spans = []
+    offset = 0
+    for token in text.split(' '):
+        if token != '':
+            spans.append((offset, offset + len(token)))
+
+        offset += len(token) + 1
+
+    return spans
+
+def get_sentence_tokenizer():
+    '''
+    Gets the NLTK sentence tokenizer, which is loaded (along with NLTK) the first time it is needed.
+
+    '''
+
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        import nltk.data
+        _sentence_tokenizer = nltk.data.load(_SENTENCE_TOKENIZER_RESOURCE)
+
+    return _sentence_tokenizer
+
+def set_sentence_tokenizer(sentence_tokenizer):
+    '''
+    Replaces the NLTK sentence tokenizer (e.g. with an untrained PunktSentenceTokenizer, which
+    needs no data, to run offline).
+
+    '''
+
+    global _sentence_tokenizer
+    _sentence_tokenizer = sentence_tokenizer
+
+class CompactTranscript:
+    '''
+    A transcription stored as NumPy arrays.
+
+    The word at position i has the token vocabulary[token_ids[i]], which starts at character
+    token_char_offsets[i] of the transcript of its segment. The vocabulary is an object array,
+    so that a long token does not widen every entry. Segment j spans the positions
+    [segment_offsets[j], segment_offsets[j + 1]), and likewise for the sentences.
+
+    '''
+
+    def __init__(self, vocabulary, token_ids, token_char_offsets, start_times, end_times,
+        word_confidences, speaker_tags, segment_offsets, segment_confidences, sentence_offsets, transcripts):
+
+        self.vocabulary = vocabulary
+        self.token_ids = token_ids
+        self.token_char_offsets = token_char_offsets
+        self.start_times = start_times
+        self.end_times = end_times
+        self.word_confidences = word_confidences
+        self.speaker_tags = speaker_tags
+        self.segment_offsets = segment_offsets
+        self.segment_confidences = segment_confidences
+        self.sentence_offsets = sentence_offsets
+        self.transcripts = transcripts
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    @property
+    def segment_count(self):
+        return len(self.transcripts)
+
+    def get_time_ranges(self, start_positions, end_positions):
+        '''
+        Gets the time ranges spanned by many inclusive word ranges at once.
+
+        :param start_positions:
+            An array of start word positions.
+        :param end_positions:
+            An array of end word positions.
+
+        :returns:
+            A tuple containing an array of start times and an array of end times, in seconds.
+
+        '''
+
+        return self.start_times[start_positions], self.end_times[end_positions]
+
+    @staticmethod
+    def from_transcript(transcript):
+        '''
+        Converts a Transcript. The words of a segment are matched with the space-separated tokens
+        of its transcript, which are lowercased; segments without any words are dropped.
+
+        '''
+
+        tokens = []
+        token_char_offsets = []
+        start_times = []
+        end_times = []
+        word_confidences = []
+        speaker_tags = []
+        segment_offsets = [0]
+        segment_confidences = []
+        sentence_offsets = [0]
+        transcripts = []
+
+        sentence_tokenizer = get_sentence_tokenizer()
+        for segment in transcript.segments:
+            token_spans = get_token_spans(segment.transcript)[:len(segment.words)]
+            if len(token_spans) == 0: continue
+
+            segment_offset = len(tokens)
+            segment_char_offsets = [start for start, _ in token_spans]
+            for (start, end), word in zip(token_spans, segment.words):
+                tokens.append(segment.transcript[start:end].lower())
+                start_times.append(word.start_time)
+                end_times.append(word.end_time)
+                word_confidences.append(word.confidence)
+                speaker_tags.append(word.speaker_tag)
+
+            token_char_offsets.extend(segment_char_offsets)
+            segment_offsets.append(len(tokens))
+            segment_confidences.append(segment.confidence)
+            transcripts.append(segment.transcript)
+
+            # Map the character span of each sentence to the words it covers. Any trailing words
+            # that are not covered by the tokenizer form their own sentence.
+            sentence_start = 0
+            for _, sentence_end_char in sentence_tokenizer.span_tokenize(segment.transcript):
+                sentence_end = bisect_right(segment_char_offsets, sentence_end_char - 1) - 1
+                if sentence_end < sentence_start: continue
+
+                sentence_offsets.append(segment_offset + sentence_end + 1)
+                sentence_start = sentence_end + 1
+
+            if sentence_start < len(segment_char_offsets):
+                sentence_offsets.append(len(tokens))
+
+        vocabulary = sorted(set(tokens))
+        vocabulary_ids = {token: token_id for token_id, token in enumerate(vocabulary)}
+        return CompactTranscript(np.array(vocabulary, dtype=object),
+            np.array([vocabulary_ids[token] for token in tokens], dtype=np.int32),
+            np.array(token_char_offsets, dtype=np.int32),
+            np.array(start_times, dtype=np.float64),
+            np.array(end_times, dtype=np.float64),
+            np.array(word_confidences, dtype=np.float32),
+            np.array(speaker_tags, dtype=np.int16),
+            np.array(segment_offsets, dtype=np.int32),
+            np.array(segment_confidences, dtype=np.float32),
+            np.array(sentence_offsets, dtype=np.int32),
+            transcripts)
+
+    def save(self, directory):
+        '''
+        Saves the transcript to a directory: one .npy file per numeric array, and the vocabulary
+        and the segment transcripts as JSON.
+
+        '''
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(directory / '{}.npy'.format(name), getattr(self, name))
+
+        with open(directory / _STRINGS_FILENAME, 'w') as file:
+            json.dump({'vocabulary': self.vocabulary.tolist(), 'transcripts': self.transcripts}, file)
+
+    @staticmethod
+    def load(directory, mmap_mode='r'):
+        '''
+        Loads a transcript saved with CompactTranscript.save.
+
+        :param directory:
+            The directory that the transcript was saved to.
+        :param mmap_mode:
+            The mode in which the numeric arrays are memory-mapped (see numpy.load), or None to
+            read them into memory (default='r', optional).
+
+        '''
+
+        directory = Path(directory)
+        arrays = [np.load(directory / '{}.npy'.format(name), mmap_mode=mmap_mode) for name in ARRAY_NAMES]
+        with open(directory / _STRINGS_FILENAME, 'r') as file:
+            strings = json.load(file)
+
+        return CompactTranscript(np.array(strings['vocabulary'], dtype=object), *arrays, strings['transcripts'])
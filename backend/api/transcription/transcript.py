@@ -0,0 +1,137 @@
+'''
+The uniform structure of a transcription, independent of the backend that produced it.
+
+'''
+
+def get_time_seconds(time): return time.seconds + time.nanos / 1e9
+
+class Word:
+    '''
+    A recognized word.
+
+    '''
+
+    def __init__(self, word, start_time, end_time, confidence=0, speaker_tag=0):
+        '''
+        :param word:
+            The text of the word.
+        :param start_time:
+            The time at which the word starts, in seconds.
+        :param end_time:
+            The time at which the word ends, in seconds.
+        :param confidence:
+            The confidence of the word, between 0 and 1 (default=0, in which case it is unknown).
+        :param speaker_tag:
+            The speaker of the word (default=0, in which case it is unknown).
+
+        '''
+
+        self.word = word
+        self.start_time = start_time
+        self.end_time = end_time
+        self.confidence = confidence
+        self.speaker_tag = speaker_tag
+
+    def to_dict(self):
+        return {
+            'word': self.word,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'confidence': self.confidence,
+            'speaker_tag': self.speaker_tag
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return Word(data['word'], data['start_time'], data['end_time'],
+            data.get('confidence', 0), data.get('speaker_tag', 0))
+
+class TranscriptSegment:
+    '''
+    A contiguous segment of a transcription (e.g. a single result of the Google Speech API).
+
+    '''
+
+    def __init__(self, transcript, confidence, words):
+        '''
+        :param transcript:
+            The text of the segment. Its space-separated tokens correspond to the words.
+        :param confidence:
+            The confidence of the segment, between 0 and 1.
+        :param words:
+            A list of Word objects.
+
+        '''
+
+        self.transcript = transcript
+        self.confidence = confidence
+        self.words = words
+
+    def to_dict(self):
+        return {
+            'transcript': self.transcript,
+            'confidence': self.confidence,
+            'words': [word.to_dict() for word in self.words]
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return TranscriptSegment(data['transcript'], data['confidence'],
+            [Word.from_dict(word) for word in data['words']])
+
+class Transcript:
+    '''
+    A transcription of a recording: a list of segments, ordered by time.
+
+    '''
+
+    def __init__(self, segments):
+        self.segments = segments
+
+    def to_dict(self):
+        return {
+            'segments': [segment.to_dict() for segment in self.segments]
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return Transcript([TranscriptSegment.from_dict(segment) for segment in data['segments']])
+
+    @staticmethod
+    def from_speech_response(op_result):
+        '''
+        Converts the result of a Google Speech API recognition operation.
+
+        With speaker diarization enabled, the API only tags the words of its final result,
+        which repeats every word of the recording; these tags are copied onto the words of
+        the other segments.
+
+        '''
+
+        results = [result for result in op_result.results
+            if len(result.alternatives) > 0 and len(result.alternatives[0].words) > 0]
+
+        tagged_words = None
+        if len(results) > 1:
+            preceding_words = [word_info.word for result in results[:-1] for word_info in result.alternatives[0].words]
+            last_words = results[-1].alternatives[0].words
+            if [word_info.word for word_info in last_words] == preceding_words and any(word_info.speaker_tag for word_info in last_words):
+                tagged_words = last_words
+                results = results[:-1]
+
+        segments = []
+        for result in results:
+            # Check if the response is valid, which happens if and only if the transcript is non-empty.
+            alternative = result.alternatives[0]
+            if not alternative.transcript: continue
+
+            words = [Word(word_info.word, get_time_seconds(word_info.start_time), get_time_seconds(word_info.end_time),
+                word_info.confidence, word_info.speaker_tag) for word_info in alternative.words]
+            segments.append(TranscriptSegment(alternative.transcript, alternative.confidence, words))
+
+        if tagged_words is not None:
+            words = [word for segment in segments for word in segment.words]
+            for word, word_info in zip(words, tagged_words):
+                word.speaker_tag = word_info.speaker_tag
+
+        return Transcript(segments)
@@ -0,0 +1,80 @@
+'''
+Streaming of the files of multipart form uploads straight to disk.
+
+By default, Werkzeug spools every uploaded file of a multipart form to a temporary file (or
+to memory), which would then have to be copied to its own file and hashed. Instead, the
+request class of the app has the multipart parser write every uploaded file into its own
+named temporary file, hashing it as it is written, so that the file can be used as is.
+
+'''
+
+import uuid
+import hashlib
+import tempfile
+from pathlib import Path
+
+from flask import Request
+
+class HashingTemporaryFile:
+    '''
+    A named temporary file that computes the MD5 hash of the bytes written to it. The file is
+    removed when it is closed (at the end of the request), unless it has been kept.
+
+    '''
+
+    def __init__(self, filepath=None):
+        '''
+        :param filepath:
+            The path to the file (default=None, in which case a new file is created in the
+            temporary directory).
+
+        '''
+
+        self.filepath = Path(filepath) if filepath is not None else Path(tempfile.gettempdir()) / str(uuid.uuid4())
+        self._file = open(self.filepath, 'w+b')
+        self._hash = hashlib.md5()
+        self._is_kept = False
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def read(self, *args): return self._file.read(*args)
+    def readline(self, *args): return self._file.readline(*args)
+    def seek(self, *args): return self._file.seek(*args)
+    def tell(self): return self._file.tell()
+    def flush(self): return self._file.flush()
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def keep(self):
+        '''
+        Closes the file without removing it, so that it outlives the request.
+
+        :returns:
+            A tuple containing the path to the file and the hex digest of the MD5 hash of its contents.
+
+        '''
+
+        self._is_kept = True
+        self._file.close()
+        return self.filepath, self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+        if self._is_kept: return
+
+        try:
+            self.filepath.unlink()
+        except FileNotFoundError:
+            pass
+
+class UploadRequest(Request):
+    '''
+    The request class of the app, whose uploaded files are HashingTemporaryFile objects.
+
+    '''
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingTemporaryFile()
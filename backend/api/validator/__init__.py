@@ -13,12 +13,38 @@ def require_json_content_type(func):
         return func(*args, **kwargs)
     return wrapper
 
-def validate_route(schema_type):
+def is_content_type_allowed(content_types):
+    for content_type in content_types:
+        if content_type.endswith('/*') and request.mimetype.startswith(content_type[:-1]): return True
+        if request.mimetype == content_type: return True
+
+    return False
+
+def validate_route(schema_type, content_types=None):
+    '''
+    Validates the data of a request against a schema.
+
+    :param schema_type:
+        The type of the schema to validate against.
+    :param content_types:
+        A list of the (non-JSON) content types that are also accepted, in addition to 'application/json'.
+        Wildcards such as 'audio/*' are supported. For these requests, the data consists of the query
+        string arguments and form fields, and the body is left untouched unless it is form data.
+
+    '''
+
     def decorator(func):
-        @require_json_content_type
         @wraps(func)
         def wrapper(*args, **kwargs):
-            validator_schema = schema_type(request.get_json())
+            if request.is_json:
+                validator_schema = schema_type(request.get_json())
+            elif content_types and is_content_type_allowed(content_types):
+                data = request.args.to_dict()
+                data.update(request.form.to_dict())
+                validator_schema = schema_type(data, from_strings=True)
+            else:
+                raise BadContentTypeError(' or '.join(['application/json'] + (content_types or [])))
+
             valid, errors = validator_schema.validate()
             if not valid:
                 raise InvalidDataError(**errors)
@@ -32,35 +58,61 @@ def get_validator_data():
     return getattr(g, 'validator_data', None)
 
 class Schema(object):
-    def __init__(self, data):
+    '''
+    A schema of request data, declared with fields as class attributes. The fields of a schema
+    class are collected once, when the class is created, into a field plan: a tuple of the name
+    of each field in the data and the field itself. The data is then validated and its values
+    resolved in a single pass over the plan, whose result is shared by validate and get_values.
+
+    '''
+
+    _field_plan = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_plan = tuple(cls._get_fields().items())
+
+    def __init__(self, data, from_strings=False):
         self.data = data
+        self.from_strings = from_strings
 
-    def _resolve_field_value(self, field, field_name):
-        exists = field_name in self.data
-        return field.resolve_value(None if not exists else self.data[field_name], exists)
+        self._values = None
+        self._errors = None
 
-    def validate(self):
-        fields = self._get_fields()
+    def _resolve(self):
+        if self._values is not None: return
+
+        values = {}
         errors = {}
-        for field_name, field in fields.items():
-            value = self._resolve_field_value(field, field_name)
+        for field_name, field in self._field_plan:
             exists = field_name in self.data
+            value = self.data[field_name] if exists else None
+            if self.from_strings and isinstance(value, str):
+                value = field.parse_string(value)
+
+            value = field.resolve_value(value, exists)
+            values[field_name] = value
+
             valid, error = field.validate(value, exists)
-            
             if valid: continue
             errors[field_name] = error
 
-        return len(errors) == 0, errors
+        self._values = values
+        self._errors = errors
+
+    def validate(self):
+        self._resolve()
+        return len(self._errors) == 0, self._errors
 
     def get_values(self):
-        fields = self._get_fields()
-        return {field_name:self._resolve_field_value(field, field_name) for field_name,field in fields.items()}
+        self._resolve()
+        return self._values
 
-    def _get_fields(self):
-        v = dir(self.__class__)
+    @classmethod
+    def _get_fields(cls):
         fields = {}
-        for field_name in v:
-            instance = getattr(self, field_name)
+        for field_name in dir(cls):
+            instance = getattr(cls, field_name)
             if not isinstance(instance, Field): continue
 
             if instance.name == None:
@@ -68,4 +120,4 @@ class Schema(object):
             else:
                 fields[instance.name] = instance
 
-        return fields
\ No newline at end of file
+        return fields
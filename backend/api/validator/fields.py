@@ -1,7 +1,8 @@
+import json
 from numbers import Number
 from enum import Enum
 
-from api.validator.validators import RequiredType, EnumValidator
+from api.validator.validators import RequiredType, ItemType, EnumValidator
 
 class DefaultValueHandling(Enum):
     POPULATE_IF_EMPTY = 0
@@ -20,6 +21,14 @@ class Field(object):
     def convert_value(self, value):
         return value
 
+    def parse_string(self, value):
+        '''
+        Parses a value received as a string (e.g. a form field or query string argument).
+        If the string is not a valid representation, it is returned as is so that validation fails.
+        '''
+
+        return value
+
     def resolve_value(self, value, exists):
         if self.default_value_handling == DefaultValueHandling.POPULATE_ALWAYS:
             return self.default_value
@@ -64,17 +73,58 @@ class StringField(TypeField):
         super().__init__(str, **kwargs)
 
 class BooleanField(TypeField):
+    _TRUE_STRINGS = {'true', '1', 'yes', 'on'}
+    _FALSE_STRINGS = {'false', '0', 'no', 'off'}
+
     def __init__(self, **kwargs):
         super().__init__(bool, **kwargs)
 
+    def parse_string(self, value):
+        if value.lower() in self._TRUE_STRINGS: return True
+        if value.lower() in self._FALSE_STRINGS: return False
+        return value
+
 class NumberField(TypeField):
     def __init__(self, **kwargs):
         super().__init__(Number, **kwargs)
 
+    def parse_string(self, value):
+        try:
+            return float(value) if any(c in value for c in '.eE') else int(value)
+        except ValueError:
+            return value
+
 class IntegerField(TypeField):
     def __init__(self, **kwargs):
         super().__init__(int, **kwargs)
 
+    def parse_string(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+
 class FloatField(TypeField):
     def __init__(self, **kwargs):
-        super().__init__(float, **kwargs)
\ No newline at end of file
+        super().__init__(float, **kwargs)
+
+    def parse_string(self, value):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+class ListField(TypeField):
+    def __init__(self, item_type_class=None, **kwargs):
+        super().__init__(list, **kwargs)
+        if item_type_class is not None:
+            self.validators.append(ItemType(item_type_class))
+
+    def parse_string(self, value):
+        # Lists are sent as JSON arrays in form fields and query string arguments.
+        try:
+            parsed_value = json.loads(value)
+        except ValueError:
+            return value
+
+        return parsed_value if isinstance(parsed_value, list) else value
@@ -16,16 +16,42 @@ class RequiredType(object):
 
         return False, self.error_message
 
+class ItemType(object):
+    def __init__(self, type_class, error_message=None):
+        self.type_class = type_class
+        self.error_message = error_message
+
+    def validate(self, value, exists):
+        if not exists or not isinstance(value, list): return True, ''
+        if all(isinstance(item, self.type_class) for item in value): return True, ''
+        if self.error_message is None:
+            self.error_message = 'Expected every element to be of \'{0}\' type.'.format(self.type_class.__name__)
+
+        return False, self.error_message
+
 class EnumValidator(object):
     def __init__(self, enum_type_class, error_message=None):
         self.enum_type_class = enum_type_class
         self.error_message = error_message
-    
+
+        # The members and their values are looked up in sets, rather than by scanning the enum class.
+        self._members = frozenset(enum_type_class)
+        try:
+            self._member_values = frozenset(item.value for item in enum_type_class)
+        except TypeError:
+            # Some of the values are not hashable.
+            self._member_values = tuple(item.value for item in enum_type_class)
+
     def validate(self, value, exists):
         # The value can either be the direct enum class or the value of one
         # of the members in the enum class.
-        if value in self.enum_type_class or any(value == item.value for item in self.enum_type_class):
-            return True, ''
+        try:
+            valid = value in self._members or value in self._member_values
+        except TypeError:
+            # The value is not hashable, so it is neither a member nor the value of one.
+            valid = False
+
+        if valid: return True, ''
         
         if self.error_message is None:
             self.error_message = 'Expected Enum value of type \'{0}\', got invalid value.'.format(self.enum_type_class.__name__)
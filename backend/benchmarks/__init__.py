@@ -0,0 +1,4 @@
+'''
+Offline micro-benchmarks of the search and preprocessing hot paths (see __main__.py).
+
+'''
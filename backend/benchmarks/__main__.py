@@ -0,0 +1,230 @@
+'''
+Runs the offline micro-benchmarks of the search and preprocessing hot paths, and saves their
+results as JSON so that they can be compared across commits:
+
+    python -m benchmarks --output results.json --compare baseline.json
+
+Everything runs in process with synthetic inputs and no network: the transcripts are generated,
+the context search model is a stub, the app cache is disabled, and sentences are split with an
+untrained Punkt tokenizer (so no NLTK data is needed).
+
+'''
+
+import json
+import time
+import uuid
+import base64
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import numpy as np
+from flask import Flask
+from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+import api.extensions as extensions
+from api.extensions import cache, get_result_caches
+from api.ml import InferenceScheduler
+from api.transcription import Transcript, CompactTranscript
+from api.transcription.compact import set_sentence_tokenizer
+from api.audio_preprocessing import preprocess_audio
+from api.routes.search import string_query, context_query, find_sub_list, normalize_text, QuerySchema
+from benchmarks.synthetic import make_op_result, make_wav
+from benchmarks.stubs import StubContextSearchModel
+
+def measure(func, repeat, setup=None):
+    '''
+    Times a function.
+
+    :param func:
+        The function to time.
+    :param repeat:
+        The number of times that the function is called.
+    :param setup:
+        A function whose return value (a tuple) is passed as the arguments of the function on each
+        call, and which is not timed (default=None, optional).
+
+    :returns:
+        A dictionary containing the number of calls and the minimum, median and mean durations, in seconds.
+
+    '''
+
+    durations = []
+    for _ in range(repeat):
+        arguments = setup() if setup is not None else ()
+        start_time = time.perf_counter()
+        func(*arguments)
+        durations.append(time.perf_counter() - start_time)
+
+    return {
+        'repeat': repeat,
+        'min': min(durations),
+        'median': statistics.median(durations),
+        'mean': statistics.mean(durations)
+    }
+
+def create_benchmark_app():
+    '''
+    Creates a minimal app with the result caches (but no shared cache) and a stub context search model.
+
+    '''
+
+    app = Flask('benchmarks')
+    app.config.from_object('api.config')
+    app.config.update(CACHE_TYPE='null', CACHE_NO_NULL_WARNING=True)
+
+    cache.init_app(app)
+    for result_cache in get_result_caches():
+        result_cache.init_app(app)
+
+    # The scheduler is installed directly, so that the real model is never loaded.
+    extensions._context_search_scheduler = InferenceScheduler(StubContextSearchModel(
+        window_size=app.config['CONTEXT_SEARCH_WINDOW_SIZE'], window_stride=app.config['CONTEXT_SEARCH_WINDOW_STRIDE'],
+        max_batch_size=app.config['CONTEXT_SEARCH_MAX_BATCH_SIZE']).predict_answers,
+        max_batch_size=app.config['CONTEXT_SEARCH_MAX_BATCH_SIZE'],
+        max_wait_time=app.config['CONTEXT_SEARCH_MAX_BATCH_WAIT_TIME'])
+
+    return app
+
+def get_unique_blob_uri(): return ('benchmark://{}'.format(uuid.uuid4()),)
+
+def benchmark_transcripts(minutes, repeat):
+    '''
+    Benchmarks the conversion and search of a synthetic transcript of a recording.
+
+    '''
+
+    op_result = make_op_result(minutes * 60)
+    raw_transcript = Transcript.from_speech_response(op_result)
+    transcript = CompactTranscript.from_transcript(raw_transcript)
+
+    words = [normalize_text(word.word) for segment in raw_transcript.segments for word in segment.words]
+    query_text = ' '.join(words[len(words) // 2:len(words) // 2 + 2])
+    parameters = {'minutes': minutes, 'word_count': len(words), 'query': query_text}
+
+    blob_uri = get_unique_blob_uri()[0]
+    string_query(query_text, blob_uri, transcript)
+
+    return [
+        ('transcript_conversion', parameters, measure(lambda: CompactTranscript.from_transcript(
+            Transcript.from_speech_response(op_result)), repeat)),
+        # A cold query also builds the index of the transcript, like the first query of a recording.
+        ('string_query_cold', parameters, measure(lambda uri: string_query(query_text, uri, transcript),
+            repeat, setup=get_unique_blob_uri)),
+        ('string_query_cached', parameters, measure(lambda: string_query(query_text, blob_uri, transcript), repeat)),
+        ('context_query', parameters, measure(lambda uri: context_query(query_text, uri, transcript),
+            repeat, setup=get_unique_blob_uri)),
+        ('find_sub_list', parameters, measure(lambda: find_sub_list(words, query_text.split(' ')), repeat))
+    ]
+
+def benchmark_schema_validation(payload_size, repeat):
+    '''
+    Benchmarks the validation of the JSON body of a search request, as done by the search route.
+
+    '''
+
+    data = {
+        'query': 'budget deadline',
+        'search_output_mode': 'sentence',
+        'is_context_search': False,
+        'file_input': base64.b64encode(bytes(payload_size)).decode('ascii')
+    }
+
+    def validate():
+        schema = QuerySchema(data)
+        schema.validate()
+        schema.get_values()
+
+    return [('schema_validate', {'payload_size': payload_size}, measure(validate, repeat * 100))]
+
+def benchmark_preprocessing(minutes, repeat, directory):
+    '''
+    Benchmarks the preprocessing of a generated WAVE file.
+
+    '''
+
+    input_filepath = Path(directory) / 'input_{}.wav'.format(minutes)
+    output_filepath = Path(directory) / 'output_{}.wav'.format(minutes)
+    make_wav(input_filepath, minutes * 60)
+
+    parameters = {'minutes': minutes, 'input_size': input_filepath.stat().st_size}
+    return [('preprocess_audio', parameters, measure(lambda: preprocess_audio(input_filepath, output_filepath), repeat))]
+
+def get_metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'time': time.time(),
+        'python_version': platform.python_version(),
+        'numpy_version': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor()
+    }
+
+def get_result_key(result): return result['benchmark'], json.dumps(result['parameters'], sort_keys=True)
+
+def print_comparison(results, baseline_results):
+    '''
+    Prints the median duration of every benchmark next to its median duration in a baseline.
+
+    '''
+
+    baseline_medians = {get_result_key(result): result['median'] for result in baseline_results}
+
+    print('{:<24} {:<40} {:>12} {:>12} {:>8}'.format('benchmark', 'parameters', 'baseline', 'current', 'ratio'))
+    for result in results:
+        key = get_result_key(result)
+        baseline_median = baseline_medians.get(key)
+        ratio = '' if baseline_median is None else '{:.2f}'.format(result['median'] / baseline_median)
+        baseline_text = '' if baseline_median is None else '{:.6f}'.format(baseline_median)
+
+        parameters = ', '.join('{}={}'.format(name, value) for name, value in result['parameters'].items() if name != 'query')
+        print('{:<24} {:<40} {:>12} {:>12.6f} {:>8}'.format(result['benchmark'], parameters, baseline_text, result['median'], ratio))
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the offline micro-benchmarks.')
+    parser.add_argument('--transcript-minutes', type=float, nargs='+', default=[5, 60, 600],
+        help='The durations (in minutes) of the synthetic transcripts.')
+    parser.add_argument('--audio-minutes', type=float, nargs='+', default=[1, 10],
+        help='The durations (in minutes) of the generated audio files.')
+    parser.add_argument('--payload-sizes', type=int, nargs='+', default=[1024, 1024 ** 2],
+        help='The sizes (in bytes) of the audio files in the validated request bodies.')
+    parser.add_argument('--repeat', type=int, default=5, help='The number of times each benchmark is run.')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='The path to the output JSON file.')
+    parser.add_argument('--compare', type=str, help='The path to the JSON file of a baseline run to compare with.')
+    args = parser.parse_args()
+
+    set_sentence_tokenizer(PunktSentenceTokenizer())
+
+    benchmark_results = []
+    with create_benchmark_app().app_context():
+        for minutes in args.transcript_minutes:
+            benchmark_results.extend(benchmark_transcripts(minutes, args.repeat))
+
+        for payload_size in args.payload_sizes:
+            benchmark_results.extend(benchmark_schema_validation(payload_size, args.repeat))
+
+        with tempfile.TemporaryDirectory() as directory:
+            for minutes in args.audio_minutes:
+                benchmark_results.extend(benchmark_preprocessing(minutes, args.repeat, directory))
+
+    results = [dict(benchmark=name, parameters=parameters, **timings) for name, parameters, timings in benchmark_results]
+    with open(args.output, 'w') as file:
+        json.dump({'metadata': get_metadata(), 'results': results}, file, indent=4)
+
+    baseline_results = []
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            baseline_results = json.load(file)['results']
+
+    print_comparison(results, baseline_results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+'''
+Stand-ins for the models and services used by the app, which run offline.
+
+'''
+
+from api.ml import ContextSearchModel
+
+class StubContextSearchModel(ContextSearchModel):
+    '''
+    A context search model that "answers" with the first word of the context containing the first
+    word of the question. It does not load DeepPavlov, but contexts are still split into windows
+    and the answers of the windows merged, as with the real model.
+
+    '''
+
+    def __init__(self, window_size=200, window_stride=100, max_batch_size=None):
+        self.window_size = window_size
+        self.window_stride = window_stride
+        self.max_batch_size = max_batch_size
+
+    def predict(self, *values):
+        predictions = []
+        for context, question in values:
+            question_words = question.split()
+            start_index = context.lower().find(question_words[0]) if question_words else -1
+            if start_index < 0:
+                predictions.append(('', -1, 0, float('-inf')))
+                continue
+
+            end_index = context.find(' ', start_index)
+            answer = context[start_index:end_index if end_index >= 0 else len(context)]
+            predictions.append((answer, start_index, 0.5, 0.0))
+
+        return predictions
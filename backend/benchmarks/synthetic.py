@@ -0,0 +1,125 @@
+'''
+Synthetic inputs for the benchmarks: speech recognition results with the same shape as the
+result of a Google Speech API recognition operation, and WAVE files of speech-like noise.
+
+'''
+
+from types import SimpleNamespace
+
+import numpy as np
+import soundfile
+
+'''
+The words that the synthetic transcripts are made of. They are drawn with a Zipfian
+distribution, so that common words have long postings lists, like in real speech.
+'''
+VOCABULARY = ('the', 'and', 'to', 'of', 'a', 'in', 'that', 'is', 'it', 'you', 'we', 'for', 'this',
+    'on', 'with', 'be', 'have', 'are', 'not', 'they', 'so', 'what', 'but', 'can', 'about', 'there',
+    'like', 'all', 'do', 'if', 'one', 'just', 'people', 'think', 'know', 'time', 'really', 'going',
+    'because', 'very', 'way', 'some', 'more', 'make', 'how', 'when', 'see', 'first', 'work', 'new',
+    'data', 'model', 'search', 'audio', 'question', 'answer', 'recording', 'meeting', 'project',
+    'customer', 'budget', 'quarter', 'revenue', 'growth', 'market', 'product', 'team', 'design',
+    'schedule', 'deadline', 'release', 'feature', 'problem', 'solution', 'research', 'science',
+    'history', 'language', 'computer', 'network', 'security', 'energy', 'climate', 'policy',
+    'economy', 'student', 'teacher', 'lecture', 'chapter', 'theory', 'experiment', 'evidence',
+    'analysis', 'result', 'system', 'process', 'example', 'important', 'different', 'interesting')
+
+'''
+The average number of words spoken per second.
+'''
+WORDS_PER_SECOND = 2.5
+
+def make_duration(seconds): return SimpleNamespace(seconds=int(seconds), nanos=int(round((seconds % 1) * 1e9)))
+
+def make_words(word_count, random):
+    ranks = np.arange(1, len(VOCABULARY) + 1)
+    probabilities = 1 / ranks
+    probabilities /= probabilities.sum()
+
+    return [VOCABULARY[i] for i in random.choice(len(VOCABULARY), size=word_count, p=probabilities)]
+
+def make_op_result(duration, seed=0, segment_duration=15, sentence_length=12, speaker_count=2):
+    '''
+    Makes a synthetic recognition result, with the same attributes as the result of a Google
+    Speech API long running recognition operation with punctuation and speaker diarization:
+    results, each with alternatives, each with a transcript, a confidence and words (with their
+    start and end times, confidence and speaker tag). Like the API, the last result repeats
+    every word of the recording with its speaker tag.
+
+    :param duration:
+        The duration of the recording, in seconds.
+    :param seed:
+        The seed of the random number generator (default=0, optional).
+    :param segment_duration:
+        The duration of each result, in seconds (default=15, optional).
+    :param sentence_length:
+        The average number of words per sentence (default=12, optional).
+    :param speaker_count:
+        The number of speakers (default=2, optional).
+
+    '''
+
+    random = np.random.RandomState(seed)
+    words = make_words(int(duration * WORDS_PER_SECOND), random)
+    word_duration = 1 / WORDS_PER_SECOND
+    words_per_segment = max(1, int(segment_duration * WORDS_PER_SECOND))
+
+    results = []
+    tagged_words = []
+    speaker_tag = 1
+    for segment_start in range(0, len(words), words_per_segment):
+        segment_words = []
+        tokens = []
+        start_of_sentence = True
+        for position in range(segment_start, min(segment_start + words_per_segment, len(words))):
+            token = words[position].capitalize() if start_of_sentence else words[position]
+            start_of_sentence = random.rand() < 1 / sentence_length
+            if start_of_sentence:
+                token += '.'
+                if random.rand() < 0.5:
+                    speaker_tag = random.randint(1, speaker_count + 1)
+
+            start_time = position * word_duration
+            word_info = SimpleNamespace(word=token, start_time=make_duration(start_time),
+                end_time=make_duration(start_time + word_duration * 0.8), confidence=float(random.uniform(0.6, 1)),
+                speaker_tag=0)
+
+            tokens.append(token)
+            segment_words.append(word_info)
+            tagged_words.append(SimpleNamespace(speaker_tag=speaker_tag, **{key: value for key, value in
+                vars(word_info).items() if key != 'speaker_tag'}))
+
+        alternative = SimpleNamespace(transcript=' '.join(tokens), confidence=float(random.uniform(0.8, 1)), words=segment_words)
+        results.append(SimpleNamespace(alternatives=[alternative]))
+
+    if len(results) > 1:
+        alternative = SimpleNamespace(transcript='', confidence=0, words=tagged_words)
+        results.append(SimpleNamespace(alternatives=[alternative]))
+
+    return SimpleNamespace(results=results)
+
+def make_wav(filepath, duration, sample_rate=44100, channels=2, seed=0):
+    '''
+    Writes a 16-bit PCM WAVE file of speech-like noise: bursts of noise modulated at a syllabic
+    rate, separated by pauses.
+
+    '''
+
+    random = np.random.RandomState(seed)
+    block_size = sample_rate * 10
+    sample_count = int(duration * sample_rate)
+
+    # The syllables and pauses are random, so that recordings made with different seeds have
+    # different fingerprints.
+    syllable_rate = random.uniform(3, 5)
+    pause_duration = 0.5
+    is_pause = random.rand(int(duration / pause_duration) + 1) < 0.2
+    loudness = random.uniform(0.02, 0.2, size=len(is_pause))
+
+    with soundfile.SoundFile(str(filepath), 'w', samplerate=sample_rate, channels=channels, subtype='PCM_16') as file:
+        for start in range(0, sample_count, block_size):
+            times = np.arange(start, min(start + block_size, sample_count)) / sample_rate
+            phrases = (times / pause_duration).astype(int)
+            envelope = np.clip(np.sin(2 * np.pi * syllable_rate * times), 0, None) * loudness[phrases] * ~is_pause[phrases]
+            samples = random.randn(len(times), channels) * envelope[:, np.newaxis]
+            file.write(samples.astype(np.float32))
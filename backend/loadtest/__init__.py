@@ -0,0 +1,4 @@
+'''
+A load-testing harness that drives the app with fake speech and storage backends (see __main__.py).
+
+'''
@@ -0,0 +1,257 @@
+'''
+Load tests the search route of the app under concurrent clients:
+
+    python -m loadtest --clients 8 --requests 40 --audio-seconds 10 60 --hit-ratios 0 0.5 0.9
+
+The real app (created with create_app) is served by a single worker process, like a uwsgi
+worker, with a bounded number of threads. The speech and storage backends are replaced by
+in-process fakes with configurable latency, so no network access is needed. For every upload
+size and ratio of cache hits (requests for a recording that was already transcribed), the
+throughput, latency percentiles and memory usage of the worker are reported.
+
+'''
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmarks.synthetic import make_wav
+from loadtest.fakes import FakeStorageBackend, FakeSpeechBackend
+
+'''
+The query of every search request.
+'''
+QUERY = 'budget deadline'
+
+class ConcurrencyLimiter:
+    '''
+    A WSGI middleware that handles at most a fixed number of requests at once, like the threads
+    of a uwsgi worker. The other requests wait for a thread to be free.
+
+    '''
+
+    def __init__(self, app, max_concurrency):
+        self.app = app
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def __call__(self, environ, start_response):
+        with self._semaphore:
+            response = self.app(environ, start_response)
+            try:
+                return [b''.join(response)]
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+
+def run_server(port, args, ready_event):
+    '''
+    Serves the app with fake backends. This runs in its own process.
+
+    '''
+
+    from werkzeug.serving import make_server
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+    import api.extensions as extensions
+    from api import create_app
+    from api.artifacts import NLTK_PUNKT_VERSION
+    from api.transcription.compact import set_sentence_tokenizer
+
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w')
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    directory = Path(tempfile.mkdtemp())
+    app = create_app(config={
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'CACHE_TYPE': 'simple',
+        'ARTIFACT_DIRECTORY': str(directory / 'artifacts'),
+        'TRANSCRIPTION_BACKEND': 'replay',
+        'SEMANTIC_SEARCH_EMBEDDER': 'hashing',
+        'STORAGE_BACKEND': 'local',
+        'LOCAL_STORAGE_DIRECTORY': str(directory / 'storage'),
+        'GOOGLE_CLOUD_STORAGE_BUCKET_AUDIO_ROOT': '',
+        'STARTUP_TIMING_REPORT': False,
+        'REQUEST_TRACE_LOG': False
+    })
+
+    # Sentences are split with an untrained tokenizer, so the NLTK data is never downloaded.
+    set_sentence_tokenizer(PunktSentenceTokenizer())
+    extensions.artifact_cache.ensure('nltk_punkt', NLTK_PUNKT_VERSION, lambda path: None)
+
+    storage_backend = FakeStorageBackend(latency=args.storage_latency, bandwidth=args.storage_bandwidth)
+    extensions._storage_backend = storage_backend
+    extensions._transcription_backend = FakeSpeechBackend(storage_backend, latency=args.speech_latency,
+        realtime_factor=args.speech_realtime_factor)
+
+    server = make_server('127.0.0.1', port, ConcurrencyLimiter(app, args.worker_threads), threaded=True)
+    ready_event.set()
+    server.serve_forever()
+
+def get_free_port():
+    with socket.socket() as free_socket:
+        free_socket.bind(('127.0.0.1', 0))
+        return free_socket.getsockname()[1]
+
+def get_memory_usage(pid):
+    '''
+    Gets the current and peak resident set size of a process, in bytes (on Linux only).
+
+    :returns:
+        A dictionary containing the 'rss' and 'peak_rss', or None if they are unavailable.
+
+    '''
+
+    try:
+        with open('/proc/{}/status'.format(pid), 'r') as file:
+            fields = dict(line.split(':', 1) for line in file if ':' in line)
+    except OSError:
+        return None
+
+    get_bytes = lambda name: int(fields[name].split()[0]) * 1024
+    return {'rss': get_bytes('VmRSS'), 'peak_rss': get_bytes('VmHWM')}
+
+def encode_audio(seconds, seed, directory):
+    '''
+    Generates a recording and encodes it as the 'file_input' of a search request.
+
+    '''
+
+    filepath = Path(directory) / '{}.wav'.format(seed)
+    make_wav(filepath, seconds, sample_rate=16000, channels=1, seed=seed)
+    with open(filepath, 'rb') as file:
+        encoded_data = base64.b64encode(file.read()).decode('ascii')
+
+    filepath.unlink()
+    return encoded_data
+
+def send_request(session, url, encoded_data):
+    start_time = time.perf_counter()
+    try:
+        response = session.post(url, json={'file_input': encoded_data, 'query': QUERY})
+        status_code = response.status_code
+    except requests.RequestException:
+        status_code = None
+
+    return time.perf_counter() - start_time, status_code
+
+def run_scenario(url, pid, seconds, hit_ratio, args, seeds, directory):
+    '''
+    Sends a batch of search requests for recordings of the same duration, a fraction of which are
+    cache hits, from concurrent clients.
+
+    '''
+
+    hit_data = encode_audio(seconds, 0, directory)
+    hit_count = int(round(args.requests * hit_ratio))
+    payloads = [hit_data] * hit_count + [encode_audio(seconds, next(seeds), directory) for _ in range(args.requests - hit_count)]
+    random.Random(0).shuffle(payloads)
+
+    # The recording of the cache hits is transcribed beforehand.
+    if hit_count > 0:
+        send_request(requests.Session(), url, hit_data)
+
+    local = threading.local()
+    def send(encoded_data):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+
+        return send_request(local.session, url, encoded_data)
+
+    memory_before = get_memory_usage(pid)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        outcomes = list(executor.map(send, payloads))
+
+    elapsed_time = time.perf_counter() - start_time
+    latencies = np.array([latency for latency, status_code in outcomes if status_code is not None and status_code < 400])
+
+    result = {
+        'audio_seconds': seconds,
+        'upload_size': len(hit_data),
+        'hit_ratio': hit_ratio,
+        'requests': len(outcomes),
+        'errors': len(outcomes) - len(latencies),
+        'elapsed_time': elapsed_time,
+        'throughput': len(latencies) / elapsed_time,
+        'memory_before': memory_before,
+        'memory_after': get_memory_usage(pid)
+    }
+
+    for percentile in (50, 90, 95, 99):
+        result['latency_p{}'.format(percentile)] = float(np.percentile(latencies, percentile)) if len(latencies) else None
+
+    result['latency_max'] = float(latencies.max()) if len(latencies) else None
+    return result
+
+def print_results(results):
+    print('{:>8} {:>10} {:>6} {:>7} {:>10} {:>9} {:>9} {:>9} {:>10}'.format('audio_s', 'upload_mb', 'hits', 'errors',
+        'req/s', 'p50_s', 'p90_s', 'p99_s', 'rss_mb'))
+
+    for result in results:
+        format_latency = lambda value: '-' if value is None else '{:.3f}'.format(value)
+        memory = result['memory_after']
+        print('{:>8g} {:>10.2f} {:>6.2f} {:>7} {:>10.2f} {:>9} {:>9} {:>9} {:>10}'.format(result['audio_seconds'],
+            result['upload_size'] / 1024 ** 2, result['hit_ratio'], result['errors'], result['throughput'],
+            format_latency(result['latency_p50']), format_latency(result['latency_p90']), format_latency(result['latency_p99']),
+            '-' if memory is None else '{:.1f}'.format(memory['rss'] / 1024 ** 2)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Load tests the search route with fake speech and storage backends.')
+    parser.add_argument('--audio-seconds', type=float, nargs='+', default=[10, 60],
+        help='The durations (in seconds) of the uploaded recordings.')
+    parser.add_argument('--hit-ratios', type=float, nargs='+', default=[0, 0.5, 0.9],
+        help='The fractions of requests for a recording that was already transcribed.')
+    parser.add_argument('--requests', type=int, default=40, help='The number of requests per scenario.')
+    parser.add_argument('--clients', type=int, default=8, help='The number of concurrent clients.')
+    parser.add_argument('--worker-threads', type=int, default=4, help='The number of threads of the app worker.')
+    parser.add_argument('--speech-latency', type=float, default=1, help='The fixed latency of a transcription, in seconds.')
+    parser.add_argument('--speech-realtime-factor', type=float, default=0.1,
+        help='The latency of a transcription per second of audio.')
+    parser.add_argument('--storage-latency', type=float, default=0.05, help='The fixed latency of an upload, in seconds.')
+    parser.add_argument('--storage-bandwidth', type=float, default=50 * 1024 ** 2, help='The upload bandwidth, in bytes per second.')
+    parser.add_argument('--output', type=str, default='loadtest_results.json', help='The path to the output JSON file.')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of the app.')
+    args = parser.parse_args()
+
+    port = get_free_port()
+    ready_event = multiprocessing.Event()
+    server_process = multiprocessing.Process(target=run_server, args=(port, args, ready_event), daemon=True)
+    server_process.start()
+    while not ready_event.wait(timeout=0.1):
+        if not server_process.is_alive():
+            raise RuntimeError('The app failed to start.')
+
+    url = 'http://127.0.0.1:{}/api/search/'.format(port)
+    seeds = iter(range(1, sys.maxsize))
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for seconds in args.audio_seconds:
+                for hit_ratio in args.hit_ratios:
+                    results.append(run_scenario(url, server_process.pid, seconds, hit_ratio, args, seeds, directory))
+    finally:
+        server_process.terminate()
+
+    with open(args.output, 'w') as file:
+        json.dump({'parameters': vars(args), 'results': results}, file, indent=4)
+
+    print_results(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''
+In-process stand-ins for the Google Cloud Speech-to-Text and Storage backends, with configurable
+latency, so that the app can be load tested without any network access.
+
+'''
+
+import time
+import zlib
+import threading
+from pathlib import Path
+
+from api.storage import StorageBackend
+from api.transcription import TranscriptionBackend, Transcript
+from benchmarks.synthetic import make_op_result
+
+# The size of the header of the WAVE files written by the preprocessing.
+_WAVE_HEADER_SIZE = 44
+
+class FakeStorageBackend(StorageBackend):
+    '''
+    A storage backend that only records the size of the uploaded blobs. An upload takes a fixed
+    latency plus the time to send the file at a fixed bandwidth.
+
+    '''
+
+    def __init__(self, latency=0.05, bandwidth=50 * 1024 ** 2):
+        '''
+        :param latency:
+            The duration of a request to the storage service, in seconds (default=0.05, optional).
+        :param bandwidth:
+            The upload bandwidth, in bytes per second (default=50 MiB/s, optional).
+
+        '''
+
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+        self._blob_sizes = {}
+        self._lock = threading.Lock()
+
+    def get_blob_uri(self, blob_name): return 'fake://{}'.format(blob_name)
+    def get_blob_name(self, blob_uri): return blob_uri[len('fake://'):]
+
+    def get_blob_size(self, blob_uri):
+        with self._lock:
+            return self._blob_sizes[self.get_blob_name(blob_uri)]
+
+    def upload(self, filepath, blob_name):
+        with self._lock:
+            if blob_name in self._blob_sizes: return self.get_blob_uri(blob_name)
+
+        size = Path(filepath).stat().st_size
+        time.sleep(self.latency + size / self.bandwidth)
+
+        with self._lock:
+            self._blob_sizes[blob_name] = size
+
+        return self.get_blob_uri(blob_name)
+
+    def get_access_link(self, blob_uri):
+        return 'https://storage.invalid/{}'.format(self.get_blob_name(blob_uri))
+
+class FakeSpeechBackend(TranscriptionBackend):
+    '''
+    A transcription backend that returns a synthetic transcript (with the same shape as a real
+    one) for the duration of the uploaded recording. A transcription takes a fixed latency plus
+    a fixed fraction of the duration of the recording, like the long running recognition API.
+
+    '''
+
+    def __init__(self, storage_backend, latency=1, realtime_factor=0.1):
+        '''
+        :param storage_backend:
+            The FakeStorageBackend that the recordings are uploaded to.
+        :param latency:
+            The fixed duration of a transcription, in seconds (default=1, optional).
+        :param realtime_factor:
+            The duration of a transcription per second of audio (default=0.1, optional).
+
+        '''
+
+        self.storage_backend = storage_backend
+        self.latency = latency
+        self.realtime_factor = realtime_factor
+
+    def transcribe(self, blob_uri, sample_rate, audio_filepath=None):
+        # The uploaded recordings are mono, 16-bit PCM WAVE files.
+        duration = (self.storage_backend.get_blob_size(blob_uri) - _WAVE_HEADER_SIZE) / (2 * sample_rate)
+        time.sleep(self.latency + duration * self.realtime_factor)
+
+        return Transcript.from_speech_response(make_op_result(duration, seed=zlib.crc32(blob_uri.encode('utf-8'))))
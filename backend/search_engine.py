@@ -7,15 +7,11 @@ from enum import Enum
 from pathlib import Path
 from datetime import timedelta
 
-import librosa
-import soundfile
-
 import nltk
 import nltk.tokenize
-import api.hash_util as hash_util
-from google.cloud import speech_v1p1beta1 as speech, storage
-from google.cloud.speech_v1p1beta1 import enums
-from google.cloud.speech_v1p1beta1 import types
+from api.audio_preprocessing import preprocess_audio
+from api.transcription import GoogleSpeechBackend, ReplayBackend
+from google.cloud import storage
 
 class SearchOutputMode(Enum):
     EXACT_MATCH = 'exact_match'
@@ -26,11 +22,16 @@ parser.add_argument('input', type=str, help='The path to the input audio file.')
 parser.add_argument('query', type=str, help='The search query.')
 parser.add_argument('--search-output-mode', help='The mode in which the search matches should be outputted.', type=SearchOutputMode, choices=list(SearchOutputMode), default=SearchOutputMode.EXACT_MATCH)
 parser.add_argument('--auth', dest='auth_json_filepath', type=str, help='The path to the service account credentials file.')
+parser.add_argument('--replay-directory', type=str, help='Transcribe offline by replaying the recorded transcripts in this directory.')
 
 args = parser.parse_args()
 args.query = args.query.strip().lower()
 
-speech_client = speech.SpeechClient.from_service_account_json(args.auth_json_filepath)
+if args.replay_directory:
+    transcription_backend = ReplayBackend(args.replay_directory)
+else:
+    transcription_backend = GoogleSpeechBackend(args.auth_json_filepath)
+
 storage_client = storage.Client.from_service_account_json(args.auth_json_filepath)
 
 BUCKET_NAME = 'syft-audio-bucket'
@@ -57,53 +58,40 @@ def find_sub_list(source, sublist):
 
     return results
 
+tmp_filepath = Path(tempfile.gettempdir()) / str(uuid.uuid4())
+
+# Preprocess the audio data by converting it to a mono WAVE, block by block
 try:
-    audio, sample_rate = librosa.load(args.input)
+    preprocessed_audio = preprocess_audio(args.input, tmp_filepath)
 except Exception as exception:
     print('Failed to load audio file ({})'.format(args.input), exception)
     exit(1)
 
-tmp_filepath = Path(tempfile.gettempdir()) / str(uuid.uuid4())
-
-# Preprocess the audio data by converting it to a mono WAVE
-audio_mono = librosa.to_mono(audio)
-soundfile.write(tmp_filepath, audio_mono, sample_rate, subtype='PCM_16', format='wav')
+sample_rate = preprocessed_audio.sample_rate
 
 # Upload the file to GCS if it doesn't already exists
 blob_root = BUCKET_AUDIO_ROOT
 if blob_root and not BUCKET_AUDIO_ROOT.endswith('/'):
     blob_root = BUCKET_AUDIO_ROOT + '/'
 
-with open(tmp_filepath, 'rb') as audio_file:
-    blob_filename = '{}{}'.format(blob_root, hash_util.get_crc32_str(audio_file)) 
-    blob = bucket.blob(blob_filename)
-    if not blob.exists():
-        blob.upload_from_file(audio_file, rewind=True)
+blob_filename = '{}{}'.format(blob_root, preprocessed_audio.crc32_str)
+blob = bucket.blob(blob_filename)
+if not blob.exists():
+    blob.upload_from_filename(str(tmp_filepath))
 
-    blob_uri = 'gs://{}/{}'.format(BUCKET_NAME, blob_filename)
+blob_uri = 'gs://{}/{}'.format(BUCKET_NAME, blob_filename)
 
 # Remove audio file now that we are done with it
 tmp_filepath.unlink()
 
-config = types.RecognitionConfig(
-    encoding=enums.RecognitionConfig.AudioEncoding.LINEAR16,
-    sample_rate_hertz=sample_rate,
-    enable_speaker_diarization=True,
-    enable_automatic_punctuation=True,
-    language_code='en-US')
-
-operation = speech_client.long_running_recognize(config, types.RecognitionAudio(uri=blob_uri))
-op_result = operation.result()
-for result in op_result.results:
-    # Check if the response is valid, which happens if and only if the result alternatives
-    # is at least of length 1 AND the transcript is non-empty.
-    if len(result.alternatives) == 0 or not result.alternatives[0].transcript: continue    
-    sentences = [sentence.strip().lower() for sentence in nltk.tokenize.sent_tokenize(result.alternatives[0].transcript)]
-    tokens = [word.strip().lower() for word in result.alternatives[0].transcript.split(' ') if word != '']
+transcript = transcription_backend.transcribe(blob_uri, sample_rate)
+for segment in transcript.segments:
+    sentences = [sentence.strip().lower() for sentence in nltk.tokenize.sent_tokenize(segment.transcript)]
+    tokens = [word.strip().lower() for word in segment.transcript.split(' ') if word != '']
 
     for sentence in sentences:
         sublist_bounds = find_sub_list(tokens, sentence.split(' '))[0]
-        sentence_word_infos = result.alternatives[0].words[sublist_bounds[0]:sublist_bounds[1]+1]
+        sentence_word_infos = segment.words[sublist_bounds[0]:sublist_bounds[1]+1]
 
         matches = re.finditer(args.query, sentence)      
         match_results = set()
@@ -136,6 +124,5 @@ for result in op_result.results:
                 start_word = sentence_word_infos[0]
                 end_word = sentence_word_infos[-1]
 
-            print('Found match (query=\'{}\') at {}:{} to {}:{}.'.format(args.query,
-                start_word.start_time.seconds, start_word.start_time.nanos, \
-                end_word.end_time.seconds, end_word.end_time.nanos))
\ No newline at end of file
+            print('Found match (query=\'{}\') at {:.3f}s to {:.3f}s.'.format(args.query,
+                start_word.start_time, end_word.end_time))
\ No newline at end of file
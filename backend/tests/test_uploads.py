@@ -0,0 +1,41 @@
+'''
+Tests of the upload of the input audio file of a search request.
+
+Run from the backend directory with: python -m unittest discover tests
+
+'''
+
+import shutil
+import tempfile
+import unittest
+
+from api import create_app
+
+class Base64UploadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        app = create_app(config={
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'CACHE_TYPE': 'simple',
+            'GOOGLE_CLOUD_AUTH_FILENAME': '',
+            'TRANSCRIPTION_BACKEND': 'replay',
+            'STORAGE_BACKEND': 'local',
+            'LOCAL_STORAGE_DIRECTORY': self.directory,
+            'ARTIFACT_DIRECTORY': self.directory,
+            'STARTUP_TIMING_REPORT': False,
+            'REQUEST_TRACE_LOG': False,
+        })
+        self.client = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_invalid_base64_is_rejected(self):
+        for file_input in ['!!!notbase64', 'data:audio/wav;base64,abcde']:
+            response = self.client.post('/api/search/', json={'file_input': file_input, 'query': 'budget'})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['parameter_info'], {'file_input': ['Invalid base64 data.']})
+
+if __name__ == '__main__':
+    unittest.main()
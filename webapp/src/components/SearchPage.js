@@ -31,35 +31,33 @@ export default class SearchPage extends Component {
             isLoading: false,
             queryResult: null,
             isContextSearch: false,
+            isFuzzySearch: false,
+            isSemanticSearch: false,
             hasError: false
         };
 
         this.sendSearchRequest = this.sendSearchRequest.bind(this);
         this.searchTermsChanged = this.searchTermsChanged.bind(this);
         this.contextSearchToggleChanged =  this.contextSearchToggleChanged.bind(this);
+        this.fuzzySearchToggleChanged = this.fuzzySearchToggleChanged.bind(this);
+        this.semanticSearchToggleChanged = this.semanticSearchToggleChanged.bind(this);
     }
 
     async sendSearchRequest() {
         if (this.state.file == null) return;
-        const toBase64 = file => new Promise((resolve, reject) => {
-            const reader = new FileReader();
-            reader.readAsDataURL(file);
-            reader.onload = () => resolve(reader.result);
-            reader.onerror = error => reject(error);
-        });
 
-        const data = {
-            'file_input': await toBase64(this.state.file),
-            'query': this.state.searchTerm,
-            'is_context_search': this.state.isContextSearch
-        };
+        // Stream the file as multipart form data rather than base64-encoding it into a JSON body.
+        const data = new FormData();
+        data.append('file_input', this.state.file);
+        data.append('query', this.state.searchTerm);
+        data.append('is_context_search', this.state.isContextSearch);
+        data.append('is_fuzzy_search', this.state.isFuzzySearch);
+        data.append('is_semantic_search', this.state.isSemanticSearch);
 
         this.setState({isLoading: true, hasError: false});
-        axios.post(`${API_BASE}/api/search/`, {
-            ...data,
+        axios.post(`${API_BASE}/api/search/upload`, data, {
             headers: {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
             }
         }).then((response) => {
             console.log(response.data);
@@ -78,6 +76,14 @@ export default class SearchPage extends Component {
         this.setState({isContextSearch: e.target.checked});
     }
 
+    fuzzySearchToggleChanged(e) {
+        this.setState({isFuzzySearch: e.target.checked});
+    }
+
+    semanticSearchToggleChanged(e) {
+        this.setState({isSemanticSearch: e.target.checked});
+    }
+
     render() {
         let dropzoneLabel = 'Drag \'n\' drop a file, or click to get started';
         if (this.state.file != null) {
@@ -112,6 +118,10 @@ export default class SearchPage extends Component {
                                         value={this.state.searchTerm} onChange={this.searchTermsChanged} />
                                     <CustomInput className="pt-3" type="switch" id="contextSearchToggle" label="Context-based search"
                                         onChange={this.contextSearchToggleChanged} value={this.state.isContextSearch} />
+                                    <CustomInput className="pt-2" type="switch" id="fuzzySearchToggle" label="Fuzzy search"
+                                        onChange={this.fuzzySearchToggleChanged} value={this.state.isFuzzySearch} />
+                                    <CustomInput className="pt-2" type="switch" id="semanticSearchToggle" label="Semantic search"
+                                        onChange={this.semanticSearchToggleChanged} value={this.state.isSemanticSearch} />
 
                                     <hr className="my-4" />
                                     <Button disabled={this.state.isLoading} size="lg" color="dark" outline block 